@@ -0,0 +1,9 @@
+__all__ = ['Dataset']
+
+
+def __getattr__(name: str):
+    # Pas bij gebruik importeren: `import afvalwijzer.io` blijft zo licht.
+    if name == 'Dataset':
+        from afvalwijzer.dataset import Dataset
+        return Dataset
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import logging
+from collections.abc import Iterable, Sized
+from datetime import date
+from functools import cache
+from pathlib import Path
+
+from afvalwijzer.io import write
+from afvalwijzer.models import Brongegeven
+
+logger = logging.getLogger(__name__)
+
+# Pdf drukt de datum van vandaag af in de koptekst van elke pagina. Die is
+# achteraf niet te vervangen (het lettertype bevat alleen de gebruikte
+# tekens), dus telt de datum mee en wordt een pdf elke dag opnieuw gemaakt.
+# Een docx krijgt bij het overslaan alleen een nieuwe datum, zie `dateer()`.
+GEDATEERD = ('.pdf',)
+
+
+def write_incremental(file_out: str | Path, data: Iterable[Brongegeven],
+                      filters: dict[str, bool | int | str], **options) -> bool:
+    """Schrijft de regels alleen als de invoer veranderd is sinds de vorige
+    keer.
+
+    Naast het doelbestand staat een `.build.json` met hashes van de
+    (gefilterde) brongegevens, de sjablonen van het bestandsformaat en de
+    code, en voor pdf de afgedrukte datum. Zijn die allemaal gelijk, dan
+    wordt het bestand overgeslagen. Een overgeslagen docx krijgt wel de datum
+    van vandaag.
+
+    :return: True als het bestand geschreven is, False als het is
+        overgeslagen.
+    """
+    if not isinstance(data, Sized):
+        # Een lijst of `Dataset` (met zijn onthouden samenvatting) blijft
+        # zoals hij is; die kan twee keer doorlopen worden.
+        data = list(data)
+    info = build_info(file_out, data, filters)
+
+    if Path(file_out).exists() and read_info(file_out) == info:
+        logger.info(f'Overgeslagen, invoer ongewijzigd: {file_out}')
+        dateer(file_out, filters)
+        return False
+
+    write(file_out, data, filters, **options)
+    write_info(file_out, info)
+    return True
+
+
+def build_info(file_out: str | Path, data: Iterable[Brongegeven],
+               filters: dict[str, bool | int | str]) -> dict[str, str]:
+    """Hashes van alles waar de inhoud van het doelbestand van afhangt.
+    """
+    # repr en niet json: `Prefix('a')` en `['a']` zijn verschillende filters.
+    invoer = hashlib.sha256(repr(sorted(filters.items())).encode('utf-8'))
+    for record in data:
+        invoer.update(repr(tuple(record)).encode('utf-8'))
+
+    format = Path(file_out).suffix.lower()
+    sjablonen = hashlib.sha256()
+    for sjabloon in sjabloon_bestanden(format):
+        sjablonen.update(Path(sjabloon).read_bytes())
+
+    info = {
+        'invoer': invoer.hexdigest(),
+        'sjablonen': sjablonen.hexdigest(),
+        'code': pakket_versie(),
+    }
+    if format in GEDATEERD:
+        info['datum'] = date.today().isoformat()
+    return info
+
+
+def sjabloon_bestanden(format: str) -> list[str]:
+    """De bestanden die de writer van het bestandsformaat inleest.
+    """
+    if format == '.docx':
+        from afvalwijzer.io.docx import TEMPLATE_DOCX
+        return [TEMPLATE_DOCX]
+    elif format == '.pdf':
+        from afvalwijzer.io.pdf import LOGO_FILE, FONT_FILE, FONT_FILE_BOLD
+        return [LOGO_FILE, FONT_FILE, FONT_FILE_BOLD]
+    else:
+        return []
+
+
+def dateer(file_out: str | Path, filters: dict[str, bool | int | str]) -> None:
+    """Zet de datum van vandaag in een overgeslagen bestand, als het formaat
+    een datum afdrukt die los van de inhoud te vervangen is.
+    """
+    if Path(file_out).suffix.lower() == '.docx':
+        from afvalwijzer.io.docx import dateer
+        dateer(file_out, filters)
+
+
+@cache
+def pakket_versie() -> str:
+    """Een hash over alle broncode van het pakket.
+    """
+    h = hashlib.sha256()
+    root = Path(__file__).parent
+    for path in sorted(root.rglob('*.py')):
+        h.update(path.relative_to(root).as_posix().encode('utf-8'))
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def info_path(file_out: str | Path) -> Path:
+    return Path(f'{file_out}.build.json')
+
+
+def read_info(file_out: str | Path) -> dict[str, str] | None:
+    try:
+        with open(info_path(file_out), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def write_info(file_out: str | Path, info: dict[str, str]) -> None:
+    with open(info_path(file_out), 'w', encoding='utf-8') as f:
+        json.dump(info, f, indent=2)
@@ -0,0 +1,138 @@
+import hashlib
+import logging
+import os
+import pickle
+import time
+from collections.abc import Callable, Iterable
+from functools import cache
+from pathlib import Path
+from typing import Any, TypeVar
+
+from afvalwijzer.models import Brongegeven, Buurt
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# De bronbestanden die bepalen hoe een buurt wordt samengevat en geprint.
+# Verandert een van deze bestanden, dan is de hele cache ongeldig.
+CODE_BESTANDEN = (
+    'content.py',
+    'models.py',
+    'io/docx.py',
+    'io/pdf.py',
+)
+
+# Items die zo lang niet gebruikt zijn ruimt `opruimen()` op.
+BEWAARDAGEN = 14
+
+
+@cache
+def code_versie() -> str:
+    """Een hash over de broncode die de inhoud van de documenten bepaalt.
+    """
+    h = hashlib.sha256()
+    root = Path(__file__).parent
+    for naam in CODE_BESTANDEN:
+        h.update((root / naam).read_bytes())
+    return h.hexdigest()
+
+
+class BuurtCache:
+    """Bewaart per buurt de samenvatting en de geprinte hoofdstukken op schijf.
+
+    De sleutel is een hash over de gesorteerde brongegevens van de buurt (en
+    de code-versie). Is de data van een buurt sinds de vorige keer niet
+    veranderd, dan hoeft `content.samenvatting` de buurt niet opnieuw samen te
+    vatten en kunnen de writers het hoofdstuk hergebruiken.
+
+    Tijdens het samenvatten onthoudt de cache de sleutel van elke buurt in
+    `sleutels`. De writers gebruiken die om hun hoofdstukken op te zoeken.
+
+    Elk gebruik van een item zet de wijzigingstijd van zijn bestand op nu;
+    `opruimen()` verwijdert wat al een tijd niet gebruikt is.
+    """
+    def __init__(self, folder: str | Path) -> None:
+        self.folder = Path(folder)
+        self.sleutels: dict[Buurt, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def sleutel(self, buurt: Buurt, records: Iterable[Brongegeven]) -> str:
+        """Berekent (en onthoudt) de sleutel voor de records van een buurt.
+        """
+        h = hashlib.sha256(code_versie().encode('utf-8'))
+        for record in records:
+            h.update(repr(tuple(record)).encode('utf-8'))
+        sleutel = h.hexdigest()
+        self.sleutels[buurt] = sleutel
+        return sleutel
+
+    def get(self, soort: str, sleutel: str) -> Any | None:
+        """Leest een item uit de cache. Geeft None als het er niet in staat.
+
+        :param str soort: Soort item, bijvoorbeeld "samenvatting" of "docx".
+        :param str sleutel: De sleutel van het item.
+        """
+        path = self.path(soort, sleutel)
+
+        try:
+            with open(path, 'rb') as f:
+                item = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (EOFError, pickle.UnpicklingError) as err:
+            logger.warning(f'Ongeldig cachebestand {path}: {err}')
+            self.misses += 1
+            return None
+
+        os.utime(path)
+        self.hits += 1
+        return item
+
+    def set(self, soort: str, sleutel: str, item: Any) -> None:
+        """Schrijft een item naar de cache.
+
+        Het bestand wordt atomair vervangen, zodat een half geschreven bestand
+        nooit gelezen wordt.
+        """
+        path = self.path(soort, sleutel)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp, 'wb') as f:
+            pickle.dump(item, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def get_or_create(self, soort: str, sleutel: str,
+                      maak: Callable[[], T]) -> T:
+        """Leest een item uit de cache, of maakt het aan en slaat het op.
+
+        :param maak: Maakt het item als het niet in de cache staat.
+        """
+        item = self.get(soort, sleutel)
+        if item is None:
+            item = maak()
+            self.set(soort, sleutel, item)
+        return item
+
+    def opruimen(self, dagen: float = BEWAARDAGEN) -> int:
+        """Verwijdert items (en achtergebleven tijdelijke bestanden) die
+        `dagen` niet gebruikt zijn. Andere documenten kunnen dezelfde map
+        gebruiken, dus wat deze keer niet gebruikt is blijft staan.
+
+        :return: Het aantal verwijderde bestanden.
+        """
+        grens = time.time() - dagen * 24 * 3600
+        verwijderd = 0
+        for path in self.folder.glob('*/*'):
+            try:
+                if path.stat().st_mtime < grens:
+                    path.unlink()
+                    verwijderd += 1
+            except FileNotFoundError:
+                pass
+        return verwijderd
+
+    def path(self, soort: str, sleutel: str) -> Path:
+        return self.folder / soort / f'{sleutel}.pickle'
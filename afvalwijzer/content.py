@@ -1,18 +1,32 @@
 from collections import defaultdict, Counter
-from collections.abc import Iterable
-from itertools import groupby
-from operator import attrgetter
+from collections.abc import Callable, Iterable, Iterator
+from functools import cache
+from heapq import merge
+from itertools import chain, groupby, repeat
+from operator import attrgetter, itemgetter
 from typing import TypeVar
 
-import bleach
-
-from .models import Adres, Brongegeven, Regel, Buurt
+from . import profiling
+from .cache import BuurtCache
+from .models import Adres, Brongegeven, Groep, Regel, Buurt
 
 T = TypeVar('T')
 
+# Vanaf zoveel opeenvolgende huisnummers schrijven we een reeks, "1–47".
+MIN_REEKS = 3
+
+
+@cache
+def _cleaner():
+    # bleach (met html5lib) kost bij het opstarten merkbaar tijd, en is alleen
+    # nodig voor documenten; daarom pas bij het eerste gebruik importeren.
+    import bleach
+    return bleach.Cleaner([], {}, strip=True)
+
 
-# Nodig om melding en opmerking op te schonen in `Regel.labels()`.
-strip_tags = bleach.Cleaner([], {}, strip=True).clean
+def strip_tags(text: str) -> str:
+    """Schoont melding en opmerking op in `Regel.labels()`."""
+    return _cleaner().clean(text)
 
 
 def labels(self: Regel) -> list[tuple[str, str]]:
@@ -58,15 +72,25 @@ def samengevoegde_huisnummers(adressen_per_regel: dict[Regel, list[Adres]],
 
     # Test status van adressen: voor de hele straat 1 regel?
     #
-    # (Het is een beetje onhandig dat we op deze manier alle adressen langs
-    #  moeten lopen, maar het zorgt er wel voor dat we bovenstaande test snel
-    #  uit kunnen voeren.)
+    # Alle adressen van alle regels lopen we in één keer langs, per straat en
+    # op huisnummer. De lijsten per regel zijn al zo gesorteerd, dus `merge`
+    # volstaat. Tegelijk stellen we per straat de huisnummerreeksen op.
 
     regels_per_straat = defaultdict(Counter)
+    reeksen_per_straat = {}
 
-    for regel, adressen in adressen_per_regel.items():
-        for adres in adressen:
-            regels_per_straat[adres.straatnaam][regel] += 1
+    def straat_huisnummer(ar: tuple[Adres, Regel]) -> tuple[str, int]:
+        return ar[0].straatnaam, ar[0].huisnummer
+
+    alle_adressen = merge(*(
+        zip(adressen, repeat(regel))
+        for regel, adressen in adressen_per_regel.items()
+    ), key=straat_huisnummer)
+
+    for straat, straat_adressen in groupby(alle_adressen, lambda ar: ar[0].straatnaam):
+        straat_adressen = list(straat_adressen)
+        regels_per_straat[straat].update(map(itemgetter(1), straat_adressen))
+        reeksen_per_straat[straat] = huisnummer_reeksen(straat_adressen)
 
     hele_straat = {
         straat: len(regels) == 1 and regels.total() > 5
@@ -75,8 +99,8 @@ def samengevoegde_huisnummers(adressen_per_regel: dict[Regel, list[Adres]],
 
     # Nu we weten welke straten precies 1 regel hebben (en dus het huisnummer
     # niet belangrijk is) kunnen we alle huisnummers gaan samenvoegen.
-    # - Waar huisnummers wel relevant zijn vatten we deze samen met een
-    #   komma-gescheiden opsomming.
+    # - Waar huisnummers wel relevant zijn vatten we deze samen met reeksen
+    #   en een komma-gescheiden opsomming.
     # - Waar huisnummers niet relevant zijn schrijven we "alle huisnummers".
 
     def sortkey(ra: tuple[Regel, list[Adres]]) -> int:
@@ -85,10 +109,8 @@ def samengevoegde_huisnummers(adressen_per_regel: dict[Regel, list[Adres]],
     def alle_huisnummers(straat: str) -> str:
         return f'{straat}, alle huisnummers'
 
-    def gescheiden_huisnummers(straat: str, adressen: Iterable[Adres],
-                               sep: str = ', ') -> str:
-        huisnummers = sep.join(f'{a.huisnummer}{a.toevoeging}' for a in adressen)
-        return f'{straat} {huisnummers}'
+    def gescheiden_huisnummers(straat: str, regel: Regel) -> str:
+        return f'{straat} {reeksen_per_straat[straat][regel]}'
 
     get_straatnaam = attrgetter('straatnaam')
 
@@ -96,39 +118,230 @@ def samengevoegde_huisnummers(adressen_per_regel: dict[Regel, list[Adres]],
         regel: [
             alle_huisnummers(straat)
             if hele_straat[straat] else
-            gescheiden_huisnummers(straat, straat_adressen)
-            for straat, straat_adressen in groupby(adressen, get_straatnaam)
+            gescheiden_huisnummers(straat, regel)
+            for straat, _ in groupby(adressen, get_straatnaam)
         ]
         for regel, adressen in sorted(adressen_per_regel.items(), key=sortkey)
     }
 
 
-def samenvatting(data: Iterable[Brongegeven],
-                 ) -> dict[Buurt, dict[str, dict[Regel, list[str]]]]:
-    def sortkey(r: Brongegeven) -> tuple[str, ...]:
-        return tuple(
-            v or ''
-            for v in (
-                # Sorteer 23-H (huis) voor 23-1.
-                r._replace(huisnummertoevoeging=
-                           r.huisnummertoevoeging.replace('H', ' '))
-                if r.huisnummertoevoeging else r
-            )
+def huisnummer_reeksen(straat_adressen: list[tuple[Adres, Regel]],
+                       sep: str = ', ') -> dict[Regel, str]:
+    """Vat de huisnummers van één straat per regel samen in reeksen.
+
+    Bijvoorbeeld "1–47 (oneven), 2–30 (even), 32A, 32-1". Een reeks loopt
+    over huisnummers aan één kant van de straat (even of oneven) die elk
+    twee verder liggen en waarvoor dezelfde regel geldt: "1–7 (oneven)"
+    betekent dat 1, 3, 5 en 7 alle vier in de gegevens staan. Ontbreekt er
+    een nummer, bijvoorbeeld omdat het een bedrijf is in een document voor
+    bewoners, dan breekt de reeks daar. Een huisnummer kan alleen in een
+    reeks als die regel geldt voor al zijn toevoegingen. Anders worden de
+    adressen los opgesomd, met toevoeging.
+
+    :param list straat_adressen: Adressen met hun regel, gesorteerd op
+        huisnummer.
+    """
+    nummers = []        # Huisnummers op volgorde.
+    regel_van = {}      # Huisnummer -> regel, of None bij verschillende regels.
+    adressen_van = defaultdict(list)
+
+    for adres, regel in straat_adressen:
+        nummer = adres.huisnummer
+        if nummer not in regel_van:
+            nummers.append(nummer)
+            regel_van[nummer] = regel
+        elif regel_van[nummer] != regel:
+            regel_van[nummer] = None
+        adressen_van[nummer].append((adres, regel))
+
+    def reeksen(kant_nummers: Iterable[int]) -> Iterator[tuple[Regel | None, list[int]]]:
+        reeks = []
+        for nummer in kant_nummers:
+            if reeks and (nummer != reeks[-1] + 2 or
+                          regel_van[nummer] != regel_van[reeks[-1]]):
+                yield regel_van[reeks[0]], reeks
+                reeks = []
+            reeks.append(nummer)
+        if reeks:
+            yield regel_van[reeks[0]], reeks
+
+    delen = defaultdict(list)   # Regel -> [(huisnummer, tekst), ...]
+
+    # Ook als de straat maar één kant heeft blijft "(even)" of "(oneven)"
+    # staan: "2–30" zou ook de oneven nummers kunnen betekenen.
+    for rest, kant in ((1, ' (oneven)'), (0, ' (even)')):
+        for regel, reeks in reeksen(n for n in nummers if n % 2 == rest):
+            if regel is not None and len(reeks) >= MIN_REEKS:
+                delen[regel].append((reeks[0], f'{reeks[0]}–{reeks[-1]}{kant}'))
+            else:
+                for nummer in reeks:
+                    for adres, adres_regel in adressen_van[nummer]:
+                        delen[adres_regel].append(
+                            (nummer, f'{nummer}{adres.toevoeging or ""}'))
+
+    return {
+        regel: sep.join(map(itemgetter(1), sorted(regel_delen, key=itemgetter(0))))
+        for regel, regel_delen in delen.items()
+    }
+
+
+def sorteervolgorde(r: Brongegeven) -> tuple[str, ...]:
+    """De sorteersleutel van een record in `samenvatting`: op alle velden, met
+    lege velden vooraan, per buurt, fractie, regel en adres. Bedrijven
+    (woonfunctie False) komen voor bewoners.
+    """
+    return tuple(
+        '' if v is None else v
+        for v in (
+            # Sorteer 23-H (huis) voor 23-1.
+            r._replace(huisnummertoevoeging=
+                       r.huisnummertoevoeging.replace('H', ' '))
+            if r.huisnummertoevoeging else r
         )
+    )
+
+
+def groep_volgorde(g: Groep) -> tuple[str, ...]:
+    """De sorteersleutel van een groep, in dezelfde volgorde als
+    `sorteervolgorde`.
+    """
+    return tuple(
+        '' if v is None else v
+        for v in (g.woonfunctie, g.stadsdeel, g.plaatsnaam, g.buurtnaam,
+                  g.afvalfractie, *g.regel)
+    )
+
+
+def adres_volgorde(adres: Adres) -> tuple[str, int, str, str]:
+    """De volgorde van de adressen van een regel, zoals in `sorteervolgorde`.
+    """
+    huisletter, _, toevoeging = (adres.toevoeging or '').partition('-')
+    return adres.straatnaam, adres.huisnummer, huisletter, toevoeging.replace('H', ' ')
+
+
+def per_buurt(data: list[T], volgorde: Callable[[T], tuple],
+              ) -> Iterator[tuple[Buurt, list[T]]]:
+    """Deelt gesorteerde records of groepen op per buurt.
+
+    De `volgorde` begint met woonfunctie en stadsdeel. Zonder filter daarop
+    komt een buurt met bewoners en bedrijven dus twee keer langs; de delen
+    worden dan samengevoegd en opnieuw gesorteerd op fractie, regel en adres.
+    """
+    def binnen_buurt(item: T) -> tuple:
+        return volgorde(item)[4:]
+
+    buurten: dict[Buurt, list[T]] = {}
+    for buurt, buurt_data in groupby(data, attrgetter('buurt')):
+        if buurt in buurten:
+            buurten[buurt] = sorted(chain(buurten[buurt], buurt_data), key=binnen_buurt)
+        else:
+            buurten[buurt] = list(buurt_data)
+    return iter(buurten.items())
+
+
+def samenvatting(data: Iterable[Brongegeven | Groep],
+                 cache: BuurtCache | None = None,
+                 ) -> dict[Buurt, dict[str, dict[Regel, list[str]]]]:
+    """Vat de brongegevens samen per buurt, fractie en regel.
+
+    In plaats van brongegevens mag `data` ook uit groepen bestaan, die de
+    database al per buurt, fractie en regel samengevat heeft (zie
+    `db.read_groepen()`). Dan hoeven alleen de groepen gesorteerd te worden.
+    Heeft `data` zelf een (onthouden) samenvatting, zoals een `Dataset`, dan
+    wordt die gebruikt.
+
+    Met een `cache` wordt een buurt alleen samengevat als zijn records sinds
+    de vorige keer veranderd zijn.
+    """
+    if cache is None and hasattr(data, 'samenvatting'):
+        return data.samenvatting()
+
+    data = iter(data)
+    eerste = next(data, None)
+    if eerste is not None:
+        data = chain((eerste,), data)
+    if isinstance(eerste, Groep):
+        return groepen_samenvatting(data, cache)
 
-    get_buurt = attrgetter('buurt')
     get_fractie = attrgetter('afvalfractie')
     get_regel = attrgetter('regel')
 
-    data = sorted(data, key=sortkey)
-
-    return {
-        buurt: {
+    def buurt_samenvatting(buurt_data: Iterable[Brongegeven],
+                           ) -> dict[str, dict[Regel, list[str]]]:
+        return {
             fractie: samengevoegde_huisnummers({
                 regel: [item.adres for item in regel_data]
                 for regel, regel_data in groupby(fractie_data, get_regel)
             })
             for fractie, fractie_data in groupby(buurt_data, get_fractie)
         }
-        for buurt, buurt_data in groupby(data, get_buurt)
-    }
+
+    def cached_samenvatting(buurt: Buurt, buurt_data: Iterable[Brongegeven],
+                            ) -> dict[str, dict[Regel, list[str]]]:
+        buurt_data = list(buurt_data)
+        sleutel = cache.sleutel(buurt, buurt_data)
+        return cache.get_or_create('samenvatting', sleutel,
+                                   lambda: buurt_samenvatting(buurt_data))
+
+    with profiling.stage('sorteren') as stage:
+        data = sorted(data, key=sorteervolgorde)
+        stage.rijen = len(data)
+
+    with profiling.stage('samenvatten') as stage:
+        stage.rijen = len(data)
+        if cache is None:
+            return {
+                buurt: buurt_samenvatting(buurt_data)
+                for buurt, buurt_data in per_buurt(data, sorteervolgorde)
+            }
+        else:
+            return {
+                buurt: cached_samenvatting(buurt, buurt_data)
+                for buurt, buurt_data in per_buurt(data, sorteervolgorde)
+            }
+
+
+def groepen_samenvatting(groepen: Iterable[Groep],
+                         cache: BuurtCache | None = None,
+                         ) -> dict[Buurt, dict[str, dict[Regel, list[str]]]]:
+    """Vat groepen samen per buurt, fractie en regel, net als `samenvatting`.
+    """
+    get_fractie = attrgetter('afvalfractie')
+    get_regel = attrgetter('regel')
+
+    def buurt_samenvatting(buurt_groepen: Iterable[Groep],
+                           ) -> dict[str, dict[Regel, list[str]]]:
+        return {
+            fractie: samengevoegde_huisnummers({
+                # Bewoners en bedrijven in één buurt kunnen dezelfde regel
+                # hebben; dan komen beide groepen hier achter elkaar langs.
+                regel: list(merge(*(groep.adressen for groep in regel_groepen),
+                                  key=adres_volgorde))
+                for regel, regel_groepen in groupby(fractie_groepen, get_regel)
+            })
+            for fractie, fractie_groepen in groupby(buurt_groepen, get_fractie)
+        }
+
+    def cached_samenvatting(buurt: Buurt, buurt_groepen: Iterable[Groep],
+                            ) -> dict[str, dict[Regel, list[str]]]:
+        buurt_groepen = list(buurt_groepen)
+        sleutel = cache.sleutel(buurt, buurt_groepen)
+        return cache.get_or_create('samenvatting', sleutel,
+                                   lambda: buurt_samenvatting(buurt_groepen))
+
+    with profiling.stage('sorteren') as stage:
+        groepen = sorted(groepen, key=groep_volgorde)
+        stage.rijen = len(groepen)
+
+    with profiling.stage('samenvatten') as stage:
+        stage.rijen = len(groepen)
+        if cache is None:
+            return {
+                buurt: buurt_samenvatting(buurt_groepen)
+                for buurt, buurt_groepen in per_buurt(groepen, groep_volgorde)
+            }
+        else:
+            return {
+                buurt: cached_samenvatting(buurt, buurt_groepen)
+                for buurt, buurt_groepen in per_buurt(groepen, groep_volgorde)
+            }
@@ -0,0 +1,134 @@
+import json
+import logging
+import socket
+import socketserver
+import threading
+import time
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+from afvalwijzer.build import write_incremental
+from afvalwijzer.dataset import Dataset
+from afvalwijzer.filters import from_json, to_json
+from afvalwijzer.lookup import SnapshotService
+from afvalwijzer.models import Brongegeven
+
+logger = logging.getLogger(__name__)
+
+HOST = '127.0.0.1'
+PORT = 8765
+
+
+class ExportService(SnapshotService[Dataset]):
+    """Houdt de records van een snapshot in het geheugen als `Dataset`, en
+    laadt ze opnieuw als het bestand verandert. Samenvattingen van partities
+    worden onthouden tot de volgende keer laden.
+    """
+    def __init__(self, file_in: str | Path, interval: float = 5.) -> None:
+        super().__init__(file_in, interval)
+        # De writers (en `profiling`) zijn niet op meerdere threads tegelijk
+        # gebouwd; exports worden één voor één geschreven.
+        self.lock = threading.Lock()
+
+    @property
+    def dataset(self) -> Dataset:
+        return self._inhoud
+
+    def bouw(self, data: Iterable[Brongegeven]) -> Dataset:
+        return Dataset.from_records(data)
+
+    def beschrijf(self, dataset: Dataset) -> str:
+        return (f'{len(dataset)} records geladen uit {self.file_in},'
+                f' {sum(1 for _ in dataset.partities())} partities')
+
+    def export(self, file_out: str | Path, filters: dict[str, Any],
+               incremental: bool = False, **options) -> int:
+        """Schrijft de gefilterde records naar `file_out`.
+
+        :return: Het aantal geschreven records.
+        """
+        view = self.dataset.filter(filters)
+        with self.lock:
+            if incremental:
+                write_incremental(file_out, view, filters, **options)
+            else:
+                view.export(file_out, **options)
+        return len(view)
+
+
+def handler(service: ExportService) -> type[socketserver.StreamRequestHandler]:
+    """Maakt een request handler voor `service`.
+
+    Elk verzoek is één regel JSON, het antwoord ook:
+
+    - {"file_out": "...", "filters": {...}, "incremental": false, "options": {...}}
+      -> {"rijen": 1234, "seconden": 0.4}
+    - {"status": true} -> {"bestand": "...", "geladen": ..., "records": ...}
+
+    Bij een fout is het antwoord {"fout": "..."}.
+    """
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            try:
+                verzoek = json.loads(self.rfile.readline())
+                if verzoek.get('status'):
+                    antwoord = {
+                        'bestand': str(service.file_in),
+                        'geladen': service.geladen,
+                        'records': len(service.dataset),
+                    }
+                else:
+                    start = time.perf_counter()
+                    rijen = service.export(
+                        verzoek['file_out'], from_json(verzoek.get('filters', {})),
+                        verzoek.get('incremental', False),
+                        **verzoek.get('options', {}))
+                    antwoord = {'rijen': rijen,
+                                'seconden': round(time.perf_counter() - start, 3)}
+                    logger.info(f'{verzoek["file_out"]}: {rijen} records'
+                                f' in {antwoord["seconden"]} s.')
+            except Exception as err:
+                logger.exception('Verzoek mislukt.')
+                antwoord = {'fout': f'{type(err).__name__}: {err}'}
+            self.wfile.write(json.dumps(antwoord, ensure_ascii=False).encode('utf-8') + b'\n')
+
+    return Handler
+
+
+def serve(service: ExportService, host: str = HOST, port: int = PORT) -> None:
+    """Luistert op een lokale poort naar exportverzoeken, tot Ctrl+C.
+    """
+    service.watch()
+    with socketserver.ThreadingTCPServer((host, port), handler(service)) as server:
+        logger.info(f'Luistert op {host}:{port}.')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            service.stop()
+
+
+def request(verzoek: dict[str, Any], host: str = HOST, port: int = PORT,
+            ) -> dict[str, Any]:
+    """Stuurt één verzoek naar de daemon en geeft het antwoord.
+    """
+    with socket.create_connection((host, port)) as conn:
+        conn.sendall(json.dumps(verzoek).encode('utf-8') + b'\n')
+        with conn.makefile('rb') as f:
+            return json.loads(f.readline())
+
+
+def export(file_out: str | Path, filters: dict[str, Any],
+           incremental: bool = False, host: str = HOST, port: int = PORT,
+           **options) -> dict[str, Any]:
+    """Vraagt de daemon om een export. `file_out` wordt absoluut gemaakt,
+    omdat de daemon een andere werkmap kan hebben.
+    """
+    return request({
+        'file_out': str(Path(file_out).resolve()),
+        'filters': to_json(filters),
+        'incremental': incremental,
+        'options': options,
+    }, host, port)
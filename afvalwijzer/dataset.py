@@ -0,0 +1,143 @@
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from afvalwijzer import content, io
+from afvalwijzer.filters import Conditie, condities, predicate
+from afvalwijzer.models import Brongegeven, Buurt, Regel
+
+Samenvatting = dict[Buurt, dict[str, dict[Regel, list[str]]]]
+
+
+class Partitie(NamedTuple):
+    woonfunctie: bool
+    stadsdeel: str
+
+
+class Dataset:
+    """Brongegevens die één keer gelezen zijn, om er herhaaldelijk mee te
+    werken, bijvoorbeeld in een notebook:
+
+        ds = Dataset.open('db.zip')
+        bewoners = ds.filter(woonfunctie=True)
+        for partitie, deel in bewoners.partities():
+            deel.export(f'Afvalwijzer {partitie.stadsdeel} - bewoners.docx')
+
+    De records zijn gesorteerd zoals in `content.samenvatting` en verdeeld in
+    partities per woonfunctie en stadsdeel. `filter()` maakt een view die
+    dezelfde records deelt; een filter op woonfunctie of stadsdeel kiest
+    alleen partities, zonder records te testen. `samenvatting()` wordt per
+    partitie en filter onthouden, ook over views heen.
+    """
+    def __init__(self, partities: dict[Partitie, list[Brongegeven]],
+                 filters: dict[str, Any] | None = None, *,
+                 _condities: tuple[Conditie, ...] = (),
+                 _samenvattingen: dict | None = None) -> None:
+        self._partities = partities
+        self.filters = dict(filters or {})
+        self._condities = _condities
+        self._samenvattingen = {} if _samenvattingen is None else _samenvattingen
+        self._records: dict[Partitie, list[Brongegeven]] = {}
+
+    @classmethod
+    def open(cls, source: str | Path, filters: dict[str, Any] | None = None,
+             **options) -> 'Dataset':
+        """Leest een bron die `io.read()` ondersteunt (csv, zip, sqlite, xlsx,
+        yaml voor de database). `filters` worden al bij het lezen toegepast,
+        `options` (zoals `processes`) gaan naar de reader.
+        """
+        filters = filters or {}
+        return cls.from_records(io.read(source, filters, **options), filters)
+
+    @classmethod
+    def from_records(cls, data: Iterable[Brongegeven],
+                     filters: dict[str, Any] | None = None) -> 'Dataset':
+        partities: dict[Partitie, list[Brongegeven]] = {}
+        for record in sorted(data, key=content.sorteervolgorde):
+            partitie = Partitie(record.woonfunctie, record.stadsdeel)
+            partities.setdefault(partitie, []).append(record)
+        return cls(partities, filters)
+
+    def filter(self, filters: dict[str, Any] | None = None, /,
+               **kwargs) -> 'Dataset':
+        """Een view met alleen de records die (ook) aan deze filters voldoen.
+        De filters zijn die van `io.read()`, als dict of als keywords:
+
+            ds.filter(stadsdeel=['Noord', 'Oost'], straatnaam=Prefix('A'))
+        """
+        filters = {**(filters or {}), **kwargs}
+        return Dataset(self._partities, {**self.filters, **filters},
+                       _condities=(*self._condities, *condities(filters)),
+                       _samenvattingen=self._samenvattingen)
+
+    def partities(self) -> Iterator[tuple[Partitie, 'Dataset']]:
+        """De niet-lege partities van deze view, per woonfunctie en stadsdeel,
+        elk als view.
+        """
+        for partitie in self._gekozen():
+            deel = self.filter(woonfunctie=partitie.woonfunctie,
+                               stadsdeel=partitie.stadsdeel)
+            if deel._partitie_records(partitie):
+                yield partitie, deel
+
+    def samenvatting(self) -> Samenvatting:
+        """De samenvatting zoals `content.samenvatting`, per partitie onthouden.
+
+        Een buurt die in meer gekozen partities voorkomt (bewoners en
+        bedrijven, zonder filter op woonfunctie) wordt over die partities
+        samen opnieuw samengevat; ook dat wordt onthouden.
+        """
+        condities = frozenset(c for c in self._condities if c.veld not in Partitie._fields)
+        gekozen = self._gekozen()
+        result = {}
+        dubbel = set()
+        for partitie in gekozen:
+            sleutel = (partitie, condities)
+            if sleutel not in self._samenvattingen:
+                self._samenvattingen[sleutel] = content.samenvatting(
+                    self._partitie_records(partitie))
+            for buurt, buurt_data in self._samenvattingen[sleutel].items():
+                if buurt in result:
+                    dubbel.add(buurt)
+                result[buurt] = buurt_data
+
+        if dubbel:
+            sleutel = (frozenset(gekozen), condities)
+            if sleutel not in self._samenvattingen:
+                self._samenvattingen[sleutel] = content.samenvatting(
+                    r for partitie in gekozen
+                    for r in self._partitie_records(partitie) if r.buurt in dubbel)
+            result.update(self._samenvattingen[sleutel])
+        return result
+
+    def export(self, file_out: str | Path, **options) -> None:
+        """Schrijft deze view met `io.write()`. De docx- en pdf-writers
+        gebruiken de onthouden samenvatting.
+        """
+        io.write(file_out, self, self.filters, **options)
+
+    def __iter__(self) -> Iterator[Brongegeven]:
+        for partitie in self._gekozen():
+            yield from self._partitie_records(partitie)
+
+    def __len__(self) -> int:
+        return sum(len(self._partitie_records(p)) for p in self._gekozen())
+
+    def __repr__(self) -> str:
+        return f'<Dataset {self.filters!r}>'
+
+    def _gekozen(self) -> list[Partitie]:
+        """De partities die aan de filters op woonfunctie en stadsdeel
+        voldoen.
+        """
+        test = predicate([c for c in self._condities if c.veld in Partitie._fields],
+                         Partitie._fields)
+        return [p for p in self._partities if test is None or test(p)]
+
+    def _partitie_records(self, partitie: Partitie) -> list[Brongegeven]:
+        if partitie not in self._records:
+            records = self._partities[partitie]
+            test = predicate([c for c in self._condities
+                              if c.veld not in Partitie._fields])
+            self._records[partitie] = records if test is None else list(filter(test, records))
+        return self._records[partitie]
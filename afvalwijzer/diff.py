@@ -0,0 +1,314 @@
+import csv
+import logging
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from io import StringIO
+from itertools import groupby
+from pathlib import Path
+from typing import NamedTuple
+from xml.sax.saxutils import escape
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from afvalwijzer.content import labels
+from afvalwijzer.models import Adres, Brongegeven, Regel
+
+logger = logging.getLogger(__name__)
+
+# Woonfunctie, stadsdeel, plaatsnaam en buurtnaam: het begin van
+# `content.sorteervolgorde`.
+BuurtSleutel = tuple[bool, str, str, str]
+
+REGEL_GEWIJZIGD = 'regel gewijzigd'
+REGEL_TOEGEVOEGD = 'regel toegevoegd'
+REGEL_VERWIJDERD = 'regel verwijderd'
+ADRES_VERPLAATST = 'adres verplaatst'
+ADRES_TOEGEVOEGD = 'adres toegevoegd'
+ADRES_VERWIJDERD = 'adres verwijderd'
+
+
+class Wijziging(NamedTuple):
+    """Eén verschil tussen twee snapshots, in één buurt en voor één fractie.
+
+    Bij een regel (gewijzigd, toegevoegd of verwijderd) is `aantal_adressen`
+    het aantal adressen waar de regel geldt en is `adres` leeg. Bij een adres
+    (verplaatst, toegevoegd of verwijderd) staan in `oud` en `nieuw` de regels
+    die voor en na op het adres gelden.
+    """
+    soort: str
+    woonfunctie: bool
+    stadsdeel: str
+    plaatsnaam: str
+    buurtnaam: str
+    afvalfractie: str
+    adres: str | None
+    aantal_adressen: int | None
+    oud: str | None
+    nieuw: str | None
+
+
+class NietGesorteerdError(ValueError):
+    """Een snapshot is niet per buurt gesorteerd zoals `content.samenvatting`."""
+
+
+def buurt_sleutel(r: Brongegeven) -> BuurtSleutel:
+    return tuple('' if v is None else v for v in r[:4])
+
+
+def buurten(data: Iterable[Brongegeven], naam: str,
+            ) -> Iterator[tuple[BuurtSleutel, list[Brongegeven]]]:
+    """Levert de records per buurt, in de volgorde van `content.samenvatting`.
+
+    Alleen de records van één buurt staan tegelijk in het geheugen. Komt een
+    buurt voor een buurt die eerder al geweest is, dan is de snapshot niet
+    gesorteerd en kan hij niet stroomsgewijs vergeleken worden.
+    """
+    vorige = None
+    for sleutel, records in groupby(data, buurt_sleutel):
+        if vorige is not None and sleutel <= vorige:
+            raise NietGesorteerdError(
+                f'{naam} is niet per buurt gesorteerd ({sleutel[3]!r} na'
+                f' {vorige[3]!r}). Schrijf de snapshot eerst naar .sqlite,'
+                f' dat wel gesorteerd is.')
+        vorige = sleutel
+        yield sleutel, list(records)
+
+
+def diff(oud: Iterable[Brongegeven], nieuw: Iterable[Brongegeven],
+         ) -> Iterator[Wijziging]:
+    """Vergelijkt twee snapshots buurt voor buurt.
+
+    Beide snapshots worden als stroom gelezen en op buurt samengevoegd
+    (merge join), zoals twee gesorteerde lijsten. Er staan dus nooit meer
+    dan twee buurten in het geheugen.
+    """
+    stroom_oud = buurten(oud, 'De oude snapshot')
+    stroom_nieuw = buurten(nieuw, 'De nieuwe snapshot')
+    a = next(stroom_oud, None)
+    b = next(stroom_nieuw, None)
+
+    while a is not None or b is not None:
+        if b is None or (a is not None and a[0] < b[0]):
+            yield from buurt_diff(a[0], a[1], [])
+            a = next(stroom_oud, None)
+        elif a is None or b[0] < a[0]:
+            yield from buurt_diff(b[0], [], b[1])
+            b = next(stroom_nieuw, None)
+        else:
+            yield from buurt_diff(a[0], a[1], b[1])
+            a = next(stroom_oud, None)
+            b = next(stroom_nieuw, None)
+
+
+def buurt_diff(sleutel: BuurtSleutel, oud: list[Brongegeven],
+               nieuw: list[Brongegeven]) -> Iterator[Wijziging]:
+    """De wijzigingen in één buurt, per fractie.
+
+    Een regel die verdwijnt en een nieuwe regel die op precies dezelfde
+    adressen gaat gelden, zijn samen één gewijzigde regel. Die adressen tellen
+    dan niet als verplaatst. Adressen die met hun regel verdwijnen of
+    verschijnen worden niet apart genoemd.
+    """
+    def per_fractie(data: list[Brongegeven]) -> dict[str, dict[Regel, set[Adres]]]:
+        d = defaultdict(lambda: defaultdict(set))
+        for r in data:
+            d[r.afvalfractie][r.regel].add(r.adres)
+        return d
+
+    fracties_oud = per_fractie(oud)
+    fracties_nieuw = per_fractie(nieuw)
+
+    def wijziging(soort: str, fractie: str, adres: Adres | None = None,
+                  aantal: int | None = None, regels_oud: Iterable[Regel] = (),
+                  regels_nieuw: Iterable[Regel] = ()) -> Wijziging:
+        return Wijziging(soort, *sleutel, fractie,
+                         adres_tekst(adres) if adres else None, aantal,
+                         regels_tekst(regels_oud), regels_tekst(regels_nieuw))
+
+    for fractie in sorted(fracties_oud.keys() | fracties_nieuw.keys()):
+        regels_oud = fracties_oud.get(fractie, {})
+        regels_nieuw = fracties_nieuw.get(fractie, {})
+
+        verwijderd = {r: None for r in regels_oud if r not in regels_nieuw}
+        toegevoegd = {r: None for r in regels_nieuw if r not in regels_oud}
+
+        # Oude regel -> nieuwe regel met dezelfde adressen.
+        vervangen = {}
+        for regel in verwijderd:
+            for kandidaat in toegevoegd:
+                if (kandidaat not in vervangen.values()
+                        and regels_oud[regel] == regels_nieuw[kandidaat]):
+                    vervangen[regel] = kandidaat
+                    break
+
+        for regel, opvolger in vervangen.items():
+            yield wijziging(REGEL_GEWIJZIGD, fractie,
+                            aantal=len(regels_oud[regel]),
+                            regels_oud=[regel], regels_nieuw=[opvolger])
+        for regel in verwijderd:
+            if regel not in vervangen:
+                yield wijziging(REGEL_VERWIJDERD, fractie,
+                                aantal=len(regels_oud[regel]), regels_oud=[regel])
+        for regel in toegevoegd:
+            if regel not in vervangen.values():
+                yield wijziging(REGEL_TOEGEVOEGD, fractie,
+                                aantal=len(regels_nieuw[regel]), regels_nieuw=[regel])
+
+        adressen_oud = defaultdict(set)
+        for regel, adressen in regels_oud.items():
+            for adres in adressen:
+                adressen_oud[adres].add(vervangen.get(regel, regel))
+        adressen_nieuw = defaultdict(set)
+        for regel, adressen in regels_nieuw.items():
+            for adres in adressen:
+                adressen_nieuw[adres].add(regel)
+
+        # Bij een gewijzigde regel de oude tekst tonen.
+        terug = {v: k for k, v in vervangen.items()}
+
+        for adres in sorted(adressen_oud.keys() | adressen_nieuw.keys(),
+                            key=adres_volgorde):
+            voor, na = adressen_oud.get(adres, set()), adressen_nieuw.get(adres, set())
+            if voor == na:
+                continue
+            voor = [terug.get(regel, regel) for regel in voor]
+            if not voor:
+                if all(regel in toegevoegd for regel in na):
+                    continue    # Staat al bij de toegevoegde regel.
+                soort = ADRES_TOEGEVOEGD
+            elif not na:
+                if all(regel in verwijderd for regel in voor):
+                    continue    # Staat al bij de verwijderde regel.
+                soort = ADRES_VERWIJDERD
+            else:
+                soort = ADRES_VERPLAATST
+            yield wijziging(soort, fractie, adres,
+                            regels_oud=voor, regels_nieuw=na)
+
+
+def adres_volgorde(adres: Adres) -> tuple[str, int, str]:
+    return adres.straatnaam or '', adres.huisnummer, adres.toevoeging or ''
+
+
+def adres_tekst(adres: Adres) -> str:
+    return f'{adres.straatnaam} {adres.huisnummer}{adres.toevoeging or ""}'
+
+
+def regels_tekst(regels: Iterable[Regel]) -> str | None:
+    teksten = sorted(
+        '; '.join(f'{label}: {text}' for label, text in labels(regel))
+        for regel in regels
+    )
+    return ' | '.join(teksten) if teksten else None
+
+
+def write(file_out: str | Path, wijzigingen: Iterable[Wijziging],
+          titel: str = 'Wijzigingen in de afvalwijzer') -> int:
+    """Schrijft de wijzigingen naar een csv-, xlsx- of docx-bestand.
+
+    :return: Het aantal wijzigingen.
+    """
+    format = Path(file_out).suffix.lower()
+
+    if format == '.csv':
+        return write_csv(file_out, wijzigingen)
+    elif format == '.xlsx':
+        return write_xlsx(file_out, wijzigingen)
+    elif format == '.docx':
+        return write_docx(file_out, wijzigingen, titel)
+    else:
+        raise ValueError(f'Unsupported file format: {format!r}')
+
+
+def write_csv(file_out: str | Path, wijzigingen: Iterable[Wijziging]) -> int:
+    aantal = 0
+    with open(file_out, 'w', newline='', encoding='utf-8') as f_out:
+        writer = csv.writer(f_out)
+        writer.writerow(tuple(s.capitalize() for s in Wijziging._fields))
+        for aantal, wijziging in enumerate(wijzigingen, start=1):
+            writer.writerow(wijziging)
+    return aantal
+
+
+def write_xlsx(file_out: str | Path, wijzigingen: Iterable[Wijziging]) -> int:
+    from openpyxl import Workbook
+    from openpyxl.worksheet.table import Table, TableStyleInfo
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'Wijzigingen'
+
+    ws.append(tuple(s.capitalize() for s in Wijziging._fields))
+    aantal = 0
+    for aantal, wijziging in enumerate(wijzigingen, start=1):
+        ws.append(wijziging)
+
+    if aantal:
+        tbl = Table(displayName='Wijzigingen', ref=ws.dimensions)
+        tbl.tableStyleInfo = TableStyleInfo(name='TableStyleMedium9',
+                                            showRowStripes=True)
+        ws.add_table(tbl)
+    wb.save(file_out)
+    return aantal
+
+
+def write_docx(file_out: str | Path, wijzigingen: Iterable[Wijziging],
+               titel: str) -> int:
+    """Schrijft de wijzigingen als document op het sjabloon van de
+    afvalwijzer: een hoofdstuk per buurt, een sectie per fractie.
+    """
+    from afvalwijzer.io.docx import (
+        TEMPLATE_DOCX, DocumentXML, replace_dates, replace_text,
+    )
+
+    xml = DocumentXML()
+    buf = StringIO()
+    buf.write(xml.document_start())
+    buf.write(xml.cover_page(escape(titel)))
+    buf.write(xml.page_layout(1))
+
+    aantal = 0
+    for buurt, buurt_wijzigingen in groupby(
+            wijzigingen, lambda w: (w.stadsdeel, w.plaatsnaam, w.buurtnaam,
+                                    w.woonfunctie)):
+        stadsdeel, _, buurtnaam, woonfunctie = buurt
+        bewoners = 'bewoners' if woonfunctie else 'bedrijven'
+        buf.write(xml.section(1, escape(f'{buurtnaam} ({bewoners})')))
+        buf.write(xml.text(escape(f'Stadsdeel {stadsdeel}')))
+        for fractie, fractie_wijzigingen in groupby(buurt_wijzigingen,
+                                                    lambda w: w.afvalfractie):
+            buf.write(xml.section(2, escape(fractie)))
+            for w in fractie_wijzigingen:
+                aantal += 1
+                if w.adres:
+                    buf.write(xml.list_item(escape(f'{w.adres}: {w.soort}')))
+                else:
+                    buf.write(xml.text(escape(
+                        f'{w.soort.capitalize()} ({w.aantal_adressen} adressen)')))
+                if w.oud:
+                    buf.write(xml.label_item('Oud', escape(w.oud)))
+                if w.nieuw:
+                    buf.write(xml.label_item('Nieuw', escape(w.nieuw)))
+        buf.write(xml.page_break())
+
+    if not aantal:
+        buf.write(xml.text('Er zijn geen wijzigingen.'))
+
+    buf.write(xml.page_layout(2))
+    buf.write(xml.document_end())
+
+    with ZipFile(TEMPLATE_DOCX) as tpl:
+        with ZipFile(file_out, 'w', ZIP_DEFLATED, compresslevel=9) as doc:
+            doc.comment = tpl.comment
+            for item in tpl.infolist():
+                if item.filename == 'word/document.xml':
+                    doc.writestr(item, buf.getvalue())
+                elif item.filename in ('word/header1.xml', 'word/header2.xml',
+                                       'docProps/core.xml', 'customXml/item1.xml'):
+                    text = tpl.read(item.filename)
+                    text = replace_dates(text)
+                    text = replace_text(text, '{Titel}', escape(titel))
+                    doc.writestr(item, text)
+                else:
+                    doc.writestr(item, tpl.read(item.filename))
+
+    return aantal
@@ -0,0 +1,238 @@
+from argparse import ArgumentParser, Namespace
+from collections.abc import Callable, Collection, Sequence
+from typing import Any, NamedTuple
+
+from afvalwijzer.models import Brongegeven
+
+
+class Prefix(NamedTuple):
+    """Filtert op het begin van een tekstveld, zonder hoofdletterverschil.
+
+    Bijvoorbeeld `{'straatnaam': Prefix('prinsen')}`.
+    """
+    tekst: str
+
+
+class Bereik(NamedTuple):
+    """Filtert op een bereik van getallen, inclusief de grenzen. Een open
+    grens is None.
+
+    Bijvoorbeeld `{'huisnummer': Bereik(1, 99)}`.
+    """
+    van: int | None
+    tot: int | None
+
+
+class Conditie(NamedTuple):
+    """Eén voorwaarde op één veld van `Brongegeven`.
+
+    `soort` is "=", "in", "prefix" of "bereik".
+    """
+    veld: str
+    soort: str
+    waarde: Any
+
+
+def condities(filters: dict[str, Any]) -> list[Conditie]:
+    """Zet de `filters` van `read()` om in condities.
+
+    Een filter is een veld van `Brongegeven` met als waarde:
+
+    - een enkele waarde: het veld moet daaraan gelijk zijn;
+    - een lijst, tuple of set: het veld moet een van die waarden hebben;
+    - een `Prefix`: het veld moet met die tekst beginnen;
+    - een `Bereik`: het veld moet binnen dat bereik liggen.
+    """
+    result = []
+    for veld, waarde in filters.items():
+        if veld not in Brongegeven._fields:
+            raise ValueError(f'Onbekend filter: {veld!r}')
+        if isinstance(waarde, Prefix):
+            result.append(Conditie(veld, 'prefix', waarde.tekst.casefold()))
+        elif isinstance(waarde, Bereik):
+            result.append(Conditie(veld, 'bereik', waarde))
+        elif isinstance(waarde, (list, tuple, set, frozenset)):
+            result.append(Conditie(veld, 'in', frozenset(waarde)))
+        else:
+            result.append(Conditie(veld, '=', waarde))
+    return result
+
+
+def predicate(filters: dict[str, Any] | list[Conditie],
+              fields: Sequence[str] = Brongegeven._fields,
+              ) -> Callable[[Sequence], bool] | None:
+    """Maakt één functie die een rij (tuple of lijst met velden in de volgorde
+    van `fields`) test op alle filters. Geeft None als er niets te filteren
+    is.
+
+    De functie wordt één keer gegenereerd als één Python-expressie, zodat het
+    testen van een rij zo min mogelijk functieaanroepen kost. De waarden van de
+    filters komen in de namespace, niet in de broncode.
+    """
+    if isinstance(filters, dict):
+        filters = condities(filters)
+    if not filters:
+        return None
+
+    namespace = {}
+    delen = []
+    for n, conditie in enumerate(filters):
+        veld = f'r[{fields.index(conditie.veld)}]'
+        waarde = f'v{n}'
+        if conditie.soort == '=':
+            namespace[waarde] = conditie.waarde
+            delen.append(f'{veld} == {waarde}')
+        elif conditie.soort == 'in':
+            namespace[waarde] = conditie.waarde
+            delen.append(f'{veld} in {waarde}')
+        elif conditie.soort == 'prefix':
+            namespace[waarde] = conditie.waarde
+            delen.append(f'({veld} or "").casefold().startswith({waarde})')
+        elif conditie.soort == 'bereik':
+            van, tot = conditie.waarde
+            if van is not None:
+                namespace[f'{waarde}_van'] = van
+                delen.append(f'{waarde}_van <= {veld}')
+            if tot is not None:
+                namespace[f'{waarde}_tot'] = tot
+                delen.append(f'{veld} <= {waarde}_tot')
+        else:
+            raise ValueError(f'Onbekende conditie: {conditie.soort!r}')
+
+    if not delen:
+        return None
+    return eval(f'lambda r: {" and ".join(delen)}', namespace)
+
+
+def sql_where(filters: dict[str, Any] | list[Conditie],
+              kolommen: dict[str, str] | None = None,
+              ) -> tuple[list[str], list[Any]]:
+    """Zet de filters om in sql-voorwaarden met `?` als placeholder (sqlite).
+
+    :param dict kolommen: De kolom van elk veld. Standaard de veldnaam zelf.
+    :return: De voorwaarden (samen te voegen met AND) en de parameters.
+    """
+    if isinstance(filters, dict):
+        filters = condities(filters)
+
+    voorwaarden = []
+    params = []
+    for conditie in filters:
+        kolom = (kolommen or {}).get(conditie.veld, conditie.veld)
+        if conditie.soort == '=':
+            voorwaarden.append(f'{kolom} = ?')
+            params.append(conditie.waarde)
+        elif conditie.soort == 'in':
+            waarden = sorted(conditie.waarde, key=repr)
+            voorwaarden.append(f'{kolom} IN ({", ".join("?" * len(waarden))})')
+            params.extend(waarden)
+        elif conditie.soort == 'prefix':
+            voorwaarden.append(f"{kolom} LIKE ? ESCAPE '\\'")
+            params.append(like_prefix(conditie.waarde))
+        elif conditie.soort == 'bereik':
+            van, tot = conditie.waarde
+            if van is not None:
+                voorwaarden.append(f'{kolom} >= ?')
+                params.append(van)
+            if tot is not None:
+                voorwaarden.append(f'{kolom} <= ?')
+                params.append(tot)
+    return voorwaarden, params
+
+
+def parse_bereik(tekst: str) -> Bereik:
+    """Leest een bereik zoals "1-99", "100-", "-50" of "12".
+    """
+    van, _, tot = tekst.partition('-')
+    if not _:
+        tot = van
+    return Bereik(int(van) if van.strip() else None,
+                  int(tot) if tot.strip() else None)
+
+
+def add_arguments(parser: ArgumentParser) -> None:
+    """Voegt de filteropties van `app.py` toe aan een `ArgumentParser`. Zie
+    `from_args()`.
+    """
+    parser.add_argument('--stadsdeel', nargs='+', help='Verwerkt alleen de regels voor dit stadsdeel (of deze stadsdelen).')
+    parser.add_argument('--buurt', nargs='+', help='Verwerkt alleen de regels voor deze buurt(en).')
+    parser.add_argument('--fractie', nargs='+', help='Verwerkt alleen de regels voor deze afvalfractie(s).')
+    parser.add_argument('--straat', metavar='BEGIN', help='Verwerkt alleen de adressen in straten die zo beginnen.')
+    parser.add_argument('--huisnummers', type=parse_bereik, metavar='VAN-TOT', help='Verwerkt alleen de adressen met deze huisnummers, bijvoorbeeld 1-99 of 100-.')
+    group = parser.add_mutually_exclusive_group(required=False)
+    group.add_argument('--bewoners', action='store_true', help='Verwerkt alleen de regels voor bewoners.')
+    group.add_argument('--bedrijven', action='store_true', help='Verwerkt alleen de regels voor bedrijven.')
+
+
+def from_args(args: Namespace) -> dict[str, Any]:
+    """De filters uit de opties van `add_arguments()`.
+    """
+    def een_of_meer(waarden: list[str]) -> str | list[str]:
+        # Eén waarde als filter op gelijkheid, meer waarden als lijst (IN).
+        return waarden[0] if len(waarden) == 1 else waarden
+
+    filters = {}
+
+    if args.bewoners:
+        filters['woonfunctie'] = True
+    elif args.bedrijven:
+        filters['woonfunctie'] = False
+    if args.stadsdeel:
+        filters['stadsdeel'] = een_of_meer(args.stadsdeel)
+    if args.buurt:
+        filters['buurtnaam'] = een_of_meer(args.buurt)
+    if args.fractie:
+        filters['afvalfractie'] = een_of_meer(args.fractie)
+    if args.straat:
+        filters['straatnaam'] = Prefix(args.straat)
+    if args.huisnummers:
+        filters['huisnummer'] = args.huisnummers
+
+    return filters
+
+
+def to_json(filters: dict[str, Any]) -> dict[str, Any]:
+    """Maakt de filters geschikt voor JSON. Zie `from_json()`.
+    """
+    def waarde(w: Any) -> Any:
+        if isinstance(w, Prefix):
+            return {'prefix': w.tekst}
+        if isinstance(w, Bereik):
+            return {'van': w.van, 'tot': w.tot}
+        if isinstance(w, (list, tuple, set, frozenset)):
+            return sorted(w, key=repr)
+        return w
+
+    return {veld: waarde(w) for veld, w in filters.items()}
+
+
+def from_json(filters: dict[str, Any]) -> dict[str, Any]:
+    """Zet filters uit JSON (zie `to_json()`) weer om.
+    """
+    def waarde(w: Any) -> Any:
+        if isinstance(w, dict) and 'prefix' in w:
+            return Prefix(w['prefix'])
+        if isinstance(w, dict):
+            return Bereik(w.get('van'), w.get('tot'))
+        return w
+
+    return {veld: waarde(w) for veld, w in filters.items()}
+
+
+def like_prefix(tekst: str) -> str:
+    """Een LIKE-patroon voor alles dat met `tekst` begint.
+    """
+    tekst = tekst.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'{tekst}%'
+
+
+def tekst(waarde: Any) -> str:
+    """De waarde van een filter als leesbare tekst, bijvoorbeeld in een titel.
+    """
+    if isinstance(waarde, Prefix):
+        return f'{waarde.tekst}…'
+    if isinstance(waarde, Bereik):
+        return f'{"" if waarde.van is None else waarde.van}–{"" if waarde.tot is None else waarde.tot}'
+    if isinstance(waarde, Collection) and not isinstance(waarde, str):
+        return ', '.join(map(str, sorted(waarde, key=str)))
+    return str(waarde)
@@ -1,57 +1,115 @@
-from collections.abc import Iterable, Iterator
+import logging
+from collections.abc import Callable, Iterable, Iterator
+from importlib import import_module
 from pathlib import Path
+from typing import NamedTuple
 
+from afvalwijzer import profiling
 from afvalwijzer.models import Brongegeven
 
+logger = logging.getLogger(__name__)
 
-def read(file_in: str | Path, filters: dict[str, bool | int | str],
-         ) -> Iterator[Brongegeven]:
-    """Leest de Afvalwijzer data-export vanuit PowerBI (xlsx).
+
+class Format(NamedTuple):
+    """Een bestandsformaat en wat het kan.
+
+    De module van het formaat (`afvalwijzer.io.<module>`) wordt pas
+    geïmporteerd als er echt mee gelezen of geschreven wordt. Zo betaalt een
+    conversie van zip naar docx niet voor psycopg, openpyxl of fpdf2.
     """
-    format = Path(file_in).suffix.lower()
+    module: str
+    extensies: tuple[str, ...]
+    lezen: bool
+    schrijven: bool
+    # Verwerkt de records één voor één, zonder ze allemaal in het geheugen te
+    # houden (om te sorteren of samen te vatten).
+    streaming: bool
+
+
+FORMATS = (
+    Format('csv', ('.csv',), lezen=True, schrijven=True, streaming=True),
+    Format('docx', ('.docx',), lezen=False, schrijven=True, streaming=False),
+    Format('html', ('.html', '.htm'), lezen=False, schrijven=True, streaming=False),
+    Format('pdf', ('.pdf',), lezen=False, schrijven=True, streaming=False),
+    Format('sqlite', ('.sqlite', '.sqlite3', '.db'), lezen=True, schrijven=True, streaming=False),
+    Format('xlsx', ('.xlsx',), lezen=True, schrijven=True, streaming=False),
+    Format('db', ('.yaml',), lezen=True, schrijven=True, streaming=True),
+    Format('zip', ('.zip',), lezen=True, schrijven=True, streaming=True),
+)
+
+_EXTENSIES = {extensie: fmt for fmt in FORMATS for extensie in fmt.extensies}
+
+
+def format_van(path: str | Path) -> Format:
+    """Het formaat van een bestand, op basis van de extensie.
+    """
+    extensie = Path(path).suffix.lower()
+    try:
+        return _EXTENSIES[extensie]
+    except KeyError:
+        raise ValueError(f'Unsupported file format: {extensie!r}') from None
+
+
+def reader(path: str | Path) -> Callable[..., Iterator[Brongegeven]]:
+    """De `read()` van het formaat van `path`. Importeert de module pas nu.
+    """
+    fmt = format_van(path)
+    if not fmt.lezen:
+        raise NotImplementedError(f'{Path(path).suffix} is geen bestandsformaat'
+                                  f' om brongegevens uit te lezen.')
+    return import_module(f'{__name__}.{fmt.module}').read
 
-    if format == '.csv':
-        from .csv import read as _read
-    elif format == '.docx':
-        from .docx import read as _read
-    elif format == '.pdf':
-        from .pdf import read as _read
-    elif format == '.xlsx':
-        from .xlsx import read as _read
-    elif format == '.yaml':
-        from .db import read as _read
-    elif format == '.zip':
-        from .zip import read as _read
-    else:
-        raise ValueError(f'Unsupported file format: {format!r}')
 
-    return _read(file_in, filters)
+def writer(path: str | Path) -> Callable[..., None]:
+    """De `write()` van het formaat van `path`. Importeert de module pas nu.
+    """
+    fmt = format_van(path)
+    if not fmt.schrijven:
+        raise NotImplementedError(f'Het is (nog) niet mogelijk om naar'
+                                  f' {Path(path).suffix} te schrijven.')
+    return import_module(f'{__name__}.{fmt.module}').write
 
 
+def read(file_in: str | Path, filters: dict[str, bool | int | str],
+         **options) -> Iterator[Brongegeven]:
+    """Leest de Afvalwijzer data-export vanuit PowerBI (xlsx).
+
+    Eventuele `options` worden doorgegeven aan de reader, bijvoorbeeld
+    `processes` voor csv en zip. Net als bij `write()` worden opties die de
+    reader niet kent met een waarschuwing genegeerd.
+    """
+    _read = reader(file_in)
+    format = Path(file_in).suffix.lower()
+    options = bruikbare_opties(_read, options, format)
+    return profiling.iterate(f'read {format}', _read(file_in, filters, **options))
+
 
 def write(file_out: str | Path, data: Iterable[Brongegeven],
-          filters: dict[str, bool | int | str]) -> None:
+          filters: dict[str, bool | int | str], **options) -> None:
     """Schrijft de regels uit de Afvalwijzer naar het bestand.
 
     Afhankelijk van het gekozen bestandsformaat worden de regels weggeschreven
     als ruwe data (dit geldt onder andere voor csv en xlsx) of in samengevatte
     menselijk leesbare vorm (onder andere pdf).
+
+    Eventuele `options` worden doorgegeven aan de writer van het gekozen
+    bestandsformaat, bijvoorbeeld `processes` voor pdf. Opties die de writer
+    niet kent worden met een waarschuwing genegeerd.
     """
+    _write = writer(file_out)
     format = Path(file_out).suffix.lower()
+    options = bruikbare_opties(_write, options, format)
+
+    with profiling.stage(f'write {format}'):
+        return _write(file_out, data, filters, **options)
+
+
+def bruikbare_opties(func: Callable, options: dict, format: str) -> dict:
+    """Alleen de `options` die `func` kent; de rest met een waarschuwing.
+    """
+    from inspect import signature
 
-    if format == '.csv':
-        from .csv import write as _write
-    elif format == '.docx':
-        from .docx import write as _write
-    elif format == '.pdf':
-        from .pdf import write as _write
-    elif format == '.xlsx':
-        from .xlsx import write as _write
-    elif format == '.yaml':
-        from .db import write as _write
-    elif format == '.zip':
-        from .zip import write as _write
-    else:
-        raise ValueError(f'Unsupported file format: {format!r}')
-
-    return _write(file_out, data, filters)
+    parameters = signature(func).parameters
+    for name in options.keys() - parameters.keys():
+        logger.warning(f'Optie {name!r} wordt niet gebruikt voor {format}.')
+    return {name: value for name, value in options.items() if name in parameters}
@@ -1,11 +1,15 @@
 import csv
 import logging
-from collections.abc import Iterable, Iterator, Callable
+from collections import deque
+from collections.abc import Iterable, Iterator
+from io import StringIO
+from itertools import starmap
 from operator import itemgetter
 from pathlib import Path
 from typing import TextIO
 
 from afvalwijzer.file_tools import open_file
+from afvalwijzer.filters import predicate
 from afvalwijzer.models import Brongegeven
 
 logger = logging.getLogger(__name__)
@@ -13,54 +17,147 @@ logger = logging.getLogger(__name__)
 DELIMITER = ','
 QUOTECHAR = '"'
 
+# Zoveel tekens per deel bij het parsen over meerdere processen.
+CHUNK_SIZE = 1 << 22
+
 
 def read(file_in: str | Path | TextIO, filters: dict[str, bool | int | str],
-         ) -> Iterator[Brongegeven]:
+         *, processes: int = 1) -> Iterator[Brongegeven]:
     """Leest de Afvalwijzer brongegevens uit het csv-bestand.
+
+    De filters worden getest op de rij met de juiste types (woonfunctie als
+    bool, huisnummer als int), voordat er een `Brongegeven` van gemaakt wordt.
+
+    Met `processes` > 1 wordt het bestand in delen van hele records gesplitst
+    (zie `chunks()`), die verdeeld over meerdere processen geparst en
+    gefilterd worden. De records komen in de oorspronkelijke volgorde.
     """
-    def filters_fcn() -> Callable[[list[str]], bool]:
-        """Filtert rijen uit de csv op basis van `filters`.
-        """
-        key = itemgetter(*(
-            Brongegeven._fields.index(fld)
-            for fld in filters.keys()
-        ))
-        val = tuple(map(str, filters.values()))
+    with open_file(file_in, 'r', encoding='utf-8', newline='') as f_in:
+        if processes > 1:
+            header = next(csv.reader([f_in.readline()], delimiter=DELIMITER,
+                                     quotechar=QUOTECHAR))
+            yield from read_parallel(f_in, kolommen(header), filters, processes)
+            return
+
+        reader = csv.reader(f_in, delimiter=DELIMITER, quotechar=QUOTECHAR)
+        yield from parse(reader, kolommen(next(reader)), filters)
 
-        def func(x: list[str]) -> bool: return key(x) == val
 
-        return func
+def kolommen(header: list[str]) -> list[int] | None:
+    """De posities van de velden van `Brongegeven` in de header, of `None` als
+    die al in de goede volgorde staan.
+    """
+    header = tuple(s.lower() for s in header)
+    if header == Brongegeven._fields:
+        return None
+    try:
+        return [header.index(fld) for fld in Brongegeven._fields]
+    except ValueError:
+        logger.warning(header)
+        logger.warning(Brongegeven._fields)
+        raise ValueError('De header van het csv-bestand wordt niet herkend.')
+
+
+def parse(reader: Iterable[list[str]], index: list[int] | None,
+          filters: dict[str, bool | int | str]) -> Iterator[Brongegeven]:
+    """Maakt brongegevens van de rijen van een csv-reader (zonder header).
+    """
+    return starmap(Brongegeven, parse_rows(reader, index, filters))
 
-    def parse_line(line: list[str | bool | int]) -> Brongegeven:
-        """Zet een csv regel om in een `Brongegeven`.
+
+def parse_rows(reader: Iterable[list[str]], index: list[int] | None,
+               filters: dict[str, bool | int | str],
+               ) -> Iterator[list[str | bool | int]]:
+    """Zet de rijen van een csv-reader om naar de velden van `Brongegeven`,
+    met de juiste types, en laat alleen de rijen door die aan de filters
+    voldoen.
+    """
+    def parse_line(line: list[str | bool | int]) -> list[str | bool | int]:
+        """Zet de velden van een csv regel om naar de juiste types.
         """
         line[woonfunctie_index] = line[woonfunctie_index] != 'False'
         line[huisnummer_index] = int(line[huisnummer_index])
-        return Brongegeven(*line)
+        return line
 
     woonfunctie_index = Brongegeven._fields.index('woonfunctie')
     huisnummer_index = Brongegeven._fields.index('huisnummer')
 
-    with open_file(file_in, 'r', encoding='utf-8', newline='') as f_in:
-        reader = csv.reader(f_in, delimiter=DELIMITER, quotechar=QUOTECHAR)
+    if index is not None:
+        reader = map(list, map(itemgetter(*index), reader))
 
-        header = tuple(s.lower() for s in next(reader))
+    reader = map(parse_line, reader)
+    if filters:
+        reader = filter(predicate(filters), reader)
 
-        if header != Brongegeven._fields:
-            try:
-                index = [header.index(fld) for fld in Brongegeven._fields]
-            except ValueError:
-                logger.warning(header)
-                logger.warning(Brongegeven._fields)
-                raise ValueError('De header van het csv-bestand wordt niet herkend.')
-            else:
-                reader = map(itemgetter(*index), reader)
+    return reader
 
-        if filters:
-            reader = filter(filters_fcn(), reader)
 
-        for record in map(parse_line, reader):
-            yield record
+def chunks(f_in: TextIO, size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Leest `f_in` in delen van ongeveer `size` tekens, die elk op de grens
+    tussen twee records eindigen.
+
+    Een regeleinde is alleen een grens als er een even aantal
+    aanhalingstekens voor staat; anders staat het binnen een veld, zoals een
+    opmerking of melding van meer regels. Een "" binnen een veld telt voor
+    twee en verandert dat dus niet. Omdat elk deel op een grens begint, hoeft
+    alleen binnen het deel zelf geteld te worden.
+    """
+    rest = ''
+    while block := f_in.read(size):
+        block = rest + block
+        quotes = block.count(QUOTECHAR)
+        end = block.rfind('\n')
+        while end >= 0 and (quotes - block.count(QUOTECHAR, end)) % 2:
+            end = block.rfind('\n', 0, end)
+        # Zonder grens (één heel lang veld) wordt het deel groter.
+        rest = block[end + 1:]
+        if end >= 0:
+            yield block[:end + 1]
+    if rest:
+        yield rest
+
+
+def parse_chunk(chunk: str, index: list[int] | None,
+                filters: dict[str, bool | int | str]) -> list[tuple]:
+    """Parst en filtert één deel van `chunks()`, in een werkproces.
+
+    Gelijke teksten (de regels, straat- en buurtnamen) worden één object,
+    zodat pickle ze maar één keer naar het hoofdproces stuurt. Dat scheelt
+    zo'n 80% van de overdracht, en de records delen daarna hun teksten. Het
+    hoofdproces maakt er `Brongegeven`s van.
+    """
+    reader = csv.reader(StringIO(chunk, newline=''), delimiter=DELIMITER,
+                        quotechar=QUOTECHAR)
+    teksten = {}
+    reader = ([teksten.setdefault(v, v) for v in row] for row in reader)
+    return list(map(tuple, parse_rows(reader, index, filters)))
+
+
+def read_parallel(f_in: TextIO, index: list[int] | None,
+                  filters: dict[str, bool | int | str], processes: int,
+                  ) -> Iterator[Brongegeven]:
+    """Verdeelt de delen van `f_in` over `processes` werkprocessen en geeft de
+    records in de oorspronkelijke volgorde.
+
+    Er zijn hooguit twee delen per proces tegelijk onderweg, zodat het lezen
+    (en uitpakken) niet verder vooruitloopt dan nodig en het geheugengebruik
+    begrensd blijft.
+    """
+    # Hier pas importeren: multiprocessing kost opstarttijd (zie `io.FORMATS`).
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        onderweg = deque()
+        try:
+            for chunk in chunks(f_in):
+                onderweg.append(pool.submit(parse_chunk, chunk, index, filters))
+                if len(onderweg) >= 2 * processes:
+                    yield from map(Brongegeven._make, onderweg.popleft().result())
+            while onderweg:
+                yield from map(Brongegeven._make, onderweg.popleft().result())
+        finally:
+            for future in onderweg:
+                future.cancel()
 
 
 def write(file_out: str | Path | TextIO, data: Iterable[Brongegeven],
@@ -1,11 +1,12 @@
 import logging
-from collections.abc import Iterable, Iterator
+from collections.abc import AsyncIterator, Iterable, Iterator
 from pathlib import Path
 
-from psycopg import connect, sql, Connection, OperationalError
+from psycopg import connect, sql, AsyncConnection, Connection, OperationalError
 from yaml import safe_load, dump
 
-from afvalwijzer.models import Brongegeven
+from afvalwijzer.filters import condities, like_prefix
+from afvalwijzer.models import Adres, Brongegeven, Groep, Regel
 
 logger = logging.getLogger(__name__)
 
@@ -47,6 +48,63 @@ BRON_MAP = {
 # van de gehele code. Let op wat je doet...
 assert tuple(BRON_MAP.keys()) == Brongegeven._fields
 
+ADRES_FIELDS = ('straatnaam', 'huisnummer', 'huisletter', 'huisnummertoevoeging')
+
+# Zoveel rijen per keer ophalen van de server.
+FETCH_SIZE = 10_000
+
+# `write()` vervangt tabellen, en mag daarom alleen naar een lokale database.
+LOKAAL = ('localhost', '127.0.0.1', '::1')
+
+# Alleen de kolommen die `brongegevens()` en `groepen()` gebruiken. Zo kan een
+# snapshot in een lokale Postgres geladen worden, om de queries zonder VPN op
+# ware grootte te proberen en te meten.
+SCHEMA = '''
+DROP TABLE IF EXISTS afvalwijzer_afvalwijzer, gebieden_buurten,
+    gebieden_wijken, gebieden_stadsdelen;
+CREATE TABLE gebieden_stadsdelen (
+    id integer PRIMARY KEY,
+    naam text
+);
+CREATE TABLE gebieden_wijken (
+    id integer PRIMARY KEY,
+    ligt_in_stadsdeel_id integer
+);
+CREATE TABLE gebieden_buurten (
+    identificatie integer PRIMARY KEY,
+    naam text,
+    ligt_in_wijk_id integer,
+    eind_geldigheid date
+);
+CREATE TABLE afvalwijzer_afvalwijzer (
+    gbd_buurt_id integer,
+    status_adres text,
+    gebruiksdoel_woonfunctie boolean,
+    woonplaatsnaam text,
+    afvalwijzer_fractie_naam text,
+    afvalwijzer_buttontekst text,
+    afvalwijzer_instructie_2 text,
+    afvalwijzer_ophaaldagen_2 text,
+    afvalwijzer_afvalkalender_frequentie text,
+    afvalwijzer_buitenzetten text,
+    afvalwijzer_waar text,
+    afvalwijzer_afvalkalender_opmerking text,
+    afvalwijzer_afvalkalender_melding text,
+    afvalwijzer_afvalkalender_van text,
+    afvalwijzer_afvalkalender_tot text,
+    straatnaam text,
+    huisnummer integer,
+    huisletter text,
+    huisnummertoevoeging text
+);
+'''
+
+# Pas na het laden aangemaakt: dat is sneller dan bij elke rij bijwerken.
+INDEXES = '''
+CREATE INDEX afvalwijzer_afvalwijzer_buurt ON afvalwijzer_afvalwijzer (gbd_buurt_id);
+ANALYZE afvalwijzer_afvalwijzer, gebieden_buurten, gebieden_wijken, gebieden_stadsdelen;
+'''
+
 
 class ConnectionFailedError(OperationalError):
     """Connecting to the database failed. Most likely VPN is off."""
@@ -72,12 +130,94 @@ def read(file_in: str | Path, filters: dict[str, bool | int | str],
             yield record
 
 
+async def read_async(file_in: str | Path,
+                     filters: dict[str, bool | int | str],
+                     ) -> AsyncIterator[Brongegeven]:
+    """Leest de Afvalwijzer regels direct uit de database, met asyncio.
+
+    Hetzelfde als `read()`, maar het wachten op de database blokkeert de
+    event loop niet. Zo kunnen meerdere queries tegelijk lopen terwijl er
+    elders geschreven wordt (zie `batch.py`).
+    """
+    params = read_params(file_in)
+
+    async with await connect_db_async(params) as conn:
+        async for record in brongegevens_async(conn, filters):
+            yield record
+
+
+def read_groepen(file_in: str | Path, filters: dict[str, bool | int | str],
+                 ) -> Iterator[Groep]:
+    """Leest de Afvalwijzer regels samengevat per buurt, fractie en regel
+    direct uit de database. Zie `groepen()`.
+    """
+    params = read_params(file_in)
+
+    with connect_db(params) as conn:
+        for groep in groepen(conn, filters):
+            yield groep
+
+
 def write(file_out: str | Path, data: Iterable[Brongegeven],
           filters: dict[str, bool | int | str]) -> None:
-    """Schrijft de ruwe Afvalwijzer brongegevens naar de database.
+    """Laadt de Afvalwijzer brongegevens in een lokale database, in de tabellen
+    waar `brongegevens()` uit leest.
+
+    :param str | Path file_out: Naam van een configuratiebestand met
+    verbindingsgegevens van de (lokale) database.
+
+    De tabellen worden opnieuw aangemaakt en met `COPY FROM STDIN` gevuld, in
+    één transactie. Elke buurt krijgt een eigen wijk; de echte wijken staan
+    niet in de brongegevens en doen er voor de queries niet toe.
+    """
+    params = read_params(file_out)
+    if params['host'] not in LOKAAL and not str(params['host']).startswith('/'):
+        raise ValueError(f'Schrijft alleen naar een lokale database, niet naar'
+                         f' {params["host"]}.')
+
+    stadsdelen = {}
+    buurten = {}
+
+    with connect_db(params) as conn, conn.cursor() as cur:
+        cur.execute(SCHEMA)
+
+        with cur.copy('COPY afvalwijzer_afvalwijzer FROM STDIN') as copy:
+            for r in data:
+                stadsdeel_id = stadsdelen.setdefault(r.stadsdeel, len(stadsdelen) + 1)
+                buurt_id = buurten.setdefault((stadsdeel_id, r.buurtnaam), len(buurten) + 1)
+                copy.write_row((
+                    buurt_id, STATUS_ADRES__IN[0], r.woonfunctie, r.plaatsnaam,
+                    r.afvalfractie, *instructie_kolommen(r.instructie),
+                    *r[6:],
+                ))
+
+        with cur.copy('COPY gebieden_stadsdelen FROM STDIN') as copy:
+            for naam, i in stadsdelen.items():
+                copy.write_row((i, naam))
+        with cur.copy('COPY gebieden_wijken FROM STDIN') as copy:
+            for (stadsdeel_id, _), i in buurten.items():
+                copy.write_row((i, stadsdeel_id))
+        with cur.copy('COPY gebieden_buurten (identificatie, naam, ligt_in_wijk_id)'
+                      ' FROM STDIN') as copy:
+            for (_, naam), i in buurten.items():
+                copy.write_row((i, naam, i))
+
+        cur.execute(INDEXES)
+
+    logger.debug(f'{len(stadsdelen)} stadsdelen en {len(buurten)} buurten'
+                 f' geladen in {params["dbname"]}.')
+
+
+def instructie_kolommen(instructie: str | None) -> tuple[str | None, str | None]:
+    """Splitst de instructie weer in buttontekst en instructie, zodat
+    `CONCAT(buttontekst, ' ', instructie)` in `BRON_MAP` hem teruggeeft.
+
+    Zonder spatie is dat niet precies mogelijk: dan komt er een spatie achter.
     """
-    raise NotImplementedError('Het is (nog) niet mogelijk om naar de database'
-                              ' te schrijven.')
+    if instructie is None:
+        return None, None
+    buttontekst, _, rest = instructie.partition(' ')
+    return buttontekst, rest or None
 
 
 def brongegevens(conn: Connection,
@@ -85,6 +225,48 @@ def brongegevens(conn: Connection,
                  ) -> Iterator[Brongegeven]:
     """Haalt alle brongegevens op uit de Afvalwijzer database.
     """
+    query, params = brongegevens_query(filters)
+
+    # Een server-side cursor haalt de rijen in porties op, zodat de verwerking
+    # (of `pipeline.read_ahead`) al kan beginnen voordat alles binnen is.
+    with conn.cursor(name='brongegevens') as cur:
+        cur.itersize = FETCH_SIZE
+        for row in cur.execute(query, params):
+            yield Brongegeven(*row)
+
+
+async def brongegevens_async(conn: AsyncConnection,
+                             filters: dict[str, bool | int | str],
+                             ) -> AsyncIterator[Brongegeven]:
+    """Haalt alle brongegevens op uit de Afvalwijzer database, met asyncio.
+    """
+    query, params = brongegevens_query(filters)
+
+    async with conn.cursor(name='brongegevens') as cur:
+        cur.itersize = FETCH_SIZE
+        await cur.execute(query, params)
+        async for row in cur:
+            yield Brongegeven(*row)
+
+
+def volgorde(kolom: sql.Composable) -> sql.Composable:
+    """Sorteert een tekstkolom zoals Python: op code points, met lege velden
+    vooraan.
+    """
+    return kolom + sql.SQL(' COLLATE "C" NULLS FIRST')
+
+
+def brongegevens_query(filters: dict[str, bool | int | str],
+                       ) -> tuple[sql.Composed, list]:
+    """De query voor `brongegevens()` en zijn parameters.
+
+    De records komen in de volgorde van `content.sorteervolgorde`, op code
+    points en niet op de collatie van de database (die bijvoorbeeld
+    hoofdletters en accenten anders ordent). `diff` leest een db.zip uit
+    deze query stroomsgewijs en rekent op die volgorde.
+    """
+    voorwaarden, filter_params = filter_sql(filters)
+
     query = sql.SQL('''
         SELECT {kolommen}
         FROM afvalwijzer_afvalwijzer aa
@@ -94,47 +276,166 @@ def brongegevens(conn: Connection,
         WHERE aa.status_adres IN ({status})
         AND gb.eind_geldigheid IS NULL
         {filters}
-        ORDER BY {kolommen}
+        ORDER BY {volgorde}
     ''').format(
         kolommen=sql.SQL(', ').join(BRON_MAP.values()),
+        volgorde=sql.SQL(', ').join(
+            kolom if field in ('woonfunctie', 'huisnummer') else
+            # Sorteer 23-H (huis) voor 23-1, net als `sorteervolgorde`.
+            volgorde(sql.SQL("replace(") + kolom + sql.SQL(", 'H', ' ')"))
+            if field == 'huisnummertoevoeging' else
+            volgorde(kolom)
+            for field, kolom in BRON_MAP.items()
+        ),
         status=sql.SQL(', ').join(sql.Placeholder() * len(STATUS_ADRES__IN)),
         filters=sql.SQL('').join(
-            sql.SQL(' AND ') + BRON_MAP[k] + sql.SQL('=') + sql.Placeholder()
-            for k in filters.keys()
+            sql.SQL(' AND ') + voorwaarde for voorwaarde in voorwaarden
         )
     )
-    params = [*STATUS_ADRES__IN, *filters.values()]
+    params = [*STATUS_ADRES__IN, *filter_params]
 
     logger.debug(query.as_string())
+    return query, params
+
+
+def groepen(conn: Connection,
+            filters: dict[str, bool | int | str],
+            ) -> Iterator[Groep]:
+    """Haalt de brongegevens op, door de database al gegroepeerd per buurt,
+    fractie en regel.
 
-    with conn.cursor() as cur:
+    Elke groep heeft de adressen waar de regel geldt als array, gesorteerd
+    zoals in `content.sorteervolgorde` (op code points, met lege velden
+    vooraan). Zo gaat de tekst van een regel maar één keer over de lijn, en
+    hoeft `content.samenvatting` alleen nog de groepen te sorteren.
+    """
+    voorwaarden, filter_params = filter_sql(filters)
+
+    n = len(Brongegeven._fields) - len(ADRES_FIELDS)
+    groep_kolommen = [BRON_MAP[field] for field in Brongegeven._fields[:n]]
+
+    def adres_kolom(field: str) -> sql.Composable:
+        return BRON_MAP[field] + sql.SQL('::text')
+
+    query = sql.SQL('''
+        SELECT {kolommen},
+            array_agg(ARRAY[{adres}] ORDER BY {adres_volgorde})
+        FROM afvalwijzer_afvalwijzer aa
+        JOIN gebieden_buurten gb ON aa.gbd_buurt_id = gb.identificatie
+        JOIN gebieden_wijken gw ON gb.ligt_in_wijk_id = gw.id
+        JOIN gebieden_stadsdelen gs ON gw.ligt_in_stadsdeel_id = gs.id
+        WHERE aa.status_adres IN ({status})
+        AND gb.eind_geldigheid IS NULL
+        {filters}
+        GROUP BY {groep}
+    ''').format(
+        kolommen=sql.SQL(', ').join(groep_kolommen),
+        adres=sql.SQL(', ').join(map(adres_kolom, ADRES_FIELDS)),
+        adres_volgorde=sql.SQL(', ').join((
+            volgorde(BRON_MAP['straatnaam']),
+            BRON_MAP['huisnummer'],
+            volgorde(BRON_MAP['huisletter']),
+            # Sorteer 23-H (huis) voor 23-1, net als `sorteervolgorde`.
+            volgorde(sql.SQL("replace(") + BRON_MAP['huisnummertoevoeging']
+                     + sql.SQL(", 'H', ' ')")),
+        )),
+        status=sql.SQL(', ').join(sql.Placeholder() * len(STATUS_ADRES__IN)),
+        filters=sql.SQL('').join(
+            sql.SQL(' AND ') + voorwaarde for voorwaarde in voorwaarden
+        ),
+        groep=sql.SQL(', ').join(sql.SQL(str(i)) for i in range(1, n + 1)),
+    )
+    params = [*STATUS_ADRES__IN, *filter_params]
+
+    logger.debug(query.as_string())
+
+    with conn.cursor(name='groepen') as cur:
+        cur.itersize = FETCH_SIZE // 100     # Een groep heeft veel adressen.
         for row in cur.execute(query, params):
-            yield Brongegeven(*row)
+            yield Groep(*row[:5], Regel(*row[5:n]), tuple(
+                Adres.samenstellen(straatnaam, int(huisnummer), huisletter,
+                                   huisnummertoevoeging)
+                for straatnaam, huisnummer, huisletter, huisnummertoevoeging
+                in row[n]
+            ))
+
+
+def filter_sql(filters: dict[str, bool | int | str],
+               ) -> tuple[list[sql.Composable], list]:
+    """Zet de filters om in geparametriseerde sql-voorwaarden op de kolommen
+    uit `BRON_MAP`.
+
+    Een lijst waarden wordt `= ANY(%s)` met een array als parameter, zodat de
+    query niet afhangt van het aantal waarden.
+    """
+    voorwaarden = []
+    params = []
+    for conditie in condities(filters):
+        kolom = BRON_MAP[conditie.veld]
+        if conditie.soort == '=':
+            voorwaarden.append(kolom + sql.SQL(' = ') + sql.Placeholder())
+            params.append(conditie.waarde)
+        elif conditie.soort == 'in':
+            voorwaarden.append(kolom + sql.SQL(' = ANY(') + sql.Placeholder() + sql.SQL(')'))
+            params.append(list(conditie.waarde))
+        elif conditie.soort == 'prefix':
+            voorwaarden.append(kolom + sql.SQL(' ILIKE ') + sql.Placeholder())
+            params.append(like_prefix(conditie.waarde))
+        elif conditie.soort == 'bereik':
+            van, tot = conditie.waarde
+            if van is not None:
+                voorwaarden.append(kolom + sql.SQL(' >= ') + sql.Placeholder())
+                params.append(van)
+            if tot is not None:
+                voorwaarden.append(kolom + sql.SQL(' <= ') + sql.Placeholder())
+                params.append(tot)
+    return voorwaarden, params
 
 
 def connect_db(params: dict[str, str | int]) -> Connection:
     """Verbindt met de database of gooit informatieve foutinformatie.
     """
     try:
-        return connect(f'host={params["host"]}'
-                     f' port={params["port"]}'
-                     f' dbname={params["dbname"]}'
-                     f' user={params["user"]}'
-                     f' password={params["password"]}')
+        return connect(conninfo(params))
+    except OperationalError as err:
+        raise verbindingsfout(err)
+
+
+async def connect_db_async(params: dict[str, str | int]) -> AsyncConnection:
+    """Verbindt asynchroon met de database, zoals `connect_db()`.
+
+    Let op: op Windows werkt psycopg alleen met de `SelectorEventLoop`.
+    """
+    try:
+        return await AsyncConnection.connect(conninfo(params))
     except OperationalError as err:
-        msg = err.args[0]
-        if (
-                'token has expired' in msg or
-                'is expired' in msg or
-                'token has invalid' in msg or
-                'new token and retry' in msg or
-                'validating the access token' in msg
-        ):
-            raise TokenExpiredError('Het access token is verlopen.')
-        elif 'getaddrinfo failed' in msg:
-            raise ConnectionFailedError('Verbinding met de database is mislukt. Staat VPN aan?')
-        else:
-            raise err
+        raise verbindingsfout(err)
+
+
+def conninfo(params: dict[str, str | int]) -> str:
+    return (f'host={params["host"]}'
+            f' port={params["port"]}'
+            f' dbname={params["dbname"]}'
+            f' user={params["user"]}'
+            f' password={params["password"]}')
+
+
+def verbindingsfout(err: OperationalError) -> OperationalError:
+    """Vertaalt een fout bij het verbinden naar een informatievere fout.
+    """
+    msg = err.args[0]
+    if (
+            'token has expired' in msg or
+            'is expired' in msg or
+            'token has invalid' in msg or
+            'new token and retry' in msg or
+            'validating the access token' in msg
+    ):
+        return TokenExpiredError('Het access token is verlopen.')
+    elif 'getaddrinfo failed' in msg:
+        return ConnectionFailedError('Verbinding met de database is mislukt. Staat VPN aan?')
+    else:
+        return err
 
 
 def read_params(config_file: str | Path) -> dict[str, str | int]:
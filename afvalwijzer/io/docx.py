@@ -1,3 +1,5 @@
+import os
+import re
 from collections import defaultdict
 from collections.abc import Iterable
 from datetime import date
@@ -7,11 +9,21 @@ from pathlib import Path
 from typing import Literal
 from zipfile import ZipFile, ZIP_DEFLATED
 
+from afvalwijzer import profiling
+from afvalwijzer.cache import BuurtCache
 from afvalwijzer.content import labels, samenvatting
-from afvalwijzer.models import Brongegeven
+from afvalwijzer.filters import tekst
+from afvalwijzer.models import Brongegeven, Buurt, Regel
 
 TEMPLATE_DOCX = 'files/afvalwijzer-template.docx'
 
+# De onderdelen van het sjabloon met de datum en de titel.
+GEDATEERD = ('word/header1.xml', 'word/header2.xml', 'docProps/core.xml',
+             'customXml/item1.xml')
+
+# Bookmark-ids in een hoofdstuk: w:id="12" en w:name="_Toc189336565".
+BOOKMARK_ID = re.compile(r'(w:id="|_Toc)(\d+)')
+
 
 def read(file_in: str | Path, filters: dict[str, bool | int | str],
          ) -> Iterable[Brongegeven]:
@@ -19,39 +31,74 @@ def read(file_in: str | Path, filters: dict[str, bool | int | str],
 
 
 def write(file_out: str | Path, data: Iterable[Brongegeven],
-          filters: dict[str, bool | int | str]) -> None:
+          filters: dict[str, bool | int | str], *,
+          cache: BuurtCache | None = None) -> None:
     """Schrijft de data in samengevatte, menselijk leesbare, vorm.
 
     `filters` zijn dezelfde filters als die zijn toegepast op `read()`, wat
     inzicht kan geven in welke records nu geschreven worden.
+
+    Met een `cache` worden de samenvatting en de xml van ongewijzigde buurten
+    hergebruikt.
     """
-    if 'woonfunctie' in filters:
-        bewoners = 'bewoners' if filters['woonfunctie'] else 'bedrijven'
-        if 'stadsdeel' in filters:
-            titel = f'Afvalwijzer voor {bewoners} in stadsdeel {filters["stadsdeel"]}'
-        else:
-            titel = f'Afvalwijzer voor {bewoners}'
-    elif 'stadsdeel' in filters:
-        titel = f'Afvalwijzer voor stadsdeel {filters["stadsdeel"]}'
-    else:
-        titel = 'Afvalwijzer'
+    titel = document_titel(filters)
 
-    with ZipFile(TEMPLATE_DOCX) as tpl:
+    with profiling.stage('document_xml'):
+        xml = document_xml(data, titel, cache)
+
+    with profiling.stage('zip compressie'), ZipFile(TEMPLATE_DOCX) as tpl:
         with ZipFile(file_out, 'w', ZIP_DEFLATED, compresslevel=9) as doc:
             doc.comment = tpl.comment
             for item in tpl.infolist():
                 if item.filename == 'word/document.xml':
-                    doc.writestr(item, document_xml(data, titel))
-                elif item.filename in ('word/header1.xml', 'word/header2.xml',
-                                       'docProps/core.xml', 'customXml/item1.xml'):
-                    text = tpl.read(item.filename)
-                    text = replace_dates(text)
-                    text = replace_text(text, '{Titel}', titel)
-                    doc.writestr(item, text)
+                    doc.writestr(item, xml)
+                elif item.filename in GEDATEERD:
+                    doc.writestr(item, gedateerd(tpl.read(item.filename), titel))
                 else:
                     doc.writestr(item, tpl.read(item.filename))
 
 
+def dateer(file_out: str | Path, filters: dict[str, bool | int | str]) -> None:
+    """Zet de datum van vandaag in een eerder geschreven document.
+
+    Alleen de koptekst en de eigenschappen (`GEDATEERD`) komen opnieuw uit
+    het sjabloon; de buurten worden niet opnieuw samengevat of geschreven.
+    Zo kan een ongewijzigd document overgeslagen worden en toch de datum van
+    vandaag dragen.
+    """
+    file_out = Path(file_out)
+    titel = document_titel(filters)
+    tmp = file_out.with_name(f'{file_out.name}.tmp')
+    with ZipFile(file_out) as oud, ZipFile(TEMPLATE_DOCX) as tpl:
+        with ZipFile(tmp, 'w', ZIP_DEFLATED, compresslevel=9) as doc:
+            doc.comment = oud.comment
+            for item in oud.infolist():
+                if item.filename in GEDATEERD:
+                    doc.writestr(item, gedateerd(tpl.read(item.filename), titel))
+                else:
+                    doc.writestr(item, oud.read(item.filename))
+    os.replace(tmp, file_out)
+
+
+def document_titel(filters: dict[str, bool | int | str]) -> str:
+    if 'woonfunctie' in filters:
+        bewoners = 'bewoners' if filters['woonfunctie'] else 'bedrijven'
+        if 'stadsdeel' in filters:
+            return f'Afvalwijzer voor {bewoners} in stadsdeel {tekst(filters["stadsdeel"])}'
+        else:
+            return f'Afvalwijzer voor {bewoners}'
+    elif 'stadsdeel' in filters:
+        return f'Afvalwijzer voor stadsdeel {tekst(filters["stadsdeel"])}'
+    else:
+        return 'Afvalwijzer'
+
+
+def gedateerd(content: bytes, titel: str) -> bytes:
+    """Een onderdeel uit `GEDATEERD` met de datum van vandaag en de titel.
+    """
+    return replace_text(replace_dates(content), '{Titel}', titel)
+
+
 def replace_dates(content: bytes, encoding: str = 'utf-8') -> bytes:
     def formats(dt: date) -> tuple[str, str, str]:
         iso = dt.isoformat()
@@ -76,7 +123,8 @@ def replace_text(content: bytes, old: str, new: str, *,
     return content.replace(old.encode(encoding), new.encode(encoding))
 
 
-def document_xml(data: Iterable[Brongegeven], title: str) -> str:
+def document_xml(data: Iterable[Brongegeven], title: str,
+                 cache: BuurtCache | None = None) -> str:
     xml = DocumentXML()
 
     buf_a = StringIO()
@@ -106,38 +154,14 @@ def document_xml(data: Iterable[Brongegeven], title: str) -> str:
     buf_b = StringIO()
     buf_b.write(xml.page_layout(1))
 
-    for buurt, buurt_data in samenvatting(data).items():
-        buf_b.write(xml.section(1, buurt.buurtnaam))
-
-        for fractie, fractie_data in buurt_data.items():
-            buf_b.write(xml.section(2, fractie))
-
-            if len(fractie_data) == 1:
-                regel = next(iter(fractie_data.keys()))
-                buf_b.write(xml.text(
-                    f'U dient {fractie.lower()} als volgt aan te bieden:'))
-                buf_b.write(xml.text())
-                for caption, text in labels(regel):
-                    buf_b.write(xml.label_item(caption, text))
-
-            else:
-                buf_b.write(xml.text(
-                    f'In {buurt.buurtnaam} gelden op verschillende adressen'
-                    f' verschillende regels voor het aanbieden van'
-                    f' {fractie.lower()}. Hieronder staan de regels met daarbij'
-                    f' vermeld voor welke adressen deze gelden.'))
-
-                for i, (regel, adressen) in enumerate(fractie_data.items(), start=1):
-                    buf_b.write(xml.section(3, f'Optie {i}'))
-                    for caption, text in labels(regel):
-                        buf_b.write(xml.label_item(caption, text))
-                    buf_b.write(xml.text())
-                    buf_b.write(xml.text('Deze regels gelden op de volgende adressen:'))
-                    buf_b.write(xml.text())
-                    for adres in adressen:
-                        buf_b.write(xml.list_item(adres))
-
-        buf_b.write(xml.page_break())
+    for buurt, buurt_data in samenvatting(data, cache).items():
+        if cache is None:
+            buf_b.write(xml.hoofdstuk(buurt, buurt_data))
+        else:
+            fragment = cache.get_or_create(
+                'docx', cache.sleutels[buurt],
+                lambda: DocumentXML().hoofdstuk_fragment(buurt, buurt_data))
+            buf_b.write(xml.fragment(*fragment))
 
     buf_b.write(xml.page_layout(2))
     buf_b.write(xml.document_end())
@@ -242,6 +266,72 @@ class DocumentXML:
    </w:body>
 </w:document>'''
 
+    def hoofdstuk(self, buurt: Buurt,
+                  buurt_data: dict[str, dict[Regel, list[str]]]) -> str:
+        """Het hoofdstuk van één buurt, met een sectie per fractie.
+        """
+        buf = StringIO()
+
+        buf.write(self.section(1, buurt.buurtnaam))
+
+        for fractie, fractie_data in buurt_data.items():
+            buf.write(self.section(2, fractie))
+
+            if len(fractie_data) == 1:
+                regel = next(iter(fractie_data.keys()))
+                buf.write(self.text(
+                    f'U dient {fractie.lower()} als volgt aan te bieden:'))
+                buf.write(self.text())
+                for caption, text in labels(regel):
+                    buf.write(self.label_item(caption, text))
+
+            else:
+                buf.write(self.text(
+                    f'In {buurt.buurtnaam} gelden op verschillende adressen'
+                    f' verschillende regels voor het aanbieden van'
+                    f' {fractie.lower()}. Hieronder staan de regels met daarbij'
+                    f' vermeld voor welke adressen deze gelden.'))
+
+                for i, (regel, adressen) in enumerate(fractie_data.items(), start=1):
+                    buf.write(self.section(3, f'Optie {i}'))
+                    for caption, text in labels(regel):
+                        buf.write(self.label_item(caption, text))
+                    buf.write(self.text())
+                    buf.write(self.text('Deze regels gelden op de volgende adressen:'))
+                    buf.write(self.text())
+                    for adres in adressen:
+                        buf.write(self.list_item(adres))
+
+        buf.write(self.page_break())
+
+        return buf.getvalue()
+
+    def hoofdstuk_fragment(self, buurt: Buurt,
+                           buurt_data: dict[str, dict[Regel, list[str]]],
+                           ) -> tuple[str, int]:
+        """Het hoofdstuk plus het aantal bookmark-ids dat erin gebruikt is.
+
+        Roep dit aan op een nieuwe `DocumentXML`, zodat de ids bij 0 beginnen.
+        Zie `fragment()`.
+        """
+        text = self.hoofdstuk(buurt, buurt_data)
+        return text, next(self.w_id)
+
+    def fragment(self, text: str, aantal_ids: int) -> str:
+        """Voegt een hoofdstuk uit `hoofdstuk_fragment()` in.
+
+        De bookmark-ids in het fragment beginnen bij 0. Die worden hier
+        opgehoogd zodat ze uniek blijven in het document. (`section_titles`
+        wordt niet bijgewerkt; de inhoudsopgave staat uit.)
+        """
+        start = next(self.w_id)
+        self.w_id = count(start + aantal_ids)
+
+        def ophogen(m: re.Match) -> str:
+            return f'{m[1]}{int(m[2]) + start}'
+
+        return BOOKMARK_ID.sub(ophogen, text)
+
     def index(self, maxlevel=3) -> str:
         def page(lvl: int) -> int:
             nonlocal current_page
@@ -0,0 +1,313 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import unicodedata
+from collections.abc import Iterable, Iterator
+from functools import cache
+from html import escape, unescape
+from itertools import repeat
+from pathlib import Path
+from urllib.parse import quote
+
+from afvalwijzer import profiling
+from afvalwijzer.cache import BuurtCache
+from afvalwijzer.content import labels, samenvatting
+from afvalwijzer.filters import tekst
+from afvalwijzer.models import Brongegeven, Buurt, Groep, Regel
+
+logger = logging.getLogger(__name__)
+
+# Zoveel buurtpagina's maakt een werkproces per keer.
+BATCH = 50
+
+STIJL = '''
+body { font-family: Corbel, "Segoe UI", Arial, sans-serif; max-width: 50em;
+       margin: 2em auto; padding: 0 1em; line-height: 1.4; }
+h1, h2, h3 { color: #ec0000; }
+dl { display: grid; grid-template-columns: 10em auto; gap: .5em 1em; }
+dt { font-weight: bold; }
+dd { margin: 0; }
+ul.adressen { columns: 3; }
+'''
+
+BuurtData = dict[str, dict[Regel, list[str]]]
+
+
+def read(file_in: str | Path, filters: dict[str, bool | int | str],
+         ) -> Iterable[Brongegeven]:
+    raise NotImplementedError('HTML is geen bestandsformaat voor ruwe data.')
+
+
+def write(file_out: str | Path, data: Iterable[Brongegeven],
+          filters: dict[str, bool | int | str], *, processes: int = 1,
+          cache: BuurtCache | None = None) -> None:
+    """Schrijft de samenvatting als statische website: `file_out` is de index
+    met de buurten per stadsdeel, en elke buurt krijgt een eigen pagina in
+    een map ernaast met de naam van de index zonder extensie (bij
+    `Centrum - bewoners.html` dus `Centrum - bewoners/`). Zo kunnen meer
+    sites in één map staan.
+
+    Alleen pagina's waarvan de inhoud veranderd is worden opnieuw gemaakt.
+    Elke pagina draagt in een meta-tag een hash van zijn inhoud, die met de
+    pagina op schijf vergeleken wordt. Naast de index staat een
+    `.paginas.json` met de pagina's van de vorige keer; pagina's van buurten
+    die er niet meer zijn worden verwijderd. Elke pagina wordt atomair
+    vervangen, zodat een webserver nooit een half geschreven pagina
+    uitlevert.
+
+    Met `processes` > 1 worden de gewijzigde pagina's over meerdere
+    processen verdeeld. Met een `cache` wordt de samenvatting van
+    ongewijzigde buurten hergebruikt.
+    """
+    if 'woonfunctie' in filters:
+        bewoners = 'bewoners' if filters['woonfunctie'] else 'bedrijven'
+        if 'stadsdeel' in filters:
+            titel = f'Afvalwijzer voor {bewoners} in stadsdeel {tekst(filters["stadsdeel"])}'
+        else:
+            titel = f'Afvalwijzer voor {bewoners}'
+    elif 'stadsdeel' in filters:
+        titel = f'Afvalwijzer voor stadsdeel {tekst(filters["stadsdeel"])}'
+    else:
+        titel = 'Afvalwijzer'
+
+    file_out = Path(file_out)
+    folder = file_out.parent / file_out.stem
+    folder.mkdir(parents=True, exist_ok=True)
+
+    # De samenvatting kent alleen plaats en buurt; het stadsdeel voor de index
+    # wordt onthouden terwijl de records langskomen.
+    stadsdelen: dict[tuple[str, str], str] = {}
+    if cache is None and hasattr(data, 'samenvatting'):
+        for r in data:
+            stadsdelen[r.plaatsnaam, r.buurtnaam] = r.stadsdeel
+    else:
+        data = onthoud_stadsdelen(data, stadsdelen)
+
+    vorige = read_paginas(file_out)
+    paginas: dict[str, str] = {}
+    index: list[tuple[str, Buurt, str]] = []
+    taken = []
+
+    with profiling.stage('samenvatting'):
+        for buurt, buurt_data in samenvatting(data, cache).items():
+            stadsdeel = stadsdelen.get(buurt, '')
+            naam = uniek(slug(buurt.plaatsnaam, buurt.buurtnaam), paginas)
+            paginas[naam] = pagina_sleutel(titel, file_out.name, stadsdeel, buurt, buurt_data)
+            index.append((stadsdeel, buurt, naam))
+            if not actueel(folder / f'{naam}.html', paginas[naam]):
+                taken.append((naam, stadsdeel, buurt, buurt_data, paginas[naam]))
+
+    logger.debug(f'{len(taken)} van {len(paginas)} buurtpagina\'s gewijzigd.')
+
+    with profiling.stage('paginas'):
+        batches = [taken[i:i + BATCH] for i in range(0, len(taken), BATCH)]
+        if processes > 1 and len(batches) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                sum(pool.map(schrijf_paginas, repeat(folder), repeat(titel),
+                             repeat(file_out.name), batches))
+        else:
+            for batch in batches:
+                schrijf_paginas(folder, titel, file_out.name, batch)
+
+    with profiling.stage('index'):
+        schrijf(file_out, render_index(titel, folder.name, index))
+        write_paginas(file_out, paginas)
+
+    # Pas na de nieuwe index, zodat die nooit naar een verwijderde pagina wijst.
+    for naam in vorige.keys() - paginas.keys():
+        (folder / f'{naam}.html').unlink(missing_ok=True)
+
+
+def onthoud_stadsdelen(data: Iterable[Brongegeven | Groep],
+                       stadsdelen: dict[tuple[str, str], str],
+                       ) -> Iterator[Brongegeven | Groep]:
+    for r in data:
+        stadsdelen[r.plaatsnaam, r.buurtnaam] = r.stadsdeel
+        yield r
+
+
+@cache
+def code_versie() -> str:
+    """Een hash over de code die de pagina's maakt.
+    """
+    h = hashlib.sha256()
+    root = Path(__file__).parent.parent
+    for naam in ('content.py', 'models.py', 'io/html.py'):
+        h.update((root / naam).read_bytes())
+    return h.hexdigest()
+
+
+def pagina_sleutel(titel: str, index: str, stadsdeel: str, buurt: Buurt,
+                   buurt_data: BuurtData) -> str:
+    """Een hash over alles wat op de pagina van een buurt komt.
+    """
+    h = hashlib.sha256(code_versie().encode('utf-8'))
+    h.update(repr((titel, index, stadsdeel, buurt, buurt_data)).encode('utf-8'))
+    return h.hexdigest()
+
+
+def actueel(path: Path, sleutel: str) -> bool:
+    """Of de pagina op `path` bestaat en met `sleutel` gemaakt is.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return sleutel_meta(sleutel) in f.read(1024)
+    except FileNotFoundError:
+        return False
+
+
+def sleutel_meta(sleutel: str) -> str:
+    return f'<meta name="afvalwijzer-sleutel" content="{sleutel}">'
+
+
+def slug(*delen: str) -> str:
+    """Een naam voor in een url: "Amsterdam", "Nieuwmarkt/Lastage" ->
+    "amsterdam-nieuwmarkt-lastage".
+    """
+    tekst = unicodedata.normalize('NFKD', ' '.join(d or '' for d in delen))
+    tekst = tekst.encode('ascii', 'ignore').decode('ascii').lower()
+    return re.sub(r'[^a-z0-9]+', '-', tekst).strip('-') or 'buurt'
+
+
+def uniek(naam: str, bestaand: dict[str, str]) -> str:
+    """`naam`, of met een volgnummer als die al gebruikt is.
+    """
+    kandidaat = naam
+    n = 1
+    while kandidaat in bestaand:
+        n += 1
+        kandidaat = f'{naam}-{n}'
+    return kandidaat
+
+
+def schrijf_paginas(folder: Path, titel: str, index: str,
+                    taken: list[tuple[str, str, Buurt, BuurtData, str]]) -> int:
+    """Maakt en schrijft een batch buurtpagina's, in een werkproces.
+    """
+    for naam, stadsdeel, buurt, buurt_data, sleutel in taken:
+        schrijf(folder / f'{naam}.html',
+                render_buurt(titel, index, stadsdeel, buurt, buurt_data, sleutel))
+    return len(taken)
+
+
+def schrijf(path: Path, inhoud: str) -> None:
+    """Schrijft een bestand via een tijdelijk bestand ernaast, dat daarna in
+    één keer op zijn plaats gezet wordt.
+    """
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    with open(tmp, 'w', encoding='utf-8', newline='\n') as f:
+        f.write(inhoud)
+    os.replace(tmp, path)
+
+
+def paginas_path(file_out: str | Path) -> Path:
+    return Path(f'{file_out}.paginas.json')
+
+
+def read_paginas(file_out: str | Path) -> dict[str, str]:
+    try:
+        with open(paginas_path(file_out), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def write_paginas(file_out: str | Path, paginas: dict[str, str]) -> None:
+    schrijf(paginas_path(file_out), json.dumps(paginas, indent=2))
+
+
+def pagina(titel: str, body: str, sleutel: str | None = None) -> str:
+    """Een html-pagina. Een buurtpagina krijgt zijn `sleutel` mee, zodat
+    `actueel()` hem kan herkennen.
+    """
+    meta = f'{sleutel_meta(sleutel)}\n' if sleutel else ''
+    return (
+        '<!DOCTYPE html>\n'
+        '<html lang="nl">\n'
+        '<head>\n'
+        '<meta charset="utf-8">\n'
+        '<meta name="viewport" content="width=device-width, initial-scale=1">\n'
+        f'{meta}'
+        f'<title>{escape(titel)}</title>\n'
+        f'<style>{STIJL}</style>\n'
+        '</head>\n'
+        '<body>\n'
+        f'{body}'
+        '</body>\n'
+        '</html>\n'
+    )
+
+
+def html_tekst(tekst: str) -> str:
+    """Escapet tekst voor html. Opmerking en melding zijn door `labels()` al
+    opgeschoond (met `&amp;`); die worden niet dubbel ge-escapet.
+    """
+    return escape(unescape(tekst))
+
+
+def render_regel(regel: Regel) -> str:
+    return '<dl>\n' + ''.join(
+        f'<dt>{escape(label)}</dt><dd>{html_tekst(tekst)}</dd>\n'
+        for label, tekst in labels(regel)
+    ) + '</dl>\n'
+
+
+def render_buurt(titel: str, index: str, stadsdeel: str, buurt: Buurt,
+                 buurt_data: BuurtData, sleutel: str) -> str:
+    """De pagina van één buurt, met een sectie per fractie, zoals een
+    hoofdstuk in docx en pdf. `index` is de bestandsnaam van de index.
+    """
+    delen = [
+        f'<p><a href="../{escape(quote(index))}">{escape(titel)}</a></p>\n',
+        f'<h1>{escape(buurt.buurtnaam)}</h1>\n',
+        f'<p>{escape(", ".join(d for d in (stadsdeel, buurt.plaatsnaam) if d))}</p>\n',
+    ]
+
+    for fractie, fractie_data in buurt_data.items():
+        delen.append(f'<h2 id="{slug(fractie)}">{escape(fractie)}</h2>\n')
+
+        if len(fractie_data) == 1:
+            regel = next(iter(fractie_data.keys()))
+            delen.append(f'<p>U dient {escape(fractie.lower())} als volgt aan te bieden:</p>\n')
+            delen.append(render_regel(regel))
+
+        else:
+            delen.append(
+                f'<p>In {escape(buurt.buurtnaam)} gelden op verschillende adressen'
+                f' verschillende regels voor het aanbieden van'
+                f' {escape(fractie.lower())}. Hieronder staan de regels met daarbij'
+                f' vermeld voor welke adressen deze gelden.</p>\n')
+
+            for i, (regel, adressen) in enumerate(fractie_data.items(), start=1):
+                delen.append(f'<h3>Optie {i}</h3>\n')
+                delen.append(render_regel(regel))
+                delen.append('<p>Deze regels gelden op de volgende adressen:</p>\n')
+                delen.append('<ul class="adressen">\n' + ''.join(
+                    f'<li>{escape(adres)}</li>\n' for adres in adressen) + '</ul>\n')
+
+    return pagina(f'{buurt.buurtnaam} - {titel}', ''.join(delen), sleutel)
+
+
+def render_index(titel: str, folder: str, index: list[tuple[str, Buurt, str]],
+                 ) -> str:
+    """De index: per stadsdeel de buurten, met een link naar hun pagina in
+    de map `folder`.
+    """
+    per_stadsdeel: dict[str, list[tuple[Buurt, str]]] = {}
+    for stadsdeel, buurt, naam in index:
+        per_stadsdeel.setdefault(stadsdeel, []).append((buurt, naam))
+
+    delen = [f'<h1>{escape(titel)}</h1>\n']
+    for stadsdeel in sorted(per_stadsdeel):
+        delen.append(f'<h2 id="{slug(stadsdeel)}">{escape(stadsdeel or "Overig")}</h2>\n<ul>\n')
+        delen.extend(
+            f'<li><a href="{escape(quote(folder))}/{naam}.html">{escape(buurt.buurtnaam)}</a></li>\n'
+            for buurt, naam in per_stadsdeel[stadsdeel]
+        )
+        delen.append('</ul>\n')
+
+    return pagina(titel, ''.join(delen))
@@ -1,13 +1,23 @@
+import hashlib
+from collections import defaultdict
 from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
 from datetime import date, datetime, timezone
+from io import BytesIO
+from itertools import accumulate, groupby, repeat, starmap
+from operator import itemgetter
 from pathlib import Path
 from typing import Literal
+from xml.sax.saxutils import escape
 
-import pikepdf
 from fpdf import FPDF, FPDF_VERSION, TextStyle
 from fpdf.outline import TableOfContents, OutlineSection
 
+from afvalwijzer import profiling
+from afvalwijzer.cache import BuurtCache
 from afvalwijzer.content import labels, samenvatting
+from afvalwijzer.filters import tekst
 from afvalwijzer.models import Adres, Brongegeven, Regel, Buurt
 
 T_ORIENTATION = Literal["", "portrait", "p", "P", "landscape", "l", "L"]
@@ -20,6 +30,7 @@ MARGIN_TOP = 10
 MARGIN_BOTTOM = 27
 CONTENT_WIDTH = PAGE_WIDTH - MARGIN_LEFT - MARGIN_RIGHT
 
+LOGO_FILE = 'files/logo_gemeente_amsterdam.png'
 FONT_FILE = 'C:/Windows/Fonts/corbel.ttf'
 FONT_FILE_BOLD = 'C:/Windows/Fonts/corbelb.ttf'
 FONT_FAMILY = 'Corbel'
@@ -28,12 +39,29 @@ FONT_SIZE_H1 = 21
 FONT_SIZE_H2 = 13
 FONT_SIZE_H3 = 11
 FONT_SIZE_BASE = 10.5
+FONT_SIZE_KOP = {1: FONT_SIZE_H1, 2: FONT_SIZE_H2, 3: FONT_SIZE_H3}
 FONT_SIZE_FOOTER = 10.5
 FONT_SIZE_HEADER = 8.5
 INDENT = 4
 
+# Een genummerde kop begint met een kolom voor het nummer, zo breed als dit
+# voorbeeld. Zo hangt de plek van de titel niet van het nummer af, en kan
+# `write_parallel()` de nummers pas bij het samenvoegen invullen.
+NUMMER_KOLOM = {1: '888 ', 2: '888.88 ', 3: '888.88.88 '}
+
+# Met een cache eindigt een deel gemiddeld na zoveel buurten; zie
+# `cache_groepen()`.
+DEEL_BUURTEN = 8
+
 DEBUG_BOX = False
 
+META_LANGUAGE = 'nl-NL'
+META_CREATOR = 'Paul Koppen'
+META_DESCRIPTION = 'Een naslagwerk van alle regels in de afvalwijzer.'
+META_KEYWORDS = 'Gemeente Amsterdam afvalwijzer regels aanbieden afval'
+META_PRODUCER = f'py-pdf/fpdf{FPDF_VERSION}'
+META_CREATOR_TOOL = 'afvalwijzer.py'
+
 
 def read(file_in: str | Path, filters: dict[str, bool | int | str],
          ) -> Iterator[Brongegeven]:
@@ -46,47 +74,277 @@ def read(file_in: str | Path, filters: dict[str, bool | int | str],
 
 
 def write(file_out: str | Path, data: Iterable[Brongegeven],
-          filters: dict[str, bool | int | str]) -> None:
+          filters: dict[str, bool | int | str], *,
+          rewrite_metadata: bool = False, processes: int = 1,
+          cache: BuurtCache | None = None) -> None:
     """Schrijft de data in samengevatte, menselijk leesbare, vorm.
 
     `filters` zijn dezelfde filters als die zijn toegepast op `read()`, wat
     inzicht kan geven in welke records nu geschreven worden.
+
+    De metadata (Dublin Core en XMP) wordt direct door fpdf2 meegeschreven.
+    Met `rewrite_metadata` wordt het bestand daarna nog eens met pikepdf
+    geopend om de metadata te herschrijven. Dat kost een extra lees- en
+    schrijfslag en is normaal gesproken niet nodig.
+
+    Met `processes` > 1 worden de hoofdstukken over meerdere processen
+    verdeeld. Met een `cache` worden de samenvatting en de geprinte
+    hoofdstukken van ongewijzigde buurten hergebruikt. Zie voor beide
+    `write_parallel()`.
     """
     if 'woonfunctie' in filters:
         bewoners = 'bewoners' if filters['woonfunctie'] else 'bedrijven'
         if 'stadsdeel' in filters:
-            titel = f'Afvalwijzer voor {bewoners} in stadsdeel {filters["stadsdeel"]}'
+            titel = f'Afvalwijzer voor {bewoners} in stadsdeel {tekst(filters["stadsdeel"])}'
         else:
             titel = f'Afvalwijzer voor {bewoners}'
     elif 'stadsdeel' in filters:
-        titel = f'Afvalwijzer voor stadsdeel {filters["stadsdeel"]}'
+        titel = f'Afvalwijzer voor stadsdeel {tekst(filters["stadsdeel"])}'
     else:
         titel = 'Afvalwijzer'
 
-    printer = Printer(font_cache_dir=Path(file_out).parent)
+    if processes > 1 or cache is not None:
+        write_parallel(file_out, data, titel, processes, cache)
+    else:
+        with profiling.stage('printen'):
+            printer = Printer(font_cache_dir=Path(file_out).parent)
+
+            printer.set_title(titel)
+            printer.set_metadata(datetime.now(tz=timezone.utc))
+            printer.print_voorblad()
+            printer.print_voorwoord()
+            printer.print_index()
+            printer.print_data(data)
+
+        with profiling.stage('output'):
+            printer.output(file_out)
+
+    if rewrite_metadata:
+        with profiling.stage('pikepdf'):
+            update_metadata(file_out, titel)
+
+
+def write_parallel(file_out: str | Path, data: Iterable[Brongegeven],
+                   titel: str, processes: int,
+                   cache: BuurtCache | None = None) -> None:
+    """Print de hoofdstukken in groepjes buurten verdeeld over meerdere
+    processen en voegt ze daarna samen tot één pdf.
+
+    Elk werkproces print zijn buurten met koptekst maar zonder voettekst (de
+    paginanummers zijn daar nog niet bekend). Het hoofdproces print daarna
+    voorblad, voorwoord en inhoudsopgave, gevolgd door lege pagina's met
+    alleen een voettekst: één voor elke pagina uit de werkprocessen. Op die
+    lege pagina's worden de secties op precies dezelfde plek gestart als in
+    de werkprocessen. Zo maakt fpdf2 zelf de inhoudsopgave
+    (`CustomTableOfContents`), de bladwijzers en de paginalabels, net als bij
+    `write()`. Tot slot legt pikepdf de hoofdstukken over de lege pagina's.
+
+    De delen bevatten geen datum en geen nummers: de datum in de koptekst,
+    de nummers van de koppen en de paginanummers komen van de lege pagina's.
+    Een deel hangt dus alleen af van de titel en zijn hoofdstukken.
+
+    Met een `cache` worden de delen daarom ook onthouden. De grenzen tussen
+    de delen volgen dan uit de buurten zelf (zie `cache_groepen()`), zodat
+    een nieuwe of gewijzigde buurt alleen zijn eigen deel opnieuw laat
+    printen. Elk deel heeft wel zijn eigen kopie van het lettertype, dus de
+    pdf wordt iets groter.
+    """
+    import pikepdf
+
+    hoofdstukken = list(samenvatting(data, cache).items())
+    if cache is None:
+        groepen = hoofdstuk_groepen(hoofdstukken, processes * 4)
+    else:
+        groepen = cache_groepen(hoofdstukken, cache)
+
+    # De lege pagina na het laatste hoofdstuk is een apart deel.
+    taken = [
+        *zip(repeat(titel), groepen, repeat(False)),
+        (titel, [], True),
+    ]
+    delen = [None] * len(taken)
+
+    if cache is not None:
+        sleutels = [deel_sleutel(cache, *taak) for taak in taken]
+        delen = [cache.get('pdf', sleutel) for sleutel in sleutels]
+
+    todo = [i for i, deel in enumerate(delen) if deel is None]
+
+    with ExitStack() as stack:
+        stack.enter_context(profiling.stage('hoofdstukken printen'))
+        if processes > 1 and len(todo) > 1:
+            pool = stack.enter_context(ProcessPoolExecutor(max_workers=processes))
+            geprint = pool.map(print_hoofdstukken, *zip(*(taken[i] for i in todo)))
+        else:
+            geprint = starmap(print_hoofdstukken, (taken[i] for i in todo))
+
+        for i, deel in zip(todo, geprint):
+            delen[i] = deel
+            if cache is not None:
+                cache.set('pdf', sleutels[i], deel)
+
+    printer = SamenvoegPrinter()
 
     printer.set_title(titel)
+    printer.set_metadata(datetime.now(tz=timezone.utc))
     printer.print_voorblad()
     printer.print_voorwoord()
     printer.print_index()
-    printer.print_data(data)
+    printer.print_geraamte([(paginas, secties, nummers)
+                            for _, paginas, secties, nummers in delen])
+
+    with ExitStack() as stack:
+        stack.enter_context(profiling.stage('samenvoegen'))
+        pdf = stack.enter_context(pikepdf.open(BytesIO(printer.output())))
+        pagina = len(pdf.pages) - sum(paginas for _, paginas, _, _ in delen)
 
-    printer.output(file_out)
+        for inhoud, _, _, _ in delen:
+            # Het deel moet open blijven tot het samengevoegde bestand is
+            # opgeslagen, want pikepdf kopieert de inhoud pas bij `save()`.
+            deel = stack.enter_context(pikepdf.open(BytesIO(inhoud)))
+            for page in deel.pages:
+                pdf.pages[pagina].add_overlay(page)
+                pagina += 1
 
+        pdf.save(file_out)
+
+
+def deel_sleutel(cache: BuurtCache, titel: str,
+                 hoofdstukken: list[tuple[Buurt, dict]], laatste: bool) -> str:
+    """De sleutel voor een geprint deel in de cache: de titel (in de
+    koptekst) en de buurten.
+    """
+    h = hashlib.sha256(f'{titel}|{laatste}'.encode('utf-8'))
+    for buurt, _ in hoofdstukken:
+        h.update(cache.sleutels[buurt].encode('utf-8'))
+    return h.hexdigest()
+
+
+def cache_groepen(hoofdstukken: list[tuple[Buurt, dict]], cache: BuurtCache,
+                  ) -> list[list[tuple[Buurt, dict]]]:
+    """Verdeelt de hoofdstukken in delen voor de cache.
+
+    Een deel eindigt na een buurt waarvan de sleutel (als getal) deelbaar is
+    door `DEEL_BUURTEN`. Of een buurt een deel afsluit hangt dus alleen van
+    die buurt af: een nieuwe buurt verandert alleen het deel waar hij in
+    komt, en niet de grenzen van de delen daarna.
+    """
+    groepen = [[]]
+    for hoofdstuk in hoofdstukken:
+        groepen[-1].append(hoofdstuk)
+        if int(cache.sleutels[hoofdstuk[0]], 16) % DEEL_BUURTEN == 0:
+            groepen.append([])
+    return [groep for groep in groepen if groep]
+
+
+def hoofdstuk_groepen(hoofdstukken: list[tuple[Buurt, dict]], n: int,
+                      ) -> list[list[tuple[Buurt, dict]]]:
+    """Verdeelt de hoofdstukken in (hooguit) `n` aaneengesloten groepen van
+    ongeveer gelijke omvang.
+
+    De omvang van een hoofdstuk wordt geschat op het aantal regels en adressen
+    dat erin geprint wordt.
+    """
+    def omvang(hoofdstuk: tuple[Buurt, dict]) -> int:
+        return sum(
+            len(adressen) + 5
+            for fractie_data in hoofdstuk[1].values()
+            for adressen in fractie_data.values()
+        )
+
+    totaal = list(accumulate(map(omvang, hoofdstukken)))
+    if not totaal:
+        return []
+
+    def groep_index(i: int) -> int:
+        return min(n - 1, (totaal[i] - 1) * n // totaal[-1])
+
+    return [
+        [hoofdstukken[i] for i in index]
+        for _, index in groupby(range(len(hoofdstukken)), groep_index)
+    ]
+
+
+def print_hoofdstukken(titel: str, hoofdstukken: list[tuple[Buurt, dict]],
+                       laatste: bool,
+                       ) -> tuple[bytes, int, list[tuple[str, int, int, float]],
+                                  list[tuple[int, int, float]]]:
+    """Print een groep hoofdstukken in een werkproces, zonder nummers.
+
+    :param str titel: Titel van het document, voor in de koptekst.
+    :param list hoofdstukken: Buurten met hun samenvatting.
+    :param bool laatste: Of dit de laatste groep is. Net als in
+        `Printer.print_data()` volgt dan nog een lege pagina.
+    :return: De pdf, het aantal pagina's, voor elke sectie de naam (zonder
+        nummer), het niveau, de pagina en de hoogte op de pagina, en voor
+        elke genummerde kop het niveau, de pagina en de hoogte van het nummer.
+    """
+    printer = HoofdstukPrinter()
+    printer.set_title(titel)
+
+    for buurt, buurt_data in hoofdstukken:
+        printer.add_page()
+        printer.print_buurt(buurt, buurt_data)
+
+    if laatste:
+        printer.add_page()
+
+    secties = [
+        (sectie.name, sectie.level, sectie.page_number,
+         (printer.h_pt - sectie.dest.top) / printer.k)
+        for sectie in printer._outline
+    ]
+
+    return bytes(printer.output()), printer.pages_count, secties, printer.nummers
+
+
+def update_metadata(file_out: str | Path, titel: str) -> None:
+    """Herschrijft de metadata van een bestaand pdf-bestand met pikepdf.
+
+    Optionele nabewerking. `write()` schrijft dezelfde metadata al in één keer
+    mee tijdens het genereren van de pdf.
+    """
     # Better metadata, see: https://py-pdf.github.io/fpdf2/Metadata.html
+    import pikepdf
+
     with pikepdf.open(file_out, allow_overwriting_input=True) as pdf:
         with pdf.open_metadata(set_pikepdf_as_editor=False) as meta:
             meta["dc:title"] = titel
-            meta["dc:language"] = "nl-NL"
-            meta["dc:creator"] = ["Paul Koppen"]
-            meta["dc:description"] = "Een naslagwerk van alle regels in de afvalwijzer."
-            meta["pdf:Keywords"] = "Gemeente Amsterdam afvalwijzer regels aanbieden afval"
-            meta["pdf:Producer"] = f"py-pdf/fpdf{FPDF_VERSION}"
-            meta["xmp:CreatorTool"] = 'afvalwijzer.py'
+            meta["dc:language"] = {META_LANGUAGE}
+            meta["dc:creator"] = [META_CREATOR]
+            meta["dc:description"] = META_DESCRIPTION
+            meta["pdf:Keywords"] = META_KEYWORDS
+            meta["pdf:Producer"] = META_PRODUCER
+            meta["xmp:CreatorTool"] = META_CREATOR_TOOL
             meta["xmp:CreateDate"] = datetime.now(tz=timezone.utc).isoformat()
         pdf.save()
 
 
+def xmp_metadata(titel: str, aangemaakt: datetime) -> str:
+    """Stelt de XMP metadata samen die fpdf2 in de pdf opneemt.
+
+    Dit zijn dezelfde velden die voorheen achteraf met pikepdf werden gezet.
+    fpdf2 verpakt de tekst zelf nog in een `<?xpacket>`.
+    """
+    return f'''<x:xmpmeta xmlns:x="adobe:ns:meta/">
+  <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
+    <rdf:Description rdf:about=""
+        xmlns:dc="http://purl.org/dc/elements/1.1/"
+        xmlns:pdf="http://ns.adobe.com/pdf/1.3/"
+        xmlns:xmp="http://ns.adobe.com/xap/1.0/">
+      <dc:title><rdf:Alt><rdf:li xml:lang="x-default">{escape(titel)}</rdf:li></rdf:Alt></dc:title>
+      <dc:language><rdf:Bag><rdf:li>{META_LANGUAGE}</rdf:li></rdf:Bag></dc:language>
+      <dc:creator><rdf:Seq><rdf:li>{escape(META_CREATOR)}</rdf:li></rdf:Seq></dc:creator>
+      <dc:description><rdf:Alt><rdf:li xml:lang="x-default">{escape(META_DESCRIPTION)}</rdf:li></rdf:Alt></dc:description>
+      <pdf:Keywords>{escape(META_KEYWORDS)}</pdf:Keywords>
+      <pdf:Producer>{escape(META_PRODUCER)}</pdf:Producer>
+      <xmp:CreatorTool>{escape(META_CREATOR_TOOL)}</xmp:CreatorTool>
+      <xmp:CreateDate>{aangemaakt.isoformat()}</xmp:CreateDate>
+    </rdf:Description>
+  </rdf:RDF>
+</x:xmpmeta>'''
+
+
 def formatted_date(dt: date) -> str:
     maanden = ['januari', 'februari', 'maart', 'april', 'mei', 'juni', 'juli',
                'augustus', 'september', 'oktober', 'november', 'december']
@@ -155,7 +413,13 @@ class Printer(FPDF):
 
         Dit gaat vanzelf. Je hoeft deze functie niet aan te roepen.
         """
-        page = self.page_no()
+        self.print_koptekst(voorblad=self.page_no() == 1)
+
+    def print_koptekst(self, voorblad: bool = False,
+                       alleen_datum: bool = False) -> None:
+        """Print de koptekst van het voorblad of van een gewone pagina, of
+        van een gewone pagina alleen de datum.
+        """
         font_size = FONT_SIZE_HEADER
         line_height = LINE_HEIGHT * font_size
         cw = CONTENT_WIDTH
@@ -167,11 +431,14 @@ class Printer(FPDF):
 
         self.set_font(FONT_FAMILY, '', font_size)
 
-        if page == 1:
+        if voorblad:
             self.x += col1_width
             self.cell(col2_width, line_height, datum, DEBUG_BOX, ln=0)
-            self.image('files/logo_gemeente_amsterdam.png', w=55.9, x=13)
+            self.image(LOGO_FILE, w=55.9, x=13)
             self.ln()
+        elif alleen_datum:
+            self.x += col1_width
+            self.cell(col2_width, line_height, datum, DEBUG_BOX, ln=1)
         else:
             self.cell(col1_width, line_height, self.author, DEBUG_BOX)
             self.cell(col2_width, line_height, datum, DEBUG_BOX, ln=1)
@@ -181,43 +448,63 @@ class Printer(FPDF):
             self.cell(col1_width, line_height, self.title, ln=1)
             self.y += 5 * line_height
 
+    def set_metadata(self, aangemaakt: datetime) -> None:
+        """Zet de document-informatie en XMP metadata.
+
+        Roep dit aan na `set_title()`, want de titel wordt in de XMP
+        metadata overgenomen.
+        """
+        self.set_lang(META_LANGUAGE)
+        self.set_subject(META_DESCRIPTION)
+        self.set_keywords(META_KEYWORDS)
+        self.set_creator(META_CREATOR_TOOL)
+        self.set_producer(META_PRODUCER)
+        self.set_creation_date(aangemaakt)
+        self.set_xmp_metadata(xmp_metadata(self.title, aangemaakt))
+
     def print_data(self, data: Iterable[Brongegeven]) -> None:
         for buurt, buurt_data in samenvatting(data).items():
-            self.print_hoofdstuk(buurt.buurtnaam, nummering=True)
-
-            for fractie, fractie_data in buurt_data.items():
-                self.print_sectie(fractie, nummering=True)
+            self.print_buurt(buurt, buurt_data)
 
-                if len(fractie_data) == 1:
-                    regel = next(iter(fractie_data.keys()))
-                    self.print_tekst(
-                        f'U dient {fractie.lower()} als volgt aan te bieden:'
-                    )
-                    self.print_tekst()
+            # Voor elk nieuw hoofdstuk.
+            self.add_page()
 
+    def print_buurt(self, buurt: Buurt,
+                    buurt_data: dict[str, dict[Regel, list[str]]]) -> None:
+        """Print het hoofdstuk van één buurt, met een sectie per fractie.
+        """
+        self.print_hoofdstuk(buurt.buurtnaam, nummering=True)
+
+        for fractie, fractie_data in buurt_data.items():
+            self.print_sectie(fractie, nummering=True)
+
+            if len(fractie_data) == 1:
+                regel = next(iter(fractie_data.keys()))
+                self.print_tekst(
+                    f'U dient {fractie.lower()} als volgt aan te bieden:'
+                )
+                self.print_tekst()
+
+                for label, tekst in labels(regel):
+                    self.print_label(label, tekst)
+
+            else:
+                self.print_tekst(
+                    f'In {buurt.buurtnaam} gelden op verschillende adressen'
+                    f' verschillende regels voor het aanbieden van'
+                    f' {fractie.lower()}. Hieronder staan de regels met daarbij'
+                    f' vermeld voor welke adressen deze gelden.'
+                )
+
+                for i, (regel, adressen) in enumerate(fractie_data.items(), start=1):
+                    self.print_subsectie(f'Optie {i}', nummering=True)
                     for label, tekst in labels(regel):
                         self.print_label(label, tekst)
-
-                else:
-                    self.print_tekst(
-                        f'In {buurt.buurtnaam} gelden op verschillende adressen'
-                        f' verschillende regels voor het aanbieden van'
-                        f' {fractie.lower()}. Hieronder staan de regels met daarbij'
-                        f' vermeld voor welke adressen deze gelden.'
-                    )
-
-                    for i, (regel, adressen) in enumerate(fractie_data.items(), start=1):
-                        self.print_subsectie(f'Optie {i}', nummering=True)
-                        for label, tekst in labels(regel):
-                            self.print_label(label, tekst)
-                        self.print_tekst()
-                        self.print_tekst('Deze regels gelden op de volgende adressen:')
-                        self.print_tekst()
-                        for adres in adressen:
-                            self.print_item(adres)
-
-            # Voor elk nieuw hoofdstuk.
-            self.add_page()
+                    self.print_tekst()
+                    self.print_tekst('Deze regels gelden op de volgende adressen:')
+                    self.print_tekst()
+                    for adres in adressen:
+                        self.print_item(adres)
 
     def print_hoofdstuk(self, titel: str, nummering: bool = False) -> None:
         """Print de titel van het hoofdstuk, optioneel met nummering.
@@ -226,11 +513,12 @@ class Printer(FPDF):
         font_size = FONT_SIZE_H1
         line_height = LINE_HEIGHT * font_size
 
-        if nummering:
-            titel = f'{self.sectie_nummering.inc(1)} {titel}'
+        nummer = self.nummer(1) if nummering else ''
 
-        self.start_section(titel, level=0)
+        self.start_section(f'{nummer} {titel}' if nummer else titel, level=0)
         self.set_font(FONT_FAMILY, style='B', size=font_size)
+        if nummering:
+            cw -= self.print_nummer(nummer, 1)
         self.cell(cw, h=10, text=titel, border=DEBUG_BOX, ln=1)
         self.y += line_height * 1.5
 
@@ -276,20 +564,36 @@ class Printer(FPDF):
         De sectie wordt toegevoegd aan de index.
         """
         cw = CONTENT_WIDTH
-        font_size = {1: FONT_SIZE_H1, 2: FONT_SIZE_H2, 3: FONT_SIZE_H3}[level]
+        font_size = FONT_SIZE_KOP[level]
         line_height = LINE_HEIGHT * font_size
 
-        if nummering:
-            titel = f'{self.sectie_nummering.inc(level)} {titel}'
+        nummer = self.nummer(level) if nummering else ''
 
         if level < 3:
             # Exclude Optie 1, Optie 2, etc. from the table of contents.
-            self.start_section(titel, level=level-1)
+            self.start_section(f'{nummer} {titel}' if nummer else titel, level=level-1)
         self.set_font(FONT_FAMILY, style='B', size=font_size)
         self.y += line_height
+        if nummering:
+            cw -= self.print_nummer(nummer, level)
         self.cell(cw, h=10, text=titel, border=DEBUG_BOX, ln=1)
         self.y += line_height // 2
 
+    def nummer(self, level: int) -> str:
+        """Het nummer van de volgende kop op dit niveau, bijvoorbeeld "3.2".
+        """
+        return self.sectie_nummering.inc(level)
+
+    def print_nummer(self, nummer: str, level: int) -> float:
+        """Print het nummer van een kop in de kolom voor nummers (zie
+        `NUMMER_KOLOM`), in het lettertype van de kop.
+
+        :return: De breedte van de kolom.
+        """
+        breedte = self.get_string_width(NUMMER_KOLOM[level])
+        self.cell(breedte, h=10, text=nummer, border=DEBUG_BOX, ln=0)
+        return breedte
+
     def print_subsectie(self, titel: str, nummering: bool = False) -> None:
         """Zie `print_sectie`.
         """
@@ -344,3 +648,99 @@ class Printer(FPDF):
             ' staan secties voor elke soort afval. Op die manier kunt u'
             ' eenvoudig de regels vinden die gelden op uw adres.'
         )
+
+
+class HoofdstukPrinter(Printer):
+    """Printer voor de werkprocessen van `write_parallel()`.
+
+    Print alleen hoofdstukken, altijd met de gewone koptekst en zonder
+    voettekst. De datum in de koptekst, de nummers van de koppen en de
+    voetteksten komen van de `SamenvoegPrinter`; hier blijft daar ruimte
+    voor open. Waar de nummers moeten komen staat in `nummers`.
+    """
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.datum = ''
+        self.nummers: list[tuple[int, int, float]] = []
+
+    def nummer(self, level: int) -> str:
+        return ''
+
+    def print_nummer(self, nummer: str, level: int) -> float:
+        # De lege cel kan net als een cel met nummer een nieuwe pagina
+        # beginnen; pas daarna staat vast waar het nummer komt.
+        breedte = super().print_nummer('', level)
+        self.nummers.append((level, self.page_no(), self.y))
+        return breedte
+
+    def footer(self) -> None:
+        pass
+
+    def header(self) -> None:
+        self.print_koptekst()
+
+
+class SamenvoegPrinter(Printer):
+    """Printer voor het hoofdproces van `write_parallel()`.
+
+    Print voorblad, voorwoord en inhoudsopgave zoals `Printer`, en daarna
+    lege hoofdstukpagina's met alleen de datum, de nummers van de koppen en
+    een voettekst.
+    """
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.voorpaginas = None
+
+    def header(self) -> None:
+        # Extra pagina's voor de inhoudsopgave worden pas bij `output()`
+        # ingevoegd, achteraan. Die krijgen wel gewoon een koptekst.
+        if (self.voorpaginas is None or self.in_toc_rendering or
+                self.page <= self.voorpaginas):
+            super().header()
+        else:
+            # De rest van de koptekst staat in de hoofdstukken.
+            self.print_koptekst(alleen_datum=True)
+
+    def print_index(self, titel: str = 'Inhoud') -> None:
+        self.voorpaginas = self.page + 1
+        super().print_index(titel)
+
+    def print_geraamte(self, delen: list[tuple[int, list[tuple[str, int, int, float]],
+                                               list[tuple[int, int, float]]]],
+                       ) -> None:
+        """Maakt een lege pagina voor elke pagina uit de werkprocessen, start
+        de secties op dezelfde pagina en hoogte en print de nummers van de
+        koppen. De nummering loopt door over de delen.
+
+        De eerste pagina is al aangemaakt door `print_index()`.
+        """
+        nieuwe_pagina = False
+        # Alles komt op een plek die in een werkproces al gepast heeft.
+        self.set_auto_page_break(False)
+
+        for paginas, secties, koppen in delen:
+            nummers = [self.nummer(level) for level, _, _ in koppen]
+            namen = iter([nummer for nummer, (level, _, _) in zip(nummers, koppen)
+                          if level < 3])
+
+            secties_per_pagina = defaultdict(list)
+            for naam, level, pagina, y in secties:
+                secties_per_pagina[pagina].append((f'{next(namen)} {naam}', level, y))
+            nummers_per_pagina = defaultdict(list)
+            for nummer, (level, pagina, y) in zip(nummers, koppen):
+                nummers_per_pagina[pagina].append((nummer, level, y))
+
+            for pagina in range(1, paginas + 1):
+                if nieuwe_pagina:
+                    self.add_page()
+                nieuwe_pagina = True
+
+                for naam, level, y in secties_per_pagina[pagina]:
+                    self.y = y
+                    self.start_section(naam, level=level)
+                for nummer, level, y in nummers_per_pagina[pagina]:
+                    self.set_font(FONT_FAMILY, style='B', size=FONT_SIZE_KOP[level])
+                    self.set_xy(MARGIN_LEFT, y)
+                    self.print_nummer(nummer, level)
+
+        self.set_auto_page_break(True, MARGIN_BOTTOM)
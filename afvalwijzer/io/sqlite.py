@@ -0,0 +1,178 @@
+import logging
+import os
+import sqlite3
+from collections.abc import Iterable, Iterator
+from contextlib import closing
+from pathlib import Path
+
+from afvalwijzer.content import sorteervolgorde
+from afvalwijzer.filters import sql_where
+from afvalwijzer.models import Brongegeven, Regel
+
+logger = logging.getLogger(__name__)
+
+# Genormaliseerd: elk stadsdeel, elke buurt, elke regel en elk adres staat er
+# één keer in. `koppelingen` koppelt per fractie een adres aan een regel, in de
+# volgorde van `content.samenvatting`. De view `brongegevens` zet alles weer
+# samen tot records met dezelfde kolommen als `Brongegeven`.
+SCHEMA = '''
+CREATE TABLE stadsdelen (
+    id INTEGER PRIMARY KEY,
+    naam TEXT NOT NULL UNIQUE
+);
+CREATE TABLE buurten (
+    id INTEGER PRIMARY KEY,
+    stadsdeel_id INTEGER NOT NULL REFERENCES stadsdelen (id),
+    plaatsnaam TEXT,
+    buurtnaam TEXT
+);
+CREATE TABLE regels (
+    id INTEGER PRIMARY KEY,
+    instructie TEXT,
+    ophaaldagen TEXT,
+    frequentie TEXT,
+    buitenzetten TEXT,
+    waar TEXT,
+    opmerking TEXT,
+    melding TEXT,
+    melding_van TEXT,
+    melding_tot TEXT
+);
+CREATE TABLE adressen (
+    id INTEGER PRIMARY KEY,
+    buurt_id INTEGER NOT NULL REFERENCES buurten (id),
+    woonfunctie INTEGER NOT NULL,
+    straatnaam TEXT,
+    huisnummer INTEGER,
+    huisletter TEXT,
+    huisnummertoevoeging TEXT
+);
+CREATE TABLE koppelingen (
+    id INTEGER PRIMARY KEY,
+    adres_id INTEGER NOT NULL REFERENCES adressen (id),
+    afvalfractie TEXT,
+    regel_id INTEGER NOT NULL REFERENCES regels (id)
+);
+CREATE VIEW brongegevens AS
+SELECT
+    k.id AS id,
+    a.woonfunctie AS woonfunctie,
+    s.naam AS stadsdeel,
+    b.plaatsnaam AS plaatsnaam,
+    b.buurtnaam AS buurtnaam,
+    k.afvalfractie AS afvalfractie,
+    r.instructie AS instructie,
+    r.ophaaldagen AS ophaaldagen,
+    r.frequentie AS frequentie,
+    r.buitenzetten AS buitenzetten,
+    r.waar AS waar,
+    r.opmerking AS opmerking,
+    r.melding AS melding,
+    r.melding_van AS melding_van,
+    r.melding_tot AS melding_tot,
+    a.straatnaam AS straatnaam,
+    a.huisnummer AS huisnummer,
+    a.huisletter AS huisletter,
+    a.huisnummertoevoeging AS huisnummertoevoeging
+FROM koppelingen k
+JOIN regels r ON k.regel_id = r.id
+JOIN adressen a ON k.adres_id = a.id
+JOIN buurten b ON a.buurt_id = b.id
+JOIN stadsdelen s ON b.stadsdeel_id = s.id;
+'''
+
+# Pas na het vullen aangemaakt: dat is sneller dan bij elke insert bijwerken.
+INDEXES = '''
+CREATE INDEX buurten_stadsdeel ON buurten (stadsdeel_id);
+CREATE INDEX buurten_buurtnaam ON buurten (buurtnaam);
+CREATE INDEX adressen_buurt ON adressen (buurt_id, woonfunctie);
+CREATE INDEX adressen_woonfunctie ON adressen (woonfunctie);
+CREATE INDEX koppelingen_adres ON koppelingen (adres_id);
+CREATE INDEX koppelingen_afvalfractie ON koppelingen (afvalfractie);
+'''
+
+# Zoveel rijen per `executemany`.
+BATCH = 10_000
+
+
+def read(file_in: str | Path, filters: dict[str, bool | int | str],
+         ) -> Iterator[Brongegeven]:
+    """Leest de Afvalwijzer brongegevens uit het sqlite-bestand.
+
+    De filters worden als `WHERE` aan sqlite doorgegeven, dat ze met de
+    indexes op stadsdeel, woonfunctie, buurtnaam en afvalfractie uitvoert.
+    De records komen in de volgorde van `content.samenvatting`.
+    """
+    voorwaarden, params = sql_where(filters)
+    query = 'SELECT {kolommen} FROM brongegevens{where} ORDER BY id'.format(
+        kolommen=', '.join(Brongegeven._fields),
+        where=f' WHERE {" AND ".join(voorwaarden)}' if voorwaarden else '',
+    )
+    logger.debug(query)
+
+    uri = f'{Path(file_in).resolve().as_uri()}?mode=ro'
+    with closing(sqlite3.connect(uri, uri=True)) as conn:
+        for row in conn.execute(query, params):
+            yield Brongegeven(bool(row[0]), *row[1:])
+
+
+def write(file_out: str | Path, data: Iterable[Brongegeven],
+          filters: dict[str, bool | int | str]) -> None:
+    """Schrijft de ruwe Afvalwijzer brongegevens naar een sqlite-bestand.
+
+    De records worden eerst gesorteerd zoals in `content.samenvatting`, zodat
+    lezen in die volgorde niets meer hoeft te sorteren. Het bestand wordt naast
+    het doelbestand opgebouwd en pas aan het eind op zijn plaats gezet.
+    """
+    tmp = Path(f'{file_out}.tmp')
+    tmp.unlink(missing_ok=True)
+
+    with closing(sqlite3.connect(tmp)) as conn:
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.executescript(SCHEMA)
+
+        stadsdelen = {}
+        buurten = {}
+        regels = {}
+        adressen = {}
+        koppelingen = []
+
+        def id_van(tabel: dict, key: tuple) -> int:
+            return tabel.setdefault(key, len(tabel) + 1)
+
+        def insert_koppelingen() -> None:
+            conn.executemany('INSERT INTO koppelingen (adres_id, afvalfractie, regel_id)'
+                             ' VALUES (?, ?, ?)', koppelingen)
+            koppelingen.clear()
+
+        for r in sorted(data, key=sorteervolgorde):
+            stadsdeel_id = id_van(stadsdelen, (r.stadsdeel,))
+            buurt_id = id_van(buurten, (stadsdeel_id, r.plaatsnaam, r.buurtnaam))
+            regel_id = id_van(regels, tuple(r.regel))
+            adres_id = id_van(adressen, (buurt_id, r.woonfunctie, r.straatnaam,
+                                         r.huisnummer, r.huisletter,
+                                         r.huisnummertoevoeging))
+            koppelingen.append((adres_id, r.afvalfractie, regel_id))
+            if len(koppelingen) >= BATCH:
+                insert_koppelingen()
+        insert_koppelingen()
+
+        for tabel, kolommen, rijen in (
+                ('stadsdelen', ('naam',), stadsdelen),
+                ('buurten', ('stadsdeel_id', 'plaatsnaam', 'buurtnaam'), buurten),
+                ('regels', Regel._fields, regels),
+                ('adressen', ('buurt_id', 'woonfunctie', 'straatnaam', 'huisnummer',
+                              'huisletter', 'huisnummertoevoeging'), adressen),
+        ):
+            conn.executemany(
+                f'INSERT INTO {tabel} (id, {", ".join(kolommen)})'
+                f' VALUES (?{", ?" * len(kolommen)})',
+                ((i, *key) for key, i in rijen.items()),
+            )
+
+        conn.executescript(INDEXES)
+        conn.execute('ANALYZE')
+        conn.commit()
+
+    os.replace(tmp, file_out)
@@ -1,5 +1,5 @@
 import logging
-from collections.abc import Iterable, Iterator, Callable
+from collections.abc import Iterable, Iterator
 from itertools import starmap
 from operator import itemgetter
 from pathlib import Path
@@ -7,6 +7,7 @@ from pathlib import Path
 from openpyxl import load_workbook, Workbook
 from openpyxl.worksheet.table import Table, TableStyleInfo
 
+from afvalwijzer.filters import predicate
 from afvalwijzer.models import Brongegeven
 
 logger = logging.getLogger(__name__)
@@ -16,19 +17,6 @@ def read(file_in: str | Path, filters: dict[str, bool | int | str],
          ) -> Iterator[Brongegeven]:
     """Leest de Afvalwijzer data-export vanuit PowerBI (xlsx).
     """
-    def filters_fcn() -> Callable[[list[str]], bool]:
-        """Filtert rijen uit de csv op basis van `filters`.
-        """
-        key = itemgetter(*(
-            Brongegeven._fields.index(fld)
-            for fld in filters.keys()
-        ))
-        val = tuple(filters.values())
-
-        def func(x: list[str]) -> bool: return key(x) == val
-
-        return func
-
     def parse_header(val: str) -> str:
         return val.split('[')[-1].strip(']').lower()
 
@@ -49,7 +37,7 @@ def read(file_in: str | Path, filters: dict[str, bool | int | str],
             reader = map(itemgetter(*index), reader)
 
     if filters:
-        reader = filter(filters_fcn(), reader)
+        reader = filter(predicate(filters), reader)
 
     for record in starmap(Brongegeven, reader):
         yield record
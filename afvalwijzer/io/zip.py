@@ -1,39 +1,93 @@
+import csv
 import io
 import logging
-from collections.abc import Iterable, Iterator
+from collections.abc import Callable, Iterable, Iterator
+from itertools import groupby
+from operator import attrgetter
 from pathlib import Path
 from zipfile import ZIP_DEFLATED, ZipFile
 
+from afvalwijzer.content import sorteervolgorde
 from afvalwijzer.file_tools import file_stem
-from afvalwijzer.models import Brongegeven
-from afvalwijzer.io.csv import read as read_csv, write as write_csv
+from afvalwijzer.filters import condities, predicate
+from afvalwijzer.models import Brongegeven, Regel
+from afvalwijzer.io.csv import (
+    DELIMITER, QUOTECHAR, read as read_csv, write as write_csv,
+)
 
 logger = logging.getLogger(__name__)
 
+# De genormaliseerde snapshot: elke regel en elk adres één keer, plus een
+# koppeltabel adres × fractie -> regel.
+REGELS_CSV = 'regels.csv'
+ADRESSEN_CSV = 'adressen.csv'
+KOPPELINGEN_CSV = 'koppelingen.csv'
+
+# Een snapshot in blokken: per buurt (en woonfunctie) een eigen csv-bestand in
+# de map `blokken/`, elk apart gecomprimeerd, met een index.
+INDEX_CSV = 'index.csv'
+BLOKKEN = 'blokken'
+BLOK_FIELDS = ('woonfunctie', 'stadsdeel', 'plaatsnaam', 'buurtnaam')
+
+ADRES_FIELDS = ('woonfunctie', 'stadsdeel', 'plaatsnaam', 'buurtnaam',
+                'straatnaam', 'huisnummer', 'huisletter', 'huisnummertoevoeging')
+
 
 def read(file_in: Path, filters: dict[str, bool | int | str],
-         ) -> Iterator[Brongegeven]:
+         *, processes: int = 1) -> Iterator[Brongegeven]:
     """Leest de Afvalwijzer brongegevens uit het zip-bestand.
+
+    Het zip-bestand bevat één csv-bestand met alle brongegevens, de drie
+    csv-bestanden van een genormaliseerde snapshot of een snapshot in blokken
+    (zie `write()`).
+
+    Met `processes` > 1 wordt één csv-bestand over meerdere processen geparst
+    (zie `csv.read()`); het uitpakken blijft in dit proces.
     """
-    csv_filename = csv_name(file_in)
+    with ZipFile(file_in, 'r', compression=ZIP_DEFLATED) as zip:
+        namelist = zip.namelist()
+        if KOPPELINGEN_CSV in namelist:
+            yield from read_normalised(zip, filters)
+            return
+        if INDEX_CSV in namelist:
+            yield from read_blocks(zip, filters)
+            return
 
-    with (
-        ZipFile(file_in, 'r', compression=ZIP_DEFLATED) as zip,
-        zip.open(csv_filename, 'r') as raw,
-        io.TextIOWrapper(raw, encoding='utf-8', newline='') as f_in
-    ):
-        for record in read_csv(f_in, filters):
-            yield record
+        csv_filename = csv_name(file_in)
+
+        with (
+            zip.open(csv_filename, 'r') as raw,
+            io.TextIOWrapper(raw, encoding='utf-8', newline='') as f_in
+        ):
+            for record in read_csv(f_in, filters, processes=processes):
+                yield record
 
 
 def write(file_out: str | Path, data: Iterable[Brongegeven],
-          filters: dict[str, bool | int | str]) -> None:
+          filters: dict[str, bool | int | str], *,
+          normalise: bool = False, blocks: bool = False) -> None:
     """Schrijft de ruwe Afvalwijzer brongegevens weg naar het zip-bestand.
 
     :param Path file_out: De naam van het doelbestand.
     :param Iterable[Brongegeven] data: Reeks met records. (Elk record beschrijft
         op 1 adres de regels voor het aanbieden van afval voor 1 fractie.)
+    :param bool normalise: Schrijft een genormaliseerde snapshot: de regels en
+        de adressen elk één keer, met ids, en een koppeltabel van adres en
+        fractie naar regel. Die is veel kleiner en sneller te lezen, omdat de
+        lange teksten van de regels niet op elke regel herhaald worden.
+    :param bool blocks: Schrijft de brongegevens in blokken, één per buurt en
+        woonfunctie, met een index. Gefilterd lezen op stadsdeel, buurt of
+        woonfunctie pakt dan alleen de blokken uit die nodig zijn.
     """
+    if normalise and blocks:
+        raise ValueError('Kies een genormaliseerde snapshot of een snapshot in blokken.')
+    if normalise:
+        write_normalised(file_out, data)
+        return
+    if blocks:
+        write_blocks(file_out, data)
+        return
+
     csv_filename = csv_name(file_out)
 
     with (
@@ -44,5 +98,162 @@ def write(file_out: str | Path, data: Iterable[Brongegeven],
         write_csv(f_out, data, filters)
 
 
+def read_normalised(zip: ZipFile, filters: dict[str, bool | int | str],
+                    ) -> Iterator[Brongegeven]:
+    """Leest een genormaliseerde snapshot en bouwt de brongegevens weer op.
+
+    Alle records met dezelfde regel delen dezelfde `Regel`-teksten (dezelfde
+    objecten). `content.samenvatting` vergelijkt die daardoor vrijwel gratis.
+    De filters worden op de kleinste tabel toegepast: adresvelden op de
+    adressen, regelvelden op de regels en de fractie op de koppelingen.
+    """
+    def rows(name: str) -> Iterator[list[str]]:
+        with (
+            zip.open(name, 'r') as raw,
+            io.TextIOWrapper(raw, encoding='utf-8', newline='') as f_in
+        ):
+            reader = csv.reader(f_in, delimiter=DELIMITER, quotechar=QUOTECHAR)
+            next(reader)
+            yield from reader
+
+    def test(fields: tuple[str, ...]) -> Callable[[tuple], bool]:
+        f = predicate([c for c in alle if c.veld in fields], fields)
+        return f or (lambda _: True)
+
+    alle = condities(filters)
+    regel_test = test(Regel._fields)
+    adres_test = test(ADRES_FIELDS)
+    fractie_test = test(('afvalfractie',))
+
+    regels = {}
+    for id, *velden in rows(REGELS_CSV):
+        regel = Regel(*velden)
+        if regel_test(regel):
+            regels[id] = regel
+
+    adressen = {}
+    for id, woonfunctie, stadsdeel, plaatsnaam, buurtnaam, straatnaam, \
+            huisnummer, huisletter, toevoeging in rows(ADRESSEN_CSV):
+        adres = (woonfunctie != 'False', stadsdeel, plaatsnaam, buurtnaam,
+                 straatnaam, int(huisnummer), huisletter, toevoeging)
+        if adres_test(adres):
+            adressen[id] = adres
+
+    for adres_id, afvalfractie, regel_id in rows(KOPPELINGEN_CSV):
+        if not fractie_test((afvalfractie,)):
+            continue
+        try:
+            adres = adressen[adres_id]
+            regel = regels[regel_id]
+        except KeyError:
+            continue    # Weggefilterd.
+        yield Brongegeven(*adres[:4], afvalfractie, *regel, *adres[4:])
+
+
+def read_blocks(zip: ZipFile, filters: dict[str, bool | int | str],
+                ) -> Iterator[Brongegeven]:
+    """Leest een snapshot in blokken.
+
+    De filters op de velden van de index (woonfunctie, stadsdeel, plaatsnaam
+    en buurtnaam) worden eerst op de index getest; alleen de blokken die
+    overblijven worden uitgepakt. Elk blok is een apart bestand in het
+    zip-bestand, dat via de centrale directory direct gevonden wordt. De
+    overige filters test de csv-reader per rij.
+    """
+    alle = condities(filters)
+    blok_test = predicate([c for c in alle if c.veld in BLOK_FIELDS], BLOK_FIELDS)
+
+    with (
+        zip.open(INDEX_CSV, 'r') as raw,
+        io.TextIOWrapper(raw, encoding='utf-8', newline='') as f_in
+    ):
+        reader = csv.reader(f_in, delimiter=DELIMITER, quotechar=QUOTECHAR)
+        next(reader)
+        blokken = [
+            name
+            for name, woonfunctie, stadsdeel, plaatsnaam, buurtnaam, _ in reader
+            if blok_test is None
+            or blok_test((woonfunctie != 'False', stadsdeel, plaatsnaam, buurtnaam))
+        ]
+
+    for name in blokken:
+        with (
+            zip.open(name, 'r') as raw,
+            io.TextIOWrapper(raw, encoding='utf-8', newline='') as f_in
+        ):
+            yield from read_csv(f_in, filters)
+
+
+def write_blocks(file_out: str | Path, data: Iterable[Brongegeven]) -> None:
+    """Schrijft een snapshot in blokken.
+
+    De records worden gesorteerd zoals in `content.samenvatting` en per
+    woonfunctie en buurt in een eigen csv-bestand `blokken/00001.csv`
+    geschreven. `index.csv` geeft per blok de woonfunctie, het stadsdeel, de
+    plaats, de buurt en het aantal rijen.
+    """
+    index = []
+
+    with ZipFile(file_out, 'w', compression=ZIP_DEFLATED, compresslevel=9) as zip:
+        for n, (sleutel, records) in enumerate(
+                groupby(sorted(data, key=sorteervolgorde),
+                        key=attrgetter(*BLOK_FIELDS)), start=1):
+            name = f'{BLOKKEN}/{n:05}.csv'
+            records = list(records)
+            with (
+                zip.open(name, 'w') as raw,
+                io.TextIOWrapper(raw, encoding='utf-8', newline='') as f_out
+            ):
+                write_csv(f_out, records, {})
+            index.append((name, *sleutel, len(records)))
+
+        with (
+            zip.open(INDEX_CSV, 'w') as raw,
+            io.TextIOWrapper(raw, encoding='utf-8', newline='') as f_out
+        ):
+            writer = csv.writer(f_out, delimiter=DELIMITER, quotechar=QUOTECHAR)
+            writer.writerow(('Blok', *(s.capitalize() for s in BLOK_FIELDS), 'Rijen'))
+            writer.writerows(index)
+
+
+def write_normalised(file_out: str | Path, data: Iterable[Brongegeven]) -> None:
+    """Schrijft een genormaliseerde snapshot met drie csv-bestanden.
+
+    - `regels.csv`: id en de velden van `Regel`, elke regel één keer;
+    - `adressen.csv`: id, woonfunctie, stadsdeel, buurt en adres;
+    - `koppelingen.csv`: adres-id, fractie en regel-id, in de volgorde van
+      `data`.
+    """
+    regels: dict[Regel, int] = {}
+    adressen: dict[tuple, int] = {}
+
+    def open_csv(name: str) -> tuple[io.TextIOWrapper, csv.writer]:
+        f_out = io.TextIOWrapper(zip.open(name, 'w'), encoding='utf-8', newline='')
+        return f_out, csv.writer(f_out, delimiter=DELIMITER, quotechar=QUOTECHAR)
+
+    with ZipFile(file_out, 'w', compression=ZIP_DEFLATED, compresslevel=9) as zip:
+        f_out, writer = open_csv(KOPPELINGEN_CSV)
+        with f_out:
+            writer.writerow(('Adres_id', 'Afvalfractie', 'Regel_id'))
+            for r in data:
+                regel = r.regel
+                adres = (r.woonfunctie, r.stadsdeel, r.plaatsnaam, r.buurtnaam,
+                         r.straatnaam, r.huisnummer, r.huisletter,
+                         r.huisnummertoevoeging)
+                writer.writerow((adressen.setdefault(adres, len(adressen)),
+                                 r.afvalfractie,
+                                 regels.setdefault(regel, len(regels))))
+
+        f_out, writer = open_csv(REGELS_CSV)
+        with f_out:
+            writer.writerow(('Id', *(s.capitalize() for s in Regel._fields)))
+            writer.writerows((id, *regel) for regel, id in regels.items())
+
+        f_out, writer = open_csv(ADRESSEN_CSV)
+        with f_out:
+            writer.writerow(('Id', *(s.capitalize() for s in ADRES_FIELDS)))
+            writer.writerows((id, *adres) for adres, id in adressen.items())
+
+
 def csv_name(zip_name: str | Path) -> str:
     return f'{file_stem(zip_name)}.csv'
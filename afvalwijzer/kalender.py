@@ -0,0 +1,304 @@
+import csv
+import hashlib
+import logging
+import re
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from datetime import date, datetime, timedelta, timezone
+from itertools import islice
+from pathlib import Path
+from typing import NamedTuple
+
+from afvalwijzer.content import strip_tags
+from afvalwijzer.models import Brongegeven
+
+logger = logging.getLogger(__name__)
+
+WEEKDAGEN = ('maandag', 'dinsdag', 'woensdag', 'donderdag', 'vrijdag',
+             'zaterdag', 'zondag')
+BYDAY = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+WEEKDAG = re.compile('|'.join(WEEKDAGEN))
+
+# Frequenties die elke week betekenen. Voor "even weken" en "oneven weken"
+# telt het weeknummer (ISO). Andere frequenties, zoals "om de week", zeggen
+# niet in welke week; daar maken we geen afspraken van.
+ELKE_WEEK = ('', 'wekelijks', 'elke week', 'iedere week')
+
+MANIFEST_CSV = 'manifest.csv'
+KALENDERS = 'kalenders'
+MANIFEST_FIELDS = ('plaatsnaam', 'straatnaam', 'huisnummer', 'huisletter',
+                   'huisnummertoevoeging')
+
+# Zoveel kalenders schrijft een werkproces per keer.
+BATCH = 500
+
+
+class Ophaalschema(NamedTuple):
+    """De dagen van de week waarop een fractie opgehaald wordt.
+    """
+    dagen: tuple[int, ...]      # 0 = maandag
+    weken: str | None           # None (elke week), 'even' of 'oneven'
+
+
+class Ophaling(NamedTuple):
+    """Wat er voor één fractie in de kalender komt.
+
+    Twee regels die alleen verschillen in velden die niet in de kalender
+    komen (zoals de instructie) geven dezelfde `Ophaling`, en dus dezelfde
+    kalender.
+    """
+    afvalfractie: str
+    schema: Ophaalschema
+    beschrijving: str
+    melding: tuple[str, str, str] | None    # van, tot, tekst
+
+
+def ophaalschema(ophaaldagen: str | None, frequentie: str | None,
+                 ) -> Ophaalschema | None:
+    """Haalt de ophaaldagen uit de tekst, bijvoorbeeld "maandag, donderdag"
+    met frequentie "oneven weken". `None` als er geen dagen in staan of de
+    frequentie niet te plaatsen is.
+    """
+    dagen = tuple(sorted({WEEKDAGEN.index(dag) for dag
+                          in WEEKDAG.findall((ophaaldagen or '').lower())}))
+    if not dagen:
+        return None
+
+    frequentie = (frequentie or '').strip().lower()
+    if frequentie in ELKE_WEEK:
+        return Ophaalschema(dagen, None)
+    if frequentie.startswith('oneven'):
+        return Ophaalschema(dagen, 'oneven')
+    if frequentie.startswith('even'):
+        return Ophaalschema(dagen, 'even')
+    return None
+
+
+def ophaling(r: Brongegeven) -> Ophaling | None:
+    """De `Ophaling` van de fractie en regel van een record, of `None` als er
+    geen ophaaldagen uit te halen zijn.
+    """
+    schema = ophaalschema(r.ophaaldagen, r.frequentie)
+    if schema is None:
+        return None
+    beschrijving = '\n'.join(tekst for tekst in (
+        r.buitenzetten, r.waar, r.opmerking and strip_tags(r.opmerking)) if tekst)
+    melding = None
+    if r.melding and r.melding_van and r.melding_tot:
+        melding = (r.melding_van[:10], r.melding_tot[:10], strip_tags(r.melding))
+    return Ophaling(r.afvalfractie, schema, beschrijving, melding)
+
+
+def kalenders(data: Iterable[Brongegeven], jaar: int,
+              ) -> tuple[dict[str, tuple[Ophaling, ...]], list[tuple]]:
+    """Verdeelt de adressen over zo min mogelijk kalenders.
+
+    Elke combinatie van fractie en regel wordt één keer ontleed. Adressen met
+    dezelfde ophalingen delen één kalender. De id van een kalender volgt uit
+    zijn ophalingen en het jaar, en blijft dus gelijk zolang die niet
+    veranderen.
+
+    :return: De ophalingen per kalender-id, en per adres (de velden van
+        `MANIFEST_FIELDS`) de kalender-id, in de volgorde van `data`.
+    """
+    # Per fractie en regel het nummer van de ophaling in `unieke`, of None.
+    nummers: dict[tuple, int | None] = {}
+    unieke: dict[Ophaling, int] = {}
+    adressen: dict[tuple, set[int]] = {}
+    onbekend = Counter()
+
+    for r in data:
+        sleutel = r[4:14]       # Fractie en regel.
+        try:
+            nummer = nummers[sleutel]
+        except KeyError:
+            o = ophaling(r)
+            if o is None and r.ophaaldagen:
+                onbekend[r.frequentie] += 1
+            nummer = nummers[sleutel] = None if o is None else unieke.setdefault(o, len(unieke))
+        adres = r[2:3] + r[14:]     # Plaatsnaam en adres.
+        try:
+            adres_nummers = adressen[adres]
+        except KeyError:
+            adres_nummers = adressen[adres] = set()
+        if nummer is not None:
+            adres_nummers.add(nummer)
+
+    for frequentie, n in onbekend.most_common():
+        logger.info(f'Niet in de kalender: {n} regels met frequentie {frequentie!r}.')
+
+    ophalingen = list(unieke)
+    ids: dict[frozenset[int], str] = {}
+    inhoud: dict[str, tuple[Ophaling, ...]] = {}
+    manifest = []
+    for adres, adres_nummers in adressen.items():
+        if not adres_nummers:
+            continue
+        sleutel = frozenset(adres_nummers)
+        if sleutel not in ids:
+            kalender = tuple(sorted(ophalingen[i] for i in sleutel))
+            id = hashlib.sha1(repr((jaar, kalender)).encode()).hexdigest()[:12]
+            ids[sleutel] = id
+            inhoud[id] = kalender
+        manifest.append((*adres, ids[sleutel]))
+
+    return inhoud, manifest
+
+
+def periode(jaar: int) -> tuple[date, date]:
+    """Het ISO-jaar: van de maandag van week 1 tot die van het jaar erna.
+    Binnen een ISO-jaar wisselen even en oneven weken elkaar steeds af.
+    """
+    return date.fromisocalendar(jaar, 1, 1), date.fromisocalendar(jaar + 1, 1, 1)
+
+
+def render(id: str, ophalingen: Iterable[Ophaling], jaar: int,
+           dtstamp: str) -> str:
+    """Maakt een iCalendar-bestand (RFC 5545) met een terugkerende afspraak
+    per fractie en een afspraak per melding.
+    """
+    begin, einde = periode(jaar)
+    regels = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Gemeente Amsterdam//Afvalwijzer//NL',
+        'CALSCALE:GREGORIAN',
+        'X-WR-CALNAME:Afvalwijzer',
+    ]
+
+    for n, o in enumerate(ophalingen):
+        eerste = eerste_dag(o.schema, begin)
+        rrule = f'FREQ=WEEKLY;BYDAY={",".join(BYDAY[d] for d in o.schema.dagen)}'
+        if o.schema.weken:
+            rrule += ';INTERVAL=2'
+        rrule += f';UNTIL={einde - timedelta(days=1):%Y%m%d}'
+        regels += [
+            'BEGIN:VEVENT',
+            f'UID:{id}-{n}@afvalwijzer',
+            f'DTSTAMP:{dtstamp}',
+            f'DTSTART;VALUE=DATE:{eerste:%Y%m%d}',
+            f'RRULE:{rrule}',
+            f'SUMMARY:{escape(o.afvalfractie)} wordt opgehaald',
+        ]
+        if o.beschrijving:
+            regels.append(f'DESCRIPTION:{escape(o.beschrijving)}')
+        regels += ['TRANSP:TRANSPARENT', 'END:VEVENT']
+
+        if o.melding:
+            van, tot, tekst = o.melding
+            try:
+                van, tot = date.fromisoformat(van), date.fromisoformat(tot)
+            except ValueError:
+                continue
+            # De melding geldt tot en met `tot`; DTEND telt niet meer mee.
+            if van < einde and tot >= begin:
+                regels += [
+                    'BEGIN:VEVENT',
+                    f'UID:{id}-{n}-melding@afvalwijzer',
+                    f'DTSTAMP:{dtstamp}',
+                    f'DTSTART;VALUE=DATE:{van:%Y%m%d}',
+                    f'DTEND;VALUE=DATE:{tot + timedelta(days=1):%Y%m%d}',
+                    f'SUMMARY:{escape(o.afvalfractie)}: {escape(tekst)}',
+                    'TRANSP:TRANSPARENT',
+                    'END:VEVENT',
+                ]
+
+    regels.append('END:VCALENDAR')
+    return ''.join(f'{vouw(regel)}\r\n' for regel in regels)
+
+
+def eerste_dag(schema: Ophaalschema, begin: date) -> date:
+    """De eerste ophaaldag vanaf `begin` (een maandag), in een even of
+    oneven week als het schema dat vraagt.
+    """
+    week = begin
+    if schema.weken and (begin.isocalendar().week % 2 == 0) != (schema.weken == 'even'):
+        week += timedelta(weeks=1)
+    return week + timedelta(days=schema.dagen[0])
+
+
+def escape(tekst: str) -> str:
+    """Maakt tekst geschikt voor een TEXT-waarde in iCalendar.
+    """
+    return (tekst.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def vouw(regel: str) -> str:
+    """Vouwt een regel na elke 75 bytes (UTF-8), zonder een teken te knippen.
+    """
+    if len(regel.encode()) <= 75:
+        return regel
+    delen = []
+    deel = ''
+    for teken in regel:
+        if len((deel + teken).encode()) > 75:
+            delen.append(deel)
+            deel = ' '      # Een vervolgregel begint met een spatie.
+        deel += teken
+    delen.append(deel)
+    return '\r\n'.join(delen)
+
+
+def schrijf_kalenders(folder: Path, taken: list[tuple[str, tuple[Ophaling, ...]]],
+                      jaar: int, dtstamp: str) -> int:
+    """Schrijft een batch kalenders, in een werkproces.
+    """
+    for id, ophalingen in taken:
+        with open(folder / f'{id}.ics', 'w', encoding='utf-8', newline='') as f:
+            f.write(render(id, ophalingen, jaar, dtstamp))
+    return len(taken)
+
+
+def batches(items: Iterable[tuple], n: int) -> Iterator[list[tuple]]:
+    items = iter(items)
+    while batch := list(islice(items, n)):
+        yield batch
+
+
+def write(folder: str | Path, data: Iterable[Brongegeven], jaar: int,
+          processes: int = 1) -> tuple[int, int]:
+    """Schrijft ophaalkalenders voor alle adressen in `data`.
+
+    In `folder` komen `kalenders/<id>.ics`, één per verschillende combinatie
+    van ophalingen (zie `kalenders()`), en `manifest.csv` met per adres de
+    kalender-id. Adressen zonder ophaaldagen (alleen containers, of een
+    frequentie die niet te plaatsen is) staan niet in het manifest.
+    Kalenders van een vorige keer die niet meer in het manifest staan worden
+    daarna verwijderd.
+
+    Met `processes` > 1 worden de kalenders in batches over meerdere
+    processen gemaakt en geschreven.
+
+    :return: Het aantal adressen en het aantal kalenders.
+    """
+    folder = Path(folder)
+    (folder / KALENDERS).mkdir(parents=True, exist_ok=True)
+
+    inhoud, manifest = kalenders(data, jaar)
+    dtstamp = f'{datetime.now(tz=timezone.utc):%Y%m%dT%H%M%SZ}'
+    taken = batches(inhoud.items(), BATCH)
+
+    if processes > 1 and len(inhoud) > BATCH:
+        from concurrent.futures import ProcessPoolExecutor
+        from itertools import repeat
+
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            sum(pool.map(schrijf_kalenders, repeat(folder / KALENDERS), taken,
+                         repeat(jaar), repeat(dtstamp)))
+    else:
+        for batch in taken:
+            schrijf_kalenders(folder / KALENDERS, batch, jaar, dtstamp)
+
+    with open(folder / MANIFEST_CSV, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow((*(s.capitalize() for s in MANIFEST_FIELDS), 'Kalender'))
+        writer.writerows(manifest)
+
+    # Pas na het nieuwe manifest, zodat dat nooit naar een verwijderde
+    # kalender wijst.
+    for pad in (folder / KALENDERS).glob('*.ics'):
+        if pad.stem not in inhoud:
+            pad.unlink(missing_ok=True)
+
+    return len(manifest), len(inhoud)
@@ -0,0 +1,272 @@
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Generic, NamedTuple, TypeVar
+
+from afvalwijzer.io import read
+from afvalwijzer.models import Brongegeven, Buurt, Regel
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Sleutel van een adres in de index: (straatnaam, huisnummer, toevoeging).
+AdresSleutel = tuple[str, int, str]
+
+
+class Resultaat(NamedTuple):
+    """De regels die op een adres gelden, per afvalfractie.
+    """
+    straatnaam: str
+    huisnummer: int
+    toevoeging: str
+    buurt: Buurt
+    regels: dict[str, list[Regel]]
+
+
+def normaliseer_straat(straatnaam: str) -> str:
+    return ' '.join(straatnaam.split()).casefold()
+
+
+def normaliseer_toevoeging(huisletter: str | None,
+                           huisnummertoevoeging: str | None) -> str:
+    """Maakt één toevoeging van huisletter en huisnummertoevoeging, zoals in
+    `Brongegeven.adres`, maar zonder hoofdletterverschil: "a", "1" -> "A-1".
+    """
+    toevoeging = (huisletter or '').strip().upper()
+    if huisnummertoevoeging and huisnummertoevoeging.strip():
+        toevoeging += f'-{huisnummertoevoeging.strip().upper()}'
+    return toevoeging
+
+
+def parse_toevoeging(toevoeging: str | None) -> str:
+    """Normaliseert een toevoeging zoals een gebruiker die intypt.
+
+    "a" -> "A", "a-1" -> "A-1", "a1" -> "A-1", "1" of "-1" -> "-1".
+    """
+    toevoeging = (toevoeging or '').replace(' ', '').upper()
+    if not toevoeging or '-' in toevoeging:
+        return toevoeging
+    if toevoeging[0].isalpha() and len(toevoeging) > 1:
+        return f'{toevoeging[0]}-{toevoeging[1:]}'
+    if toevoeging[0].isalpha():
+        return toevoeging
+    return f'-{toevoeging}'
+
+
+def sorteer_regel(fractie_regel: tuple[str, Regel]) -> tuple[str, ...]:
+    fractie, regel = fractie_regel
+    return fractie, *(v or '' for v in regel)
+
+
+class AdresIndex:
+    """Zoekt in het geheugen de regels op die op een adres of in een buurt
+    gelden.
+
+    De index bevat per adres de buurt en de regels per fractie. Veel adressen
+    hebben precies dezelfde regels (de hele straatkant, of de hele buurt).
+    Die combinaties van regels worden gedeeld, net als de regels zelf, zodat
+    ook de hele stad in een paar honderd MB past.
+    """
+    def __init__(self, data: Iterable[Brongegeven]) -> None:
+        regels: dict[Regel, Regel] = {}
+        per_adres: dict[AdresSleutel, list[tuple[str, Regel]]] = defaultdict(list)
+        buurt_van: dict[AdresSleutel, Buurt] = {}
+        straatnamen: dict[str, str] = {}
+        per_buurt: dict[Buurt, dict[str, dict[Regel, None]]] = (
+            defaultdict(lambda: defaultdict(dict)))
+
+        for record in data:
+            regel = regels.setdefault(record.regel, record.regel)
+            straat = normaliseer_straat(record.straatnaam)
+            straatnamen.setdefault(straat, record.straatnaam)
+            sleutel = (straat, record.huisnummer,
+                       normaliseer_toevoeging(record.huisletter,
+                                              record.huisnummertoevoeging))
+            per_adres[sleutel].append((record.afvalfractie, regel))
+            buurt_van[sleutel] = record.buurt
+            per_buurt[record.buurt][record.afvalfractie][regel] = None
+
+        combinaties: dict[tuple[tuple[str, Regel], ...], dict[str, list[Regel]]] = {}
+
+        def combinatie(fractie_regels: list[tuple[str, Regel]]) -> dict[str, list[Regel]]:
+            key = tuple(sorted(set(fractie_regels), key=sorteer_regel))
+            if key not in combinaties:
+                d = defaultdict(list)
+                for fractie, regel in key:
+                    d[fractie].append(regel)
+                combinaties[key] = dict(d)
+            return combinaties[key]
+
+        self.adressen: dict[AdresSleutel, tuple[Buurt, dict[str, list[Regel]]]] = {
+            sleutel: (buurt_van[sleutel], combinatie(fractie_regels))
+            for sleutel, fractie_regels in per_adres.items()
+        }
+        self.toevoegingen: dict[tuple[str, int], list[str]] = defaultdict(list)
+        for straat, huisnummer, toevoeging in self.adressen:
+            self.toevoegingen[straat, huisnummer].append(toevoeging)
+        for toevoegingen in self.toevoegingen.values():
+            toevoegingen.sort()
+        self.toevoegingen = dict(self.toevoegingen)
+
+        self.buurten: dict[Buurt, dict[str, list[Regel]]] = {
+            buurt: {fractie: list(r) for fractie, r in fracties.items()}
+            for buurt, fracties in per_buurt.items()
+        }
+        self.straatnamen = straatnamen
+        self.aantal_regels = len(regels)
+        self.aantal_combinaties = len(combinaties)
+
+    def __len__(self) -> int:
+        return len(self.adressen)
+
+    def adres(self, straatnaam: str, huisnummer: int, toevoeging: str | None = None,
+              ) -> Resultaat | None:
+        """Geeft de regels per fractie op het adres, of None als het adres niet
+        bestaat.
+
+        :param str toevoeging: Huisletter en/of huisnummertoevoeging, zoals
+            "A", "A-1", "1" of "a1".
+        """
+        straat = normaliseer_straat(straatnaam)
+        toevoeging = parse_toevoeging(toevoeging)
+        try:
+            buurt, regels = self.adressen[straat, huisnummer, toevoeging]
+        except KeyError:
+            # "23 H" kan ook huisnummertoevoeging H zijn (23-H) in plaats van
+            # huisletter H.
+            if len(toevoeging) != 1:
+                return None
+            toevoeging = f'-{toevoeging}'
+            try:
+                buurt, regels = self.adressen[straat, huisnummer, toevoeging]
+            except KeyError:
+                return None
+        return Resultaat(self.straatnamen[straat], huisnummer, toevoeging,
+                         buurt, regels)
+
+    def buurt(self, buurtnaam: str, plaatsnaam: str | None = None,
+              ) -> dict[str, list[Regel]] | None:
+        """Geeft alle regels per fractie die ergens in de buurt gelden.
+        """
+        if plaatsnaam is not None:
+            return self.buurten.get(Buurt(plaatsnaam, buurtnaam))
+        for buurt, regels in self.buurten.items():
+            if buurt.buurtnaam.casefold() == buurtnaam.casefold():
+                return regels
+        return None
+
+    def varianten(self, straatnaam: str, huisnummer: int) -> list[str]:
+        """De bestaande toevoegingen op dit huisnummer, bijvoorbeeld om een
+        gebruiker te helpen die "23" zoekt waar alleen "23-H" en "23-1"
+        bestaan.
+        """
+        return self.toevoegingen.get((normaliseer_straat(straatnaam), huisnummer), [])
+
+
+class SnapshotService(ABC, Generic[T]):
+    """Houdt iets bij dat uit een snapshot (bijvoorbeeld db.zip) gebouwd
+    wordt, zoals een `AdresIndex`. Subklassen geven met `bouw()` aan wat.
+
+    Verschijnt er een nieuwe versie van het bestand, dan wordt op de
+    achtergrond opnieuw gebouwd. Tot dat klaar is blijft de oude versie in
+    gebruik. Lukt het lezen niet (bijvoorbeeld omdat het bestand nog
+    geschreven wordt), dan blijft de oude versie staan en wordt het bij de
+    volgende controle opnieuw geprobeerd.
+    """
+    def __init__(self, file_in: str | Path, interval: float = 5.) -> None:
+        self.file_in = Path(file_in)
+        self.interval = interval
+        self.geladen: float | None = None
+        self.versie: tuple[int, int] | None = None
+        self._inhoud: T | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.reload()
+
+    @abstractmethod
+    def bouw(self, data: Iterable[Brongegeven]) -> T:
+        """Bouwt de inhoud uit de records van het snapshot.
+        """
+
+    def beschrijf(self, inhoud: T) -> str:
+        return str(self.file_in)
+
+    def reload(self) -> bool:
+        """Bouwt opnieuw als het bestand veranderd is.
+        """
+        try:
+            stat = os.stat(self.file_in)
+        except FileNotFoundError:
+            logger.warning(f'{self.file_in} bestaat niet (meer).')
+            return False
+        versie = (stat.st_mtime_ns, stat.st_size)
+        if versie == self.versie:
+            return False
+
+        start = time.perf_counter()
+        try:
+            inhoud = self.bouw(read(self.file_in, {}))
+        except Exception as err:
+            if self._inhoud is None:
+                raise
+            logger.warning(f'Kan {self.file_in} niet lezen, de vorige versie'
+                           f' blijft in gebruik: {err!r}')
+            return False
+
+        # Eén toewijzing: lopende aanvragen zien de oude of de nieuwe versie.
+        self._inhoud = inhoud
+        self.versie = versie
+        self.geladen = time.time()
+        logger.info(f'{self.beschrijf(inhoud)}'
+                    f' in {time.perf_counter() - start:.1f} s.')
+        return True
+
+    def watch(self) -> None:
+        """Controleert op de achtergrond elke `interval` seconden of het
+        bestand veranderd is.
+        """
+        def run() -> None:
+            while not self._stop.wait(self.interval):
+                self.reload()
+
+        self._thread = threading.Thread(target=run, name=type(self).__name__,
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+class AdresService(SnapshotService['ZoekIndex']):
+    """Houdt een `AdresIndex` bij op een snapshot (bijvoorbeeld db.zip), met
+    de `ZoekIndex` erop.
+
+    Beide worden samen gebouwd en in één keer vervangen. Een aanvraag die
+    `zoekindex` gebruikt ziet via `zoekindex.index` dus altijd de
+    adresindex die erbij hoort.
+    """
+    @property
+    def index(self) -> AdresIndex:
+        return self._inhoud.index
+
+    @property
+    def zoekindex(self) -> 'ZoekIndex':
+        return self._inhoud
+
+    def bouw(self, data: Iterable[Brongegeven]) -> 'ZoekIndex':
+        # `search` importeert zelf deze module.
+        from afvalwijzer.search import ZoekIndex
+        return ZoekIndex(AdresIndex(data))
+
+    def beschrijf(self, zoekindex: 'ZoekIndex') -> str:
+        index = zoekindex.index
+        return (f'Index gebouwd uit {self.file_in}: {len(index)} adressen,'
+                f' {len(index.buurten)} buurten, {index.aantal_regels} regels')
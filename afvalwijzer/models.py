@@ -43,11 +43,8 @@ class Brongegeven(NamedTuple):
     def adres(self) -> 'Adres':
         """Beschrijft puur het adres zonder buurt, fractie of afvalregels.
         """
-        if self.huisnummertoevoeging:
-            return Adres(self.straatnaam, self.huisnummer,
-                         f'{self.huisletter}-{self.huisnummertoevoeging}')
-        else:
-            return Adres(self.straatnaam, self.huisnummer, self.huisletter)
+        return Adres.samenstellen(self.straatnaam, self.huisnummer,
+                                  self.huisletter, self.huisnummertoevoeging)
 
     @property
     def buurt(self) -> 'Buurt':
@@ -81,6 +78,16 @@ class Adres(NamedTuple):
     huisnummer: int
     toevoeging: str
 
+    @classmethod
+    def samenstellen(cls, straatnaam: str, huisnummer: int,
+                     huisletter: str | None,
+                     huisnummertoevoeging: str | None) -> 'Adres':
+        if huisnummertoevoeging:
+            return cls(straatnaam, huisnummer,
+                       f'{huisletter or ""}-{huisnummertoevoeging}')
+        else:
+            return cls(straatnaam, huisnummer, huisletter or '')
+
 
 class Buurt(NamedTuple):
     plaatsnaam: str
@@ -104,3 +111,25 @@ class Regel(NamedTuple):
     melding: str | None         # = Let op
     melding_van: str | None     # = Let op
     melding_tot: str | None     # = Let op
+
+
+class Groep(NamedTuple):
+    """Eén regel voor één fractie in één buurt, met alle adressen waar die
+    regel geldt.
+
+    Zo levert de database de gegevens al samengevat aan (zie
+    `db.read_groepen()`): de tekst van de regel komt één keer mee in plaats
+    van op elk adres. `content.samenvatting` accepteert groepen net als
+    brongegevens.
+    """
+    woonfunctie: bool
+    stadsdeel: str
+    plaatsnaam: str
+    buurtnaam: str
+    afvalfractie: str
+    regel: Regel
+    adressen: tuple[Adres, ...]     # Gesorteerd op straat en huisnummer.
+
+    @property
+    def buurt(self) -> Buurt:
+        return Buurt(self.plaatsnaam, self.buurtnaam)
@@ -0,0 +1,134 @@
+import logging
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from queue import Empty, Full, Queue
+from typing import Any, TypeVar
+
+from afvalwijzer import profiling
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Zoveel records per batch in de queue, en zoveel batches maximaal vooruit.
+BATCH = 2_000
+QUEUE_SIZE = 16
+
+# Markeert het einde van de reeks in de queue.
+_KLAAR = object()
+
+
+class Statistieken:
+    """Metingen van één `read_ahead`.
+
+    - `wacht_lezer`: de tijd dat de achtergrondthread wachtte omdat de queue
+      vol was. De verwerking is dan de bottleneck.
+    - `wacht_verwerker`: de tijd dat de verwerking wachtte op een batch. Het
+      lezen is dan de bottleneck.
+    - `diepte`: de som van de queue-diepte bij elke opgehaalde batch, voor het
+      gemiddelde.
+    """
+    def __init__(self) -> None:
+        self.batches = 0
+        self.rijen = 0
+        self.diepte = 0
+        self.max_diepte = 0
+        self.wacht_lezer = 0.
+        self.wacht_verwerker = 0.
+
+    @property
+    def gemiddelde_diepte(self) -> float:
+        return self.diepte / self.batches if self.batches else 0.
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            'batches': self.batches,
+            'gemiddelde_queue_diepte': round(self.gemiddelde_diepte, 2),
+            'max_queue_diepte': self.max_diepte,
+            'wachttijd_lezer': round(self.wacht_lezer, 4),
+            'wachttijd_verwerker': round(self.wacht_verwerker, 4),
+        }
+
+
+def read_ahead(data: Iterable[T], batch: int = BATCH,
+               queue_size: int = QUEUE_SIZE) -> Iterator[T]:
+    """Leest `data` in een achtergrondthread vooruit.
+
+    Het uitpakken (zlib), het parsen van de csv en het ophalen uit de database
+    gebeuren zo terwijl de writer met de vorige batches bezig is. De queue
+    heeft maximaal `queue_size` batches van `batch` records, zodat het
+    geheugengebruik begrensd blijft.
+
+    Een fout in de reader, bijvoorbeeld `db.TokenExpiredError`, wordt in de
+    verwerkende thread opnieuw gegooid. Als de verwerking stopt voordat alles
+    gelezen is, stopt de achtergrondthread ook.
+
+    Na afloop worden de queue-diepte en de wachttijden gelogd, en als er
+    gemeten wordt als stap 'read-ahead' aan het profiel toegevoegd.
+    """
+    queue: Queue = Queue(maxsize=queue_size)
+    stop = threading.Event()
+    stats = Statistieken()
+
+    def put(item: Any) -> bool:
+        wall = time.perf_counter()
+        try:
+            while not stop.is_set():
+                try:
+                    queue.put(item, timeout=.1)
+                    return True
+                except Full:
+                    pass
+            return False
+        finally:
+            stats.wacht_lezer += time.perf_counter() - wall
+
+    def lezer() -> None:
+        try:
+            iterator = iter(data)
+            while not stop.is_set():
+                items = [item for _, item in zip(range(batch), iterator)]
+                if not items or not put(items):
+                    break
+            put(_KLAAR)
+        except BaseException as err:
+            put(err)
+
+    thread = threading.Thread(target=lezer, name='read-ahead', daemon=True)
+    thread.start()
+
+    wall = time.perf_counter()
+    try:
+        while True:
+            diepte = queue.qsize()
+            stats.max_diepte = max(stats.max_diepte, diepte)
+            stats.diepte += diepte
+            t = time.perf_counter()
+            items = queue.get()
+            stats.wacht_verwerker += time.perf_counter() - t
+            if items is _KLAAR:
+                break
+            if isinstance(items, BaseException):
+                raise items
+            stats.batches += 1
+            stats.rijen += len(items)
+            yield from items
+    finally:
+        stop.set()
+        # Maak ruimte, zodat een wachtende `put` niet blijft hangen.
+        try:
+            while True:
+                queue.get_nowait()
+        except Empty:
+            pass
+        thread.join()
+
+        profiling.record('read-ahead', time.perf_counter() - wall,
+                         stats.rijen, **stats.as_dict())
+        logger.debug(
+            f'Read-ahead: {stats.batches} batches, queue diepte gemiddeld'
+            f' {stats.gemiddelde_diepte:.1f} (max {stats.max_diepte}),'
+            f' lezer wachtte {stats.wacht_lezer:.2f} s,'
+            f' verwerker wachtte {stats.wacht_verwerker:.2f} s.'
+        )
@@ -0,0 +1,197 @@
+import json
+import threading
+import time
+import tracemalloc
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, TypeVar
+
+T = TypeVar('T')
+
+
+class Stage:
+    """Metingen van één stap in de pijplijn.
+
+    `wall` en `cpu` zijn inclusief geneste stappen. `eigen_wall` is de tijd
+    zonder die geneste stappen en zonder de tijd die in de iterator van een
+    reader is doorgebracht.
+    """
+    def __init__(self, naam: str, niveau: int = 0) -> None:
+        self.naam = naam
+        self.niveau = niveau
+        self.wall = 0.
+        self.cpu = 0.
+        self.kinderen_wall = 0.
+        self.rijen: int | None = None
+        self.piek: int | None = None
+        self.extra: dict[str, Any] = {}
+
+    def as_dict(self) -> dict[str, Any]:
+        d = {
+            'stap': self.naam,
+            'niveau': self.niveau,
+            'wall': round(self.wall, 4),
+            'cpu': round(self.cpu, 4),
+            'eigen_wall': round(self.wall - self.kinderen_wall, 4),
+        }
+        if self.rijen is not None:
+            d['rijen'] = self.rijen
+            d['rijen_per_seconde'] = round(self.rijen / self.wall) if self.wall else None
+        if self.piek is not None:
+            d['piekgeheugen_mb'] = round(self.piek / 2**20, 2)
+        d.update(self.extra)
+        return d
+
+
+class Profiel:
+    """Verzamelt de metingen van alle stappen in één run.
+    """
+    def __init__(self, memory: bool = True) -> None:
+        self.memory = memory
+        self.stages: list[Stage] = []
+        self.stack: list[Stage] = []
+        self.thread = threading.get_ident()
+
+    def enter(self, naam: str) -> Stage:
+        stage = Stage(naam, len(self.stack))
+        if self.memory and self.stack:
+            # De piek tot nu toe hoort bij de buitenste stap. Daarna begint
+            # de geneste stap met een schone lei.
+            outer = self.stack[-1]
+            outer.piek = max(outer.piek or 0, tracemalloc.get_traced_memory()[1])
+        if self.memory:
+            tracemalloc.reset_peak()
+        self.stages.append(stage)
+        self.stack.append(stage)
+        return stage
+
+    def exit(self, stage: Stage) -> None:
+        self.stack.pop()
+        if self.memory:
+            stage.piek = max(stage.piek or 0, tracemalloc.get_traced_memory()[1])
+        if self.stack:
+            outer = self.stack[-1]
+            outer.kinderen_wall += stage.wall
+            if self.memory:
+                outer.piek = max(outer.piek or 0, stage.piek)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            'tijdstip': datetime.now(tz=timezone.utc).isoformat(),
+            'stappen': [stage.as_dict() for stage in self.stages],
+        }
+
+
+# Het actieve profiel, of None als er niet gemeten wordt.
+_profiel: Profiel | None = None
+
+
+def start(memory: bool = True) -> Profiel:
+    """Begint met meten. Met `memory` wordt ook het piekgeheugen per stap
+    gemeten met tracemalloc. Dat maakt het programma wel trager.
+    """
+    global _profiel
+    _profiel = Profiel(memory)
+    if memory:
+        tracemalloc.start()
+    return _profiel
+
+
+def stop() -> Profiel:
+    """Stopt met meten en geeft de metingen terug.
+    """
+    global _profiel
+    profiel, _profiel = _profiel, None
+    if profiel.memory:
+        tracemalloc.stop()
+    return profiel
+
+
+@contextmanager
+def stage(naam: str) -> Iterator[Stage]:
+    """Meet wall time, cpu-tijd en piekgeheugen van een stap.
+
+    Doet niets als er niet gemeten wordt. De stap kan het aantal verwerkte
+    rijen doorgeven in `rijen`:
+
+        with stage('sorteren') as s:
+            data = sorted(data)
+            s.rijen = len(data)
+    """
+    profiel = _profiel
+    if profiel is None:
+        yield Stage(naam)
+        return
+
+    s = profiel.enter(naam)
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield s
+    finally:
+        s.wall += time.perf_counter() - wall
+        s.cpu += time.process_time() - cpu
+        profiel.exit(s)
+
+
+def iterate(naam: str, iterable: Iterable[T]) -> Iterator[T]:
+    """Meet de tijd die in `iterable` wordt doorgebracht en telt de rijen.
+
+    Bedoeld voor de readers: die leveren hun records lazy aan een writer. De
+    tijd telt alleen als de iterator zelf aan het werk is, en wordt afgetrokken
+    van de eigen tijd van de stap die de records verbruikt. Het piekgeheugen
+    komt op rekening van die stap.
+    """
+    profiel = _profiel
+    if profiel is None:
+        return iter(iterable)
+    return _iterate(profiel, naam, iter(iterable))
+
+
+def _iterate(profiel: Profiel, naam: str, iterator: Iterator[T]) -> Iterator[T]:
+    s = Stage(naam, len(profiel.stack))
+    s.rijen = 0
+    profiel.stages.append(s)
+
+    while True:
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            d_wall = time.perf_counter() - wall
+            s.wall += d_wall
+            s.cpu += time.process_time() - cpu
+            # In een andere thread (read-ahead) overlapt de tijd met die van
+            # de huidige stap, en hoort die er niet van af.
+            if profiel.stack and threading.get_ident() == profiel.thread:
+                profiel.stack[-1].kinderen_wall += d_wall
+        s.rijen += 1
+        yield item
+
+
+def record(naam: str, wall: float, rijen: int | None = None, **extra) -> None:
+    """Voegt een meting toe die buiten de stappen om gedaan is, bijvoorbeeld in
+    een achtergrondthread. De tijd telt niet mee als geneste tijd van de
+    huidige stap. Doet niets als er niet gemeten wordt.
+    """
+    profiel = _profiel
+    if profiel is None:
+        return
+    s = Stage(naam, len(profiel.stack))
+    s.wall = wall
+    s.rijen = rijen
+    s.extra.update(extra)
+    profiel.stages.append(s)
+
+
+def write_json(profiel: Profiel, path: str | Path, **extra) -> None:
+    """Voegt de metingen als één regel JSON toe aan het bestand.
+
+    Zo kunnen de metingen van elke productierun in één bestand verzameld
+    worden.
+    """
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({**profiel.as_dict(), **extra}) + '\n')
@@ -0,0 +1,224 @@
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import NamedTuple
+
+from afvalwijzer.lookup import AdresIndex, Resultaat, normaliseer_straat, parse_toevoeging
+
+# Zoveel fouten (invoegen, weglaten, vervangen, omwisselen) mag een straatnaam
+# bevatten. Korte invoer krijgt minder speling.
+MAX_FOUTEN = 2
+
+# Zoveel kandidaten met de meeste gedeelde trigrammen worden exact vergeleken.
+MAX_KANDIDATEN = 50
+
+# "Prinsengr 2", "Prinsengracht 263a", "Prinsengracht 263 A-1", "Prinsengracht 263-2"
+ZOEKTERM = re.compile(
+    r'^\s*(?P<straat>.*?)'
+    r'(?:\s+(?P<huisnummer>\d+)\s*(?P<toevoeging>[a-zA-Z]?(?:\s*-?\s*\w+)?)?)?\s*$'
+)
+
+
+class Treffer(NamedTuple):
+    """Eén zoekresultaat. Een lagere score is een betere treffer.
+    """
+    score: float
+    resultaat: Resultaat
+
+
+def trigrammen(s: str) -> set[str]:
+    s = f'  {s} '
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+def prefix_afstand(zoekterm: str, naam: str, max_fouten: int) -> int:
+    """De kleinste edit-afstand tussen `zoekterm` en een begin van `naam`.
+
+    Voor "prinsngr" en "prinsengracht" is dat 1. Geeft `max_fouten + 1` zodra
+    zeker is dat de afstand groter is dan `max_fouten`.
+    """
+    # Alleen het begin van naam doet mee, en alleen cellen binnen
+    # `max_fouten` van de diagonaal kunnen binnen de grens blijven.
+    naam = naam[:len(zoekterm) + max_fouten]
+    buiten = max_fouten + 1
+    vorige = [j if j <= max_fouten else buiten for j in range(len(naam) + 1)]
+    voorvorige = None
+    for i, q in enumerate(zoekterm, 1):
+        huidige = [buiten] * (len(naam) + 1)
+        if i <= max_fouten:
+            huidige[0] = i
+        beste = huidige[0]
+        for j in range(max(1, i - max_fouten), min(len(naam), i + max_fouten) + 1):
+            n = naam[j - 1]
+            d = vorige[j - 1] if q == n else vorige[j - 1] + 1
+            if vorige[j] + 1 < d:
+                d = vorige[j] + 1
+            if huidige[j - 1] + 1 < d:
+                d = huidige[j - 1] + 1
+            if (voorvorige is not None and j > 1 and q == naam[j - 2]
+                    and zoekterm[i - 2] == n and voorvorige[j - 2] + 1 < d):
+                d = voorvorige[j - 2] + 1
+            huidige[j] = d
+            if d < beste:
+                beste = d
+        if beste > max_fouten:
+            return buiten
+        voorvorige, vorige = vorige, huidige
+    return min(min(vorige), buiten)
+
+
+def parse_zoekterm(zoekterm: str) -> list[tuple[str, int | None, str | None]]:
+    """Splitst de zoekterm in straat, huisnummer en toevoeging.
+
+    "Van Woustraat 12 3" kan huisnummer 12 met toevoeging 3 zijn, maar ook
+    huisnummer 3 in een straat met een nummer in de naam. Dan komen beide
+    lezingen terug.
+    """
+    m = ZOEKTERM.match(zoekterm)
+    straat = normaliseer_straat(m['straat'])
+    if not straat:
+        return []
+    if not m['huisnummer']:
+        return [(straat, None, None)]
+
+    huisnummer = int(m['huisnummer'])
+    if not m['toevoeging']:
+        return [(straat, huisnummer, None)]
+
+    lezingen = [(straat, huisnummer, parse_toevoeging(m['toevoeging']))]
+    toevoeging = m['toevoeging'].replace(' ', '').lstrip('-')
+    if toevoeging.isdigit():
+        lezingen.append((f'{straat} {huisnummer}', int(toevoeging), None))
+    return lezingen
+
+
+class ZoekIndex:
+    """Zoekt adressen op een deel van de straatnaam, met tikfouten.
+
+    Bovenop een `AdresIndex` houdt de zoekindex bij:
+
+    - alle straatnamen en de woorden waarmee ze beginnen, gesorteerd, zodat
+      een begin van een naam ("prinsengr", "hendrikk") met `bisect` gevonden
+      wordt;
+    - een trigram-index over de straatnamen voor namen met tikfouten;
+    - per straat een gesorteerde lijst met huisnummers.
+    """
+    def __init__(self, index: AdresIndex) -> None:
+        self.index = index
+
+        self.straten = sorted(index.straatnamen)
+        self.prefixen = sorted(
+            (naam[m.start():], i)
+            for i, naam in enumerate(self.straten)
+            for m in re.finditer(r'(?:^|(?<=[\s\-]))\S', naam)
+        )
+        self.prefix_namen = [p for p, _ in self.prefixen]
+
+        self.trigrammen: dict[str, list[int]] = defaultdict(list)
+        for i, naam in enumerate(self.straten):
+            for trigram in trigrammen(naam):
+                self.trigrammen[trigram].append(i)
+        self.trigrammen = dict(self.trigrammen)
+
+        per_straat = defaultdict(list)
+        for straat, huisnummer, toevoeging in index.adressen:
+            per_straat[straat].append((huisnummer, toevoeging))
+        self.adressen: list[list[tuple[int, str]]] = []
+        self.huisnummers: list[list[int]] = []
+        for naam in self.straten:
+            adressen = sorted(per_straat[naam])
+            self.adressen.append(adressen)
+            self.huisnummers.append([huisnummer for huisnummer, _ in adressen])
+
+    def zoek(self, zoekterm: str, limit: int = 10) -> list[Treffer]:
+        """Geeft de beste adressen bij de zoekterm, met hun regels.
+
+        De zoekterm is een (deel van een) straatnaam, eventueel gevolgd door
+        een huisnummer en toevoeging: "Prinsengr 2", "prinsngracht 263a".
+        Zonder huisnummer komen de eerste adressen van de beste straten.
+        Bestaat het huisnummer niet, dan komen de dichtstbijzijnde nummers.
+        """
+        treffers = {}
+        for straat, huisnummer, toevoeging in parse_zoekterm(zoekterm):
+            for score, i in self.straatnamen(straat, limit):
+                naam = self.straten[i]
+                for extra, (nummer, toev) in self.huisnummers_bij(
+                        i, huisnummer, toevoeging, limit):
+                    sleutel = (naam, nummer, toev)
+                    if sleutel in treffers and treffers[sleutel].score <= score + extra:
+                        continue
+                    buurt, regels = self.index.adressen[sleutel]
+                    treffers[sleutel] = Treffer(score + extra, Resultaat(
+                        self.index.straatnamen[naam], nummer, toev, buurt, regels))
+
+        return sorted(treffers.values(), key=lambda t: (
+            t.score, t.resultaat.straatnaam, t.resultaat.huisnummer,
+            t.resultaat.toevoeging))[:limit]
+
+    def straatnamen(self, straat: str, limit: int) -> list[tuple[float, int]]:
+        """De beste straten bij (een begin van) de straatnaam, met hun score.
+
+        Een exacte naam scoort 0, een naam die met de zoekterm begint 0.5 en
+        een naam met `n` fouten `n`. Bij gelijke score wint de kortste naam.
+        """
+        scores: dict[int, float] = {}
+
+        start = bisect_left(self.prefix_namen, straat)
+        for naam, i in self.prefixen[start:]:
+            if not naam.startswith(straat):
+                break
+            score = 0 if self.straten[i] == straat else 0.5
+            scores[i] = min(scores.get(i, score), score)
+
+        if len(scores) < limit:
+            max_fouten = min(MAX_FOUTEN, len(straat) // 4)
+            for i in self.kandidaten(straat):
+                if i in scores:
+                    continue
+                fouten = prefix_afstand(straat, self.straten[i], max_fouten)
+                if fouten <= max_fouten:
+                    scores[i] = fouten
+
+        beste = sorted(scores.items(),
+                       key=lambda s: (s[1], len(self.straten[s[0]]), self.straten[s[0]]))
+        return [(score, i) for i, score in beste[:limit]]
+
+    def kandidaten(self, straat: str) -> list[int]:
+        """De straten die de meeste trigrammen met de zoekterm delen.
+        """
+        telling = Counter()
+        for trigram in trigrammen(straat):
+            telling.update(self.trigrammen.get(trigram, ()))
+        return [i for i, _ in telling.most_common(MAX_KANDIDATEN)]
+
+    def huisnummers_bij(self, i: int, huisnummer: int | None,
+                        toevoeging: str | None, limit: int,
+                        ) -> list[tuple[float, tuple[int, str]]]:
+        """De adressen in straat `i` bij het huisnummer, met een extra score.
+        """
+        adressen = self.adressen[i]
+        if huisnummer is None:
+            return [(0, adres) for adres in adressen[:limit]]
+
+        huisnummers = self.huisnummers[i]
+        start = bisect_left(huisnummers, huisnummer)
+        exact = []
+        for adres in adressen[start:]:
+            if adres[0] != huisnummer:
+                break
+            if toevoeging is None or adres[1] == toevoeging:
+                exact.append((0, adres))
+            elif adres[1].startswith(toevoeging) or toevoeging.lstrip('-') in adres[1]:
+                exact.append((0.25, adres))
+        if exact:
+            return exact[:limit]
+
+        # Het huisnummer bestaat niet: de dichtstbijzijnde nummers, eerst aan
+        # dezelfde kant van de straat.
+        lo, hi = max(0, start - limit), min(len(adressen), start + limit)
+        dichtbij = [
+            (2 + abs(nummer - huisnummer) / 1000 + (nummer % 2 != huisnummer % 2),
+             (nummer, toev))
+            for nummer, toev in adressen[lo:hi]
+        ]
+        return sorted(dichtbij)[:limit]
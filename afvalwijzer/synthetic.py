@@ -0,0 +1,132 @@
+from collections.abc import Iterator
+from random import Random
+
+from afvalwijzer.models import Brongegeven, Regel
+
+STADSDELEN = ('Centrum', 'Nieuw-West', 'Noord', 'Oost', 'Weesp', 'West', 'Zuid',
+              'Zuidoost')
+
+FRACTIES = ('Restafval', 'Papier', 'Glas', 'Textiel', 'GFT', 'Grof afval')
+
+# Aantal adressen per schaal. "xl" is ongeveer de hele stad.
+SCHALEN = {
+    's': 1_000,
+    'm': 20_000,
+    'l': 100_000,
+    'xl': 500_000,
+}
+
+ADRESSEN_PER_BUURT = 200
+
+STRAATDELEN = ('Prinsen', 'Keizers', 'Heren', 'Linden', 'Rozen', 'Bloem',
+               'Egelantier', 'Laurier', 'Berken', 'Eiken', 'Beuken', 'Wilgen',
+               'Meeuwen', 'Zwanen', 'Reigers', 'Merel', 'Spreeuwen', 'Ooievaars',
+               'Rembrandt', 'Vondel', 'Bredero', 'Hooft', 'Huygens', 'Spinoza')
+STRAATTYPES = ('gracht', 'straat', 'laan', 'weg', 'kade', 'plein', 'dijk', 'hof')
+
+DAGEN = ('maandag', 'dinsdag', 'woensdag', 'donderdag', 'vrijdag', 'zaterdag')
+
+
+def brongegevens(adressen: int, seed: int = 0) -> Iterator[Brongegeven]:
+    """Genereert synthetische brongegevens voor ongeveer `adressen` adressen.
+
+    Bedoeld voor benchmarks en om offline te testen, zonder VPN en zonder
+    echte data. Dezelfde `adressen` en `seed` geven altijd dezelfde records.
+
+    Elk adres krijgt een record voor elke fractie. De adressen zijn verdeeld
+    over alle stadsdelen en over buurten van ongeveer `ADRESSEN_PER_BUURT`
+    adressen. Per buurt en fractie gelden een paar regels, meestal per kant
+    van de straat, met hier en daar een uitzondering. De regels komen uit een
+    beperkte voorraad en worden dus in veel buurten herhaald. Huisnummers
+    hebben soms een huisletter of een toevoeging.
+
+    De records komen per buurt, straat en adres. Ze zijn niet gesorteerd
+    zoals in de database.
+    """
+    rnd = Random(seed)
+    regels = {fractie: regel_voorraad(rnd, fractie) for fractie in FRACTIES}
+    aantal_buurten = max(len(STADSDELEN), adressen // ADRESSEN_PER_BUURT)
+
+    for b in range(aantal_buurten):
+        stadsdeel = STADSDELEN[b % len(STADSDELEN)]
+        buurtnaam = f'{rnd.choice(STRAATDELEN)}buurt {b + 1}'
+        plaatsnaam = 'Weesp' if stadsdeel == 'Weesp' else 'Amsterdam'
+
+        # Per fractie 1 tot 3 regels in deze buurt.
+        buurt_regels = {
+            fractie: rnd.sample(regels[fractie], rnd.randint(1, 3))
+            for fractie in FRACTIES
+        }
+
+        for straatnaam, nummers in straten(rnd, b, ADRESSEN_PER_BUURT):
+            # Elke kant van de straat een eigen regel per fractie.
+            kant_regels = {
+                (fractie, kant): rnd.choice(buurt_regels[fractie])
+                for fractie in FRACTIES
+                for kant in (0, 1)
+            }
+            for huisnummer, huisletter, toevoeging in nummers:
+                woonfunctie = rnd.random() < 0.9
+                for fractie in FRACTIES:
+                    if rnd.random() < 0.05:
+                        regel = rnd.choice(buurt_regels[fractie])
+                    else:
+                        regel = kant_regels[fractie, huisnummer % 2]
+                    yield Brongegeven(
+                        woonfunctie, stadsdeel, plaatsnaam, buurtnaam, fractie,
+                        *regel,
+                        straatnaam, huisnummer, huisletter, toevoeging,
+                    )
+
+
+def straten(rnd: Random, buurt: int, adressen: int,
+            ) -> Iterator[tuple[str, list[tuple[int, str | None, str | None]]]]:
+    """Verdeelt ongeveer `adressen` adressen over een paar straten.
+    """
+    while adressen > 0:
+        straatnaam = (f'{rnd.choice(STRAATDELEN)}{rnd.choice(STRAATTYPES)}'
+                      f' {buurt}')
+        laatste = min(adressen, rnd.randint(10, 80))
+        nummers = []
+        for huisnummer in range(1, laatste + 1):
+            r = rnd.random()
+            if r < 0.75:
+                nummers.append((huisnummer, None, None))
+            elif r < 0.85:
+                for huisletter in 'AB':
+                    nummers.append((huisnummer, huisletter, None))
+            else:
+                # Etages: 23-H, 23-1, 23-2, ...
+                for toevoeging in ('H', '1', '2', '3')[:rnd.randint(2, 4)]:
+                    nummers.append((huisnummer, None, toevoeging))
+        adressen -= len(nummers)
+        yield straatnaam, nummers
+
+
+def regel_voorraad(rnd: Random, fractie: str, aantal: int = 12) -> list[Regel]:
+    """Een voorraad regels voor de fractie, waaruit alle buurten kiezen.
+    """
+    voorraad = []
+    for i in range(aantal):
+        if rnd.random() < 0.5:
+            instructie = f'Maak een afspraak of bel 14020 Gebruik de container voor {fractie.lower()}.'
+            ophaaldagen = frequentie = buitenzetten = None
+            waar = f'Container op {rnd.randint(5, 300)} meter.'
+        else:
+            instructie = f'Zet {fractie.lower()} in een goed gesloten zak aan de straat.'
+            ophaaldagen = ', '.join(sorted(rnd.sample(DAGEN, rnd.randint(1, 2)),
+                                           key=DAGEN.index))
+            frequentie = rnd.choice((None, 'om de week', 'oneven weken'))
+            buitenzetten = f'Tussen {rnd.randint(6, 8)}.00 en {rnd.randint(9, 21)}.00 uur'
+            waar = 'Aan de rand van de stoep.'
+        opmerking = (f'<p>Let op: <b>niet</b> naast de container zetten ({i}).</p>'
+                     if rnd.random() < 0.3 else None)
+        if rnd.random() < 0.15:
+            melding = 'Door werkzaamheden wordt er op een andere dag opgehaald.'
+            melding_van = f'2025-{rnd.randint(1, 6):02d}-01T00:00:00Z'
+            melding_tot = f'2025-{rnd.randint(7, 12):02d}-01T00:00:00Z'
+        else:
+            melding = melding_van = melding_tot = None
+        voorraad.append(Regel(instructie, ophaaldagen, frequentie, buitenzetten,
+                              waar, opmerking, melding, melding_van, melding_tot))
+    return voorraad
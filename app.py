@@ -1,25 +1,76 @@
 import logging
 from argparse import ArgumentParser
+from collections.abc import Iterable
 from pathlib import Path
 from typing import Optional
 
-from afvalwijzer.azure import get_access_token
-from afvalwijzer.io import db, read, write
+from afvalwijzer import pipeline, profiling
+from afvalwijzer.build import write_incremental
+from afvalwijzer.cache import BuurtCache
+from afvalwijzer.dataset import Dataset
+from afvalwijzer.filters import add_arguments, from_args
+from afvalwijzer.io import format_van, read, write
+from afvalwijzer.models import Brongegeven, Groep
 
 logger = logging.getLogger(__name__)
 
 
-def convert(file_in: str | Path, file_out: str | Path,
-            filters: dict[str, bool | int | str]) -> Optional[str]:
+def convert(file_in: str | Path, files_out: list[str | Path],
+            filters: dict[str, bool | int | str], incremental: bool = False,
+            read_ahead: bool = False, grouped: bool = False,
+            read_options: dict | None = None, **options) -> Optional[str]:
+    """Leest `file_in` één keer en schrijft de gegevens naar elk bestand in
+    `files_out`.
+
+    Bij meer dan één bestand worden de records eerst in een lijst verzameld.
+    De writers van ruwe data krijgen ze in de volgorde van `file_in`, net als
+    met één bestand. Zitten er samengevatte formaten (docx, pdf, html) tussen,
+    dan delen die één `Dataset` en dus één samenvatting.
+    """
+    _write = write_incremental if incremental else write
+
+    if read_ahead and (len(files_out) > 1 or not format_van(files_out[0]).streaming):
+        logger.debug('De uitvoer verwerkt alle records in één keer;'
+                     ' vooruitlezen overlapt alleen met het lezen zelf.')
+
+    def _read() -> Iterable[Brongegeven | Groep]:
+        if grouped:
+            from afvalwijzer.io.db import read_groepen
+            data = profiling.iterate('read groepen', read_groepen(file_in, filters))
+        else:
+            data = read(file_in, filters, **(read_options or {}))
+        return pipeline.read_ahead(data) if read_ahead else data
+
+    def _write_all() -> None:
+        data = _read()
+        if len(files_out) == 1:
+            _write(files_out[0], data, filters, **options)
+            return
+
+        data = list(data)
+        dataset = None
+        # Groepen zijn al samengevat; de writers sorteren ze alleen nog.
+        if not grouped and any(not format_van(f).lezen for f in files_out):
+            dataset = Dataset.from_records(data, filters)
+        for file_out in files_out:
+            samengevat = dataset is not None and not format_van(file_out).lezen
+            _write(file_out, dataset if samengevat else data, filters, **options)
+
+    if format_van(file_in).module != 'db':
+        _write_all()
+        return
+
+    # Alleen voor de database: psycopg en yaml kosten merkbaar opstarttijd.
+    from afvalwijzer.azure import get_access_token
+    from afvalwijzer.io import db
+
     try:
-        data = read(file_in, filters)
-        write(file_out, data, filters)
+        _write_all()
     except db.TokenExpiredError:
         logger.debug('Het wachtwoord voor de databaseverbinding is verlopen.'
                     ' Een nieuw wachtwoord wordt automatisch aangevraagd...')
         db.update_params(file_in, password=get_access_token())
-        data = read(file_in, filters)
-        write(file_out, data, filters)
+        _write_all()
     except db.ConnectionFailedError as err:
         return err.args[0]
 
@@ -36,23 +87,72 @@ def main() -> Optional[str]:
         description='Maakt backups en uitdraaien van gegevens in de afvalwijzer',
     )
     parser.add_argument('file_in', help='Leest de gegevens uit dit bestand.')
-    parser.add_argument('file_out', help='Schrijft de gegevens naar dit bestand.')
-    parser.add_argument('--stadsdeel', help='Verwerkt alleen de regels voor dit stadsdeel.')
-    group = parser.add_mutually_exclusive_group(required=False)
-    group.add_argument('--bewoners', action='store_true', help='Verwerkt alleen de regels voor bewoners.')
-    group.add_argument('--bedrijven', action='store_true', help='Verwerkt alleen de regels voor bedrijven.')
+    parser.add_argument('file_out', nargs='+', help='Schrijft de gegevens naar dit bestand. Bij meer bestanden wordt er één keer gelezen en samengevat.')
+    add_arguments(parser)
+    parser.add_argument('--processen', type=int, metavar='N', help='Verdeelt het parsen van csv en zip en het maken van pdf en html over N processen.')
+    parser.add_argument('--incrementeel', action='store_true', help='Slaat het schrijven over als de gefilterde gegevens, het sjabloon en de code niet veranderd zijn sinds de vorige keer.')
+    parser.add_argument('--cache', metavar='MAP', help='Hergebruikt samenvattingen en hoofdstukken van ongewijzigde buurten uit deze map (docx, pdf en html).')
+    parser.add_argument('--normaliseer', action='store_true', help='Schrijft een zip-bestand als genormaliseerde snapshot: elke regel en elk adres één keer, met een koppeltabel.')
+    parser.add_argument('--blokken', action='store_true', help='Schrijft een zip-bestand in blokken per buurt met een index, zodat gefilterd lezen alleen de nodige blokken uitpakt.')
+    parser.add_argument('--samengevat', action='store_true', help='Laat de database de regels al per buurt, fractie en regel groeperen (alleen van .yaml naar .docx of .pdf).')
+    parser.add_argument('--vooruitlezen', action='store_true', help='Leest (uitpakken, parsen, database) in een achtergrondthread vooruit terwijl er geschreven wordt.')
+    parser.add_argument('--profile', metavar='BESTAND', help='Meet tijd en geheugen per stap en voegt de metingen als JSON toe aan dit bestand.')
+    parser.add_argument('--cprofile', metavar='BESTAND', help='Schrijft een cProfile-profiel van de hele run naar dit bestand.')
     args = parser.parse_args()
 
-    filters = {}
+    if args.samengevat and (
+            Path(args.file_in).suffix.lower() != '.yaml'
+            or any(Path(f).suffix.lower() not in ('.docx', '.pdf')
+                   for f in args.file_out)):
+        return '--samengevat kan alleen van .yaml naar .docx of .pdf.'
+
+    filters = from_args(args)
+    options = {}
+    read_options = {}
+
+    if args.processen:
+        if format_van(args.file_in).module in ('csv', 'zip'):
+            read_options['processes'] = args.processen
+        if any(format_van(f).module in ('html', 'pdf') for f in args.file_out):
+            options['processes'] = args.processen
+    if args.cache:
+        options['cache'] = BuurtCache(args.cache)
+    if args.normaliseer:
+        options['normalise'] = True
+    if args.blokken:
+        options['blocks'] = True
+
+    if args.profile:
+        profiling.start()
+    if args.cprofile:
+        import cProfile
+        cprofiler = cProfile.Profile()
+        cprofiler.enable()
+
+    with profiling.stage('convert'):
+        err = convert(args.file_in, args.file_out, filters,
+                      incremental=args.incrementeel,
+                      read_ahead=args.vooruitlezen,
+                      grouped=args.samengevat,
+                      read_options=read_options, **options)
+
+    if args.cprofile:
+        cprofiler.disable()
+        cprofiler.dump_stats(args.cprofile)
+    if args.profile:
+        profiel = profiling.stop()
+        for stage in profiel.stages:
+            logger.debug(f'{"  " * stage.niveau}{stage.naam}: {stage.wall:.2f} s')
+        profiling.write_json(profiel, args.profile, file_in=str(args.file_in),
+                             file_out=', '.join(args.file_out), filters=filters)
 
-    if args.bewoners:
-        filters['woonfunctie'] = True
-    elif args.bedrijven:
-        filters['woonfunctie'] = False
-    if args.stadsdeel:
-        filters['stadsdeel'] = args.stadsdeel
+    if args.cache:
+        cache = options['cache']
+        verwijderd = cache.opruimen()
+        logger.debug(f'Cache: {cache.hits} hergebruikt, {cache.misses} opnieuw'
+                     f' gemaakt, {verwijderd} oude items verwijderd.')
 
-    return convert(args.file_in, args.file_out, filters)
+    return err
 
 
 if __name__ == '__main__':
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from afvalwijzer.azure import get_access_token
+from afvalwijzer.build import write_incremental
+from afvalwijzer.io import db, write
+
+logger = logging.getLogger(__name__)
+
+STADSDELEN = ('Centrum', 'Nieuw-West', 'Noord', 'Oost', 'Weesp', 'West',
+              'Zuid', 'Zuidoost')
+
+
+class Export(NamedTuple):
+    file_out: Path
+    filters: dict[str, bool | int | str]
+
+
+def exports(folder: str | Path, stadsdelen: list[str], format: str,
+            ) -> list[Export]:
+    """De exports van `run_all.bat`: per stadsdeel één voor bewoners en één
+    voor bedrijven.
+    """
+    return [
+        Export(Path(folder) / f'Afvalwijzer {stadsdeel} - {wie}.{format}',
+               {'stadsdeel': stadsdeel, 'woonfunctie': woonfunctie})
+        for wie, woonfunctie in (('bewoners', True), ('bedrijven', False))
+        for stadsdeel in stadsdelen
+    ]
+
+
+async def export(file_in: str | Path, taak: Export,
+                 verbindingen: asyncio.Semaphore,
+                 incremental: bool = False) -> None:
+    """Leest één partitie uit de database en schrijft die weg.
+
+    Het lezen gebeurt in de event loop, zodat de queries van andere exports
+    tegelijk lopen. Het schrijven (samenvatten, renderen, comprimeren)
+    gebeurt in een thread, zodat de event loop intussen rijen blijft ophalen.
+    """
+    async with verbindingen:
+        logger.debug(f'Lezen: {taak.file_out.name}')
+        data = [record async for record in db.read_async(file_in, taak.filters)]
+
+    logger.debug(f'Schrijven: {taak.file_out.name} ({len(data)} rijen)')
+    _write = write_incremental if incremental else write
+    await asyncio.to_thread(_write, taak.file_out, data, taak.filters)
+
+
+async def export_all(file_in: str | Path, taken: list[Export],
+                     verbindingen: int = 4, incremental: bool = False) -> None:
+    """Voert alle exports uit vanuit één event loop, met maximaal
+    `verbindingen` databaseverbindingen tegelijk.
+    """
+    semaphore = asyncio.Semaphore(verbindingen)
+    await asyncio.gather(*(
+        export(file_in, taak, semaphore, incremental) for taak in taken
+    ))
+
+
+def main() -> Optional[str]:
+    logging.basicConfig(level=logging.DEBUG)
+    logging.getLogger('fontTools').setLevel(logging.WARN)
+    logging.getLogger('fpdf').setLevel(logging.WARN)
+    logging.getLogger('pikepdf').setLevel(logging.WARN)
+    logging.getLogger('PIL').setLevel(logging.WARN)
+
+    parser = ArgumentParser(
+        prog='batch.py',
+        description='Exporteert alle stadsdelen, voor bewoners en bedrijven,'
+                    ' in één keer direct uit de database.',
+    )
+    parser.add_argument('file_in', help='Het configuratiebestand van de database, bijvoorbeeld db.yaml.')
+    parser.add_argument('folder', help='Schrijft de exports in deze map.')
+    parser.add_argument('--formaat', default='docx', help='Het bestandsformaat van de exports (standaard docx).')
+    parser.add_argument('--stadsdeel', nargs='+', default=STADSDELEN, help='Exporteert alleen deze stadsdelen.')
+    parser.add_argument('--verbindingen', type=int, default=4, metavar='N', help='Maximaal zoveel queries tegelijk (standaard 4).')
+    parser.add_argument('--incrementeel', action='store_true', help='Slaat exports over waarvan de invoer niet veranderd is.')
+    args = parser.parse_args()
+
+    if sys.platform == 'win32':
+        # psycopg werkt niet met de standaard ProactorEventLoop van Windows.
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+    Path(args.folder).mkdir(parents=True, exist_ok=True)
+    taken = exports(args.folder, args.stadsdeel, args.formaat.lstrip('.'))
+
+    try:
+        try:
+            asyncio.run(export_all(args.file_in, taken, args.verbindingen,
+                                   args.incrementeel))
+        except db.TokenExpiredError:
+            logger.debug('Het wachtwoord voor de databaseverbinding is verlopen.'
+                         ' Een nieuw wachtwoord wordt automatisch aangevraagd...')
+            db.update_params(args.file_in, password=get_access_token())
+            asyncio.run(export_all(args.file_in, taken, args.verbindingen,
+                                   args.incrementeel))
+    except db.ConnectionFailedError as err:
+        return err.args[0]
+
+
+if __name__ == '__main__':
+    sys.exit(main())
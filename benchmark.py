@@ -0,0 +1,297 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from collections.abc import Callable
+from itertools import islice
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any, Optional
+
+from afvalwijzer import kalender
+from afvalwijzer.content import samenvatting
+from afvalwijzer.dataset import Dataset
+from afvalwijzer.io import FORMATS, read, write
+from afvalwijzer.lookup import AdresIndex
+from afvalwijzer.models import Brongegeven
+from afvalwijzer.search import ZoekIndex
+from afvalwijzer.synthetic import FRACTIES, SCHALEN, brongegevens
+
+logger = logging.getLogger(__name__)
+
+# De database (`.yaml`) is geen bestand in `folder`; die meet `--database`.
+RAW_FORMATS = tuple(f.module for f in FORMATS
+                    if f.lezen and f.schrijven and f.module != 'db')
+DOC_FORMATS = tuple(f.module for f in FORMATS if f.schrijven and not f.lezen)
+
+# Zo filtert run_all.bat: per stadsdeel, alleen bewoners of alleen bedrijven.
+FILTERS = {'stadsdeel': 'Centrum', 'woonfunctie': True}
+
+# Zoveel keer wordt elk programma gestart; de snelste telt.
+OPSTARTEN = 5
+
+# Het jaar van de ophaalkalenders; voor de snelheid maakt het niet uit.
+JAAR = 2026
+
+# Zoveel adressen worden (als zoekopdracht) gezocht in de zoekindex.
+ZOEKOPDRACHTEN = 1000
+
+
+def measure(results: list[dict[str, Any]], schaal: str, stap: str,
+            func: Callable[[], Optional[int]]) -> None:
+    """Meet de tijd van `func` en voegt het resultaat toe aan `results`.
+
+    `func` mag het aantal verwerkte rijen teruggeven. Fouten (bijvoorbeeld een
+    ontbrekend lettertype voor pdf) worden gelogd en als resultaat bewaard,
+    zodat de rest van de benchmark door kan gaan.
+    """
+    start = time.perf_counter()
+    try:
+        rijen = func()
+    except Exception as err:
+        logger.warning(f'{schaal} {stap}: {err!r}')
+        results.append({'schaal': schaal, 'stap': stap, 'fout': repr(err)})
+        return
+    seconden = time.perf_counter() - start
+
+    result = {'schaal': schaal, 'stap': stap, 'seconden': round(seconden, 4)}
+    if rijen is not None:
+        result['rijen'] = rijen
+        result['rijen_per_seconde'] = round(rijen / seconden) if seconden else None
+    results.append(result)
+    logger.info(f'{schaal:>3} {stap:<24} {seconden:8.3f} s')
+
+
+def rows(n: int, func: Callable, *args) -> Callable[[], int]:
+    """Roept `func` aan, die `n` rijen verwerkt.
+    """
+    def run() -> int:
+        func(*args)
+        return n
+
+    return run
+
+
+def count(func: Callable, *args) -> Callable[[], int]:
+    """Roept `func` aan en telt de records die het oplevert.
+    """
+    def run() -> int:
+        return sum(1 for _ in func(*args))
+
+    return run
+
+
+def compleet(data: list[Brongegeven], bron: Any) -> Callable[[], int]:
+    """Vat `bron` samen en controleert dat er niets wegvalt. Zonder filter op
+    woonfunctie komt een buurt zowel bij de bedrijven als bij de bewoners
+    voor; de samenvatting moet dan gelijk zijn aan die van dezelfde records
+    als ze allemaal dezelfde woonfunctie hadden.
+
+    De synthetische data heeft adressen zonder huisletter (None, zoals in de
+    database en sqlite); die mogen niet als "None" in de tekst komen.
+    """
+    verwacht = samenvatting([r._replace(woonfunctie=True) for r in data])
+
+    def run() -> int:
+        resultaat = samenvatting(bron)
+        if resultaat != verwacht:
+            raise AssertionError('De samenvatting van bewoners en bedrijven samen'
+                                 ' is niet compleet.')
+        for buurt, fracties in resultaat.items():
+            for regels in fracties.values():
+                for straten in regels.values():
+                    if any('None' in straat for straat in straten):
+                        raise AssertionError(f'"None" in de samenvatting van {buurt}.')
+        return len(data)
+
+    return run
+
+
+def benchmark(schaal: str, folder: Path, formats: list[str],
+              database: Optional[str] = None, processes: int = 1,
+              ) -> list[dict[str, Any]]:
+    """Meet alle readers en writers en `content.samenvatting` op één schaal.
+
+    Met `processes` > 1 worden csv en zip ook over zoveel processen gelezen,
+    en de ophaalkalenders over zoveel processen geschreven.
+
+    Met `database` (een `.yaml` van een lokale Postgres) worden de gegevens
+    ook daarin geladen en alle manieren van lezen uit de database gemeten.
+    """
+    results = []
+    data = []
+
+    def genereer() -> int:
+        data.extend(brongegevens(SCHALEN[schaal]))
+        return len(data)
+
+    measure(results, schaal, 'genereer', genereer)
+    partitie = [r for r in data if r.woonfunctie]
+
+    for fmt in formats:
+        if fmt not in RAW_FORMATS:
+            continue
+        path = folder / f'{schaal}.{fmt}'
+        measure(results, schaal, f'write {fmt}', rows(len(data), write, path, data, {}))
+        measure(results, schaal, f'read {fmt}', count(read, path, {}))
+        measure(results, schaal, f'read {fmt} gefilterd', count(read, path, FILTERS))
+        if processes > 1 and fmt in ('csv', 'zip'):
+            measure(results, schaal, f'read {fmt} {processes} processen',
+                    count(lambda: read(path, {}, processes=processes)))
+
+    if database:
+        results.extend(benchmark_db(schaal, database, data))
+
+    measure(results, schaal, 'samenvatting', rows(len(partitie), samenvatting, partitie))
+    measure(results, schaal, 'samenvatting alles', compleet(data, data))
+    measure(results, schaal, 'samenvatting dataset',
+            compleet(data, Dataset.from_records(data)))
+
+    kalenders = folder / f'{schaal}-kalenders'
+    measure(results, schaal, 'kalenders', rows(len(data), kalender.write, kalenders, data, JAAR))
+    if processes > 1:
+        measure(results, schaal, f'kalenders {processes} processen',
+                rows(len(data), kalender.write, kalenders, data, JAAR, processes))
+
+    index = []
+    measure(results, schaal, 'adresindex', rows(len(data), lambda: index.append(AdresIndex(data))))
+    if index:
+        adressen = [(r.straatnaam, r.huisnummer,
+                     f'{r.huisletter or ""}{r.huisnummertoevoeging or ""}')
+                    for r in data[::len(FRACTIES)]]
+        measure(results, schaal, 'adres opzoeken',
+                rows(len(adressen), lambda: [index[0].adres(*a) for a in adressen]))
+
+        zoekindex = []
+        measure(results, schaal, 'zoekindex',
+                rows(len(index[0]), lambda: zoekindex.append(ZoekIndex(index[0]))))
+        if zoekindex:
+            steekproef = adressen[::max(1, len(adressen) // ZOEKOPDRACHTEN)]
+            begin = [f'{straat[:8]} {huisnummer}' for straat, huisnummer, _ in steekproef]
+            tikfout = [f'{straat[:len(straat) // 2]}{straat[len(straat) // 2 + 1:]} {huisnummer}'
+                       for straat, huisnummer, _ in steekproef]
+            measure(results, schaal, 'zoeken begin straatnaam',
+                    rows(len(begin), lambda: [zoekindex[0].zoek(z) for z in begin]))
+            measure(results, schaal, 'zoeken met tikfout',
+                    rows(len(tikfout), lambda: [zoekindex[0].zoek(z) for z in tikfout]))
+
+    for fmt in formats:
+        if fmt not in DOC_FORMATS:
+            continue
+        path = folder / f'{schaal}.{fmt}'
+        measure(results, schaal, f'write {fmt}',
+                rows(len(partitie), write, path, partitie,
+                     {'woonfunctie': True}))
+
+    return results
+
+
+def benchmark_db(schaal: str, database: str, data: list[Brongegeven],
+                 ) -> list[dict[str, Any]]:
+    """Laadt `data` in de lokale database en meet elke manier van lezen.
+    """
+    import asyncio
+    from afvalwijzer.io import db
+    from afvalwijzer.pipeline import read_ahead
+
+    async def read_async() -> int:
+        return sum([1 async for _ in db.read_async(database, {})])
+
+    results = []
+    measure(results, schaal, 'write db', rows(len(data), write, database, data, {}))
+    measure(results, schaal, 'read db', count(read, database, {}))
+    measure(results, schaal, 'read db gefilterd', count(read, database, FILTERS))
+    measure(results, schaal, 'read db vooruitlezen',
+            count(lambda: read_ahead(read(database, {}))))
+    measure(results, schaal, 'read db async', lambda: asyncio.run(read_async()))
+    measure(results, schaal, 'read db samengevat',
+            lambda: sum(len(g.adressen) for g in db.read_groepen(database, {})))
+    return results
+
+
+def opstarttijd(folder: Path, formats: list[str]) -> list[dict[str, Any]]:
+    """Meet hoe lang een korte conversie met `app.py` duurt, per formaat.
+
+    De invoer is een zip met een handvol records, dus dit is vrijwel alleen
+    het opstarten van Python en het importeren van wat het formaat nodig
+    heeft. Ter vergelijking ook een kale Python en `app.py --help`.
+    """
+    results = []
+    root = Path(__file__).parent
+    file_in = folder / 'opstarten-invoer.zip'
+    write(file_in, list(islice(brongegevens(SCHALEN['s']), 20)), {})
+
+    programmas = {
+        'python': [sys.executable, '-c', 'pass'],
+        'app.py --help': [sys.executable, 'app.py', '--help'],
+        **{
+            f'app.py zip -> {fmt}':
+                [sys.executable, 'app.py', str(file_in), str(folder / f'opstarten.{fmt}')]
+            for fmt in formats
+        },
+    }
+
+    for stap, args in programmas.items():
+        tijden = []
+        for _ in range(OPSTARTEN):
+            start = time.perf_counter()
+            res = subprocess.run(args, cwd=root, capture_output=True)
+            tijden.append(time.perf_counter() - start)
+            if res.returncode:
+                fout = res.stderr.decode(errors='replace').strip().splitlines()[-1:]
+                logger.warning(f'opstarten {stap}: {fout}')
+                results.append({'schaal': '-', 'stap': f'opstarten {stap}', 'fout': fout})
+                break
+        else:
+            seconden = min(tijden)
+            results.append({'schaal': '-', 'stap': f'opstarten {stap}',
+                            'seconden': round(seconden, 4)})
+            logger.info(f'{"-":>3} {"opstarten " + stap:<30} {seconden:8.3f} s')
+
+    return results
+
+
+def main() -> Optional[str]:
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    logging.getLogger('fontTools').setLevel(logging.WARN)
+    logging.getLogger('fpdf').setLevel(logging.WARN)
+
+    parser = ArgumentParser(
+        prog='benchmark.py',
+        description='Meet de snelheid van alle readers, writers en de'
+                    ' samenvatting op synthetische data.',
+    )
+    parser.add_argument('--schalen', nargs='*', choices=SCHALEN.keys(), default=['s', 'm'], help='Meet op deze schalen.')
+    parser.add_argument('--formaten', nargs='+', choices=RAW_FORMATS + DOC_FORMATS, default=list(RAW_FORMATS + DOC_FORMATS), help='Meet deze bestandsformaten.')
+    parser.add_argument('--database', metavar='YAML', help='Laadt de gegevens ook in deze lokale Postgres en meet het lezen daaruit.')
+    parser.add_argument('--processen', type=int, default=os.cpu_count(), metavar='N', help='Meet het lezen van csv en zip en het schrijven van kalenders ook over N processen (standaard het aantal cores).')
+    parser.add_argument('--opstarten', action='store_true', help='Meet ook de opstarttijd van een korte conversie met app.py per formaat.')
+    parser.add_argument('--map', help='Schrijft de bestanden naar deze map in plaats van een tijdelijke map.')
+    parser.add_argument('--json', help='Schrijft de resultaten naar dit JSON-bestand.')
+    args = parser.parse_args()
+
+    results = []
+
+    with TemporaryDirectory() as tmp:
+        folder = Path(args.map or tmp)
+        folder.mkdir(parents=True, exist_ok=True)
+        if args.opstarten:
+            results.extend(opstarttijd(folder, args.formaten))
+        for schaal in args.schalen:
+            results.extend(benchmark(schaal, folder, args.formaten, args.database,
+                                     args.processen))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if any('fout' in result for result in results):
+        return 'Niet alle stappen zijn gelukt.'
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
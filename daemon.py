@@ -0,0 +1,67 @@
+import logging
+from argparse import ArgumentParser
+from typing import Optional
+
+from afvalwijzer import daemon
+from afvalwijzer.filters import add_arguments, from_args
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> Optional[str]:
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger('fontTools').setLevel(logging.WARN)
+    logging.getLogger('fpdf').setLevel(logging.WARN)
+    logging.getLogger('pikepdf').setLevel(logging.WARN)
+    logging.getLogger('PIL').setLevel(logging.WARN)
+
+    parser = ArgumentParser(
+        prog='daemon.py',
+        description='Houdt een snapshot in het geheugen en schrijft exports'
+                    ' op verzoek, zonder steeds opnieuw te starten en te lezen.',
+    )
+    parser.add_argument('--host', default=daemon.HOST, help='Het adres van de daemon.')
+    parser.add_argument('--port', type=int, default=daemon.PORT, help='De poort van de daemon.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    start = commands.add_parser('start', help='Start de daemon.')
+    start.add_argument('file_in', help='Laadt deze snapshot, bijvoorbeeld db.zip.')
+    start.add_argument('--interval', type=float, default=5., help='Controleert elke zoveel seconden of het bestand veranderd is.')
+
+    export = commands.add_parser('export', help='Vraagt de daemon om een export.')
+    export.add_argument('file_out', help='Schrijft de gegevens naar dit bestand.')
+    add_arguments(export)
+    export.add_argument('--processen', type=int, metavar='N', help='Verdeelt het printen van een pdf over N processen.')
+    export.add_argument('--incrementeel', action='store_true', help='Slaat het schrijven over als de invoer niet veranderd is.')
+
+    commands.add_parser('status', help='Toont welke snapshot de daemon geladen heeft.')
+
+    args = parser.parse_args()
+
+    if args.command == 'start':
+        service = daemon.ExportService(args.file_in, interval=args.interval)
+        daemon.serve(service, args.host, args.port)
+        return
+
+    try:
+        if args.command == 'status':
+            antwoord = daemon.request({'status': True}, args.host, args.port)
+        else:
+            options = {}
+            if args.processen:
+                options['processes'] = args.processen
+            antwoord = daemon.export(args.file_out, from_args(args),
+                                     args.incrementeel, args.host, args.port,
+                                     **options)
+    except ConnectionRefusedError:
+        return f'Geen daemon op {args.host}:{args.port}. Start die met `python daemon.py start db.zip`.'
+
+    if 'fout' in antwoord:
+        return antwoord['fout']
+    for key, value in antwoord.items():
+        print(f'{key}: {value}')
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
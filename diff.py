@@ -0,0 +1,41 @@
+import logging
+from argparse import ArgumentParser
+from typing import Optional
+
+from afvalwijzer import diff
+from afvalwijzer.filters import add_arguments, from_args
+from afvalwijzer.io import read
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> Optional[str]:
+    logging.basicConfig(level=logging.DEBUG)
+    logging.getLogger('fontTools').setLevel(logging.WARN)
+
+    parser = ArgumentParser(
+        prog='diff.py',
+        description='Vergelijkt twee snapshots van de afvalwijzer en schrijft'
+                    ' de gewijzigde regels en verplaatste adressen weg.',
+    )
+    parser.add_argument('file_oud', help='De oude snapshot, bijvoorbeeld van de vorige vaststelling.')
+    parser.add_argument('file_nieuw', help='De nieuwe snapshot.')
+    parser.add_argument('file_out', help='Schrijft de wijzigingen naar dit bestand (csv, xlsx of docx).')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    filters = from_args(args)
+
+    wijzigingen = diff.diff(read(args.file_oud, filters),
+                            read(args.file_nieuw, filters))
+    try:
+        aantal = diff.write(args.file_out, wijzigingen)
+    except diff.NietGesorteerdError as err:
+        return err.args[0]
+
+    logger.debug(f'{aantal} wijzigingen geschreven naar {args.file_out}.')
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
@@ -0,0 +1,35 @@
+import logging
+from argparse import ArgumentParser
+from datetime import date
+from typing import Optional
+
+from afvalwijzer import kalender
+from afvalwijzer.filters import add_arguments, from_args
+from afvalwijzer.io import read
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> Optional[str]:
+    logging.basicConfig(level=logging.DEBUG)
+
+    parser = ArgumentParser(
+        prog='kalender.py',
+        description='Schrijft ophaalkalenders (.ics) voor alle adressen, met'
+                    ' een manifest van adres naar kalender.',
+    )
+    parser.add_argument('file_in', help='Leest de gegevens uit dit bestand, bijvoorbeeld db.zip.')
+    parser.add_argument('folder', help='Schrijft de kalenders en manifest.csv in deze map.')
+    add_arguments(parser)
+    parser.add_argument('--jaar', type=int, default=date.today().isocalendar().year, help='De kalenders lopen over dit (ISO-)jaar, standaard het huidige.')
+    parser.add_argument('--processen', type=int, default=1, metavar='N', help='Verdeelt het schrijven van de kalenders over N processen.')
+    args = parser.parse_args()
+
+    adressen, kalenders = kalender.write(args.folder, read(args.file_in, from_args(args)),
+                                         args.jaar, args.processen)
+    logger.debug(f'{adressen} adressen, {kalenders} kalenders in {args.folder}.')
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
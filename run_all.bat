@@ -13,6 +13,14 @@ if not exist %FOLDER% (
     mkdir %FOLDER%
 )
 
+@REM De exports (met hun .build.json) staan in een vaste map, zodat
+@REM --incrementeel de vorige keer terugvindt. Daarna gaan ze naar %FOLDER%.
+set UITVOER=uitvoer
+
+if not exist %UITVOER% (
+    mkdir %UITVOER%
+)
+
 set ZIPFILE=%FOLDER%\db.zip
 echo Download alle data van de database...
 
@@ -27,17 +35,19 @@ echo Exporteer alle stadsdelen...
 echo === BEWONERS ===
 
 for %%s in (Centrum Nieuw-West Noord Oost Weesp West Zuid Zuidoost) do (
-    set "OUTFILE=%FOLDER%\Afvalwijzer %%s - bewoners.%EXT%"
+    set "OUTFILE=%UITVOER%\Afvalwijzer %%s - bewoners.%EXT%"
     echo !OUTFILE!
-    python app.py %ZIPFILE% "!OUTFILE!" --stadsdeel %%s --bewoners
+    python app.py %ZIPFILE% "!OUTFILE!" --stadsdeel %%s --bewoners --incrementeel
+    copy /y "!OUTFILE!" %FOLDER% >nul
 )
 
 echo === BEDRIJVEN ===
 
 for %%s in (Centrum Nieuw-West Noord Oost Weesp West Zuid Zuidoost) do (
-    set "OUTFILE=%FOLDER%\Afvalwijzer %%s - bedrijven.%EXT%"
+    set "OUTFILE=%UITVOER%\Afvalwijzer %%s - bedrijven.%EXT%"
     echo !OUTFILE!
-    python app.py %ZIPFILE% "!OUTFILE!" --stadsdeel %%s --bedrijven
+    python app.py %ZIPFILE% "!OUTFILE!" --stadsdeel %%s --bedrijven --incrementeel
+    copy /y "!OUTFILE!" %FOLDER% >nul
 )
 
 echo ---
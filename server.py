@@ -0,0 +1,157 @@
+import json
+import logging
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from afvalwijzer.content import labels
+from afvalwijzer.lookup import AdresService, Resultaat
+from afvalwijzer.models import Regel
+
+logger = logging.getLogger(__name__)
+
+
+def regels_json(regels: dict[str, list[Regel]]) -> dict[str, list[dict[str, Any]]]:
+    return {
+        fractie: [dict(labels(regel)) for regel in fractie_regels]
+        for fractie, fractie_regels in regels.items()
+    }
+
+
+def resultaat_json(resultaat: Resultaat) -> dict[str, Any]:
+    return {
+        'straatnaam': resultaat.straatnaam,
+        'huisnummer': resultaat.huisnummer,
+        'toevoeging': resultaat.toevoeging,
+        'plaatsnaam': resultaat.buurt.plaatsnaam,
+        'buurtnaam': resultaat.buurt.buurtnaam,
+        'regels': regels_json(resultaat.regels),
+    }
+
+
+def handler(service: AdresService) -> type[BaseHTTPRequestHandler]:
+    """Maakt een request handler voor de index van `service`.
+
+    - GET /adres?straat=Prinsengracht&huisnummer=263&toevoeging=A
+    - GET /zoek?q=prinsengr+263&limit=10
+    - GET /buurt?naam=Grachtengordel-West&plaats=Amsterdam
+    - GET /status
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            url = urlsplit(self.path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            # Eén keer ophalen: een reload tijdens de aanvraag vervangt de
+            # zoekindex en de adresindex samen.
+            zoekindex = service.zoekindex
+            index = zoekindex.index
+
+            if url.path == '/adres':
+                try:
+                    straat = query['straat']
+                    huisnummer = int(query['huisnummer'])
+                except (KeyError, ValueError):
+                    return self.send_json(400, {'fout': 'Geef straat en huisnummer.'})
+                resultaat = index.adres(straat, huisnummer, query.get('toevoeging'))
+                if resultaat is None:
+                    return self.send_json(404, {
+                        'fout': 'Adres niet gevonden.',
+                        'toevoegingen': index.varianten(straat, huisnummer),
+                    })
+                return self.send_json(200, resultaat_json(resultaat))
+
+            if url.path == '/zoek':
+                try:
+                    limit = int(query.get('limit', 10))
+                except ValueError:
+                    return self.send_json(400, {'fout': 'Ongeldige limit.'})
+                treffers = zoekindex.zoek(query.get('q', ''), limit)
+                return self.send_json(200, {'treffers': [
+                    {'score': treffer.score, **resultaat_json(treffer.resultaat)}
+                    for treffer in treffers
+                ]})
+
+            if url.path == '/buurt':
+                if 'naam' not in query:
+                    return self.send_json(400, {'fout': 'Geef de naam van de buurt.'})
+                regels = index.buurt(query['naam'], query.get('plaats'))
+                if regels is None:
+                    return self.send_json(404, {'fout': 'Buurt niet gevonden.'})
+                return self.send_json(200, {'regels': regels_json(regels)})
+
+            if url.path == '/status':
+                return self.send_json(200, {
+                    'bestand': str(service.file_in),
+                    'geladen': service.geladen,
+                    'adressen': len(index),
+                    'buurten': len(index.buurten),
+                    'regels': index.aantal_regels,
+                })
+
+            self.send_json(404, {'fout': f'Onbekend pad {url.path!r}.'})
+
+        def send_json(self, status: int, body: dict[str, Any]) -> None:
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args) -> None:
+            logger.debug(format % args)
+
+    return Handler
+
+
+def main() -> Optional[str]:
+    logging.basicConfig(level=logging.INFO)
+
+    parser = ArgumentParser(
+        prog='server.py',
+        description='Zoekt de afvalregels op een adres op in een lokale index.',
+    )
+    parser.add_argument('file_in', help='Bouwt de index uit dit bestand, bijvoorbeeld db.zip.')
+    parser.add_argument('--host', default='127.0.0.1', help='Luistert op dit adres.')
+    parser.add_argument('--port', type=int, default=8080, help='Luistert op deze poort.')
+    parser.add_argument('--interval', type=float, default=5., help='Controleert elke zoveel seconden of het bestand veranderd is.')
+    parser.add_argument('--adres', nargs='+', metavar=('STRAAT', 'HUISNUMMER'), help='Zoekt één adres op (straat, huisnummer en eventueel toevoeging) in plaats van een server te starten.')
+    args = parser.parse_args()
+
+    service = AdresService(args.file_in, interval=args.interval)
+
+    if args.adres:
+        *straat, huisnummer = args.adres
+        toevoeging = None
+        if len(straat) > 1 and not huisnummer.isdigit():
+            *straat, huisnummer, toevoeging = args.adres
+        if not straat or not huisnummer.isdigit():
+            return 'Geef straat, huisnummer en eventueel een toevoeging.'
+        resultaat = service.index.adres(' '.join(straat), int(huisnummer), toevoeging)
+        if resultaat is None:
+            return 'Adres niet gevonden.'
+        print(f'{resultaat.straatnaam} {resultaat.huisnummer}{resultaat.toevoeging}'
+              f' ({resultaat.buurt.buurtnaam}, {resultaat.buurt.plaatsnaam})')
+        for fractie, regels in resultaat.regels.items():
+            print(f'\n{fractie}')
+            for regel in regels:
+                for label, waarde in labels(regel):
+                    print(f'  {label}: {waarde}')
+        return
+
+    service.watch()
+    server = ThreadingHTTPServer((args.host, args.port), handler(service))
+    logger.info(f'Luistert op http://{args.host}:{args.port}/')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())